@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Benchmark viewport (bbox) city lookups: geohash prefix index vs. a scan
+of cityqry.read().
+
+Usage:
+    python3 benchmarks/bench_bbox.py [num_cities] [num_queries]
+"""
+import os
+import random
+import sys
+import time
+from unittest.mock import patch
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import cities.queries as cityqry  # noqa: E402
+import data.geo as geo  # noqa: E402
+from benchmarks.bench_geo import SEED, synthetic_cities  # noqa: E402
+
+NUM_CITIES = 300_000
+NUM_QUERIES = 500
+# Roughly a metro-area viewport.
+BOX_DEG = 0.5
+
+
+def scan_bbox(bbox):
+    return {
+        key: city for key, city in cityqry.read().items()
+        if geo.in_bbox(
+            city[cityqry.LATITUDE], city[cityqry.LONGITUDE], bbox,
+        )
+    }
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else NUM_CITIES
+    n_queries = int(sys.argv[2]) if len(sys.argv) > 2 else NUM_QUERIES
+    docs = synthetic_cities(n)
+    rng = random.Random(SEED + 2)
+    boxes = []
+    for _ in range(n_queries):
+        west = rng.uniform(-180, 180)
+        south = rng.uniform(-60, 70)
+        east = west + BOX_DEG
+        if east > 180:
+            east -= 360  # wraps across the antimeridian
+        boxes.append((west, south, east, south + BOX_DEG))
+
+    cityqry.clear_cache()
+    with patch('cities.queries.dbc.read', return_value=docs):
+        cityqry.load_cache()
+
+    start = time.perf_counter()
+    cityqry.search_in_bbox(boxes[0])
+    build_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for box in boxes:
+        cityqry.search_in_bbox(box)
+    indexed_s = time.perf_counter() - start
+
+    n_scan = min(20, n_queries)
+    start = time.perf_counter()
+    for box in boxes[:n_scan]:
+        scan_bbox(box)
+    scan_s = time.perf_counter() - start
+
+    per_idx_ms = indexed_s / n_queries * 1000
+    per_scan_ms = scan_s / n_scan * 1000
+    print(f'cities: {n}, box: {BOX_DEG} deg')
+    print(f'geohash index build (first query): {build_s:.2f} s')
+    print(f'indexed search_in_bbox: {per_idx_ms:.3f} ms/query')
+    print(f'scan of read():         {per_scan_ms:.3f} ms/query')
+    print(f'speedup: {per_scan_ms / per_idx_ms:.0f}x')
+
+
+if __name__ == '__main__':
+    main()
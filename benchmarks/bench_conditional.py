@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark ETag revalidation for a Swapify page load: the reference-data
+reads the frontend makes, fetched cold (200) vs. revalidated (304).
+
+Usage:
+    python3 benchmarks/bench_conditional.py [num_cities] [num_loads]
+"""
+import os
+import statistics
+import sys
+import time
+from unittest.mock import patch
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import cities.queries as cityqry  # noqa: E402
+import countries.queries as countryqry  # noqa: E402
+import server.endpoints as ep  # noqa: E402
+import states.queries as stateqry  # noqa: E402
+from benchmarks.bench_geo import synthetic_cities  # noqa: E402
+
+NUM_CITIES = 50_000
+NUM_LOADS = 30
+
+PAGE_LOAD = [
+    f'{ep.CITIES_EPS}/{ep.READ}',
+    f'{ep.STATES_EPS}/{ep.READ}',
+    f'{ep.COUNTRIES_EPS}/{ep.READ}',
+    f'{ep.SYSTEM_EPS}/{ep.SYSTEM_DROPDOWN_OPTIONS}',
+    f'{ep.SYSTEM_EPS}/{ep.SYSTEM_DROPDOWN_OPTIONS}?country_code=C1',
+]
+
+
+def load_caches(n):
+    cities = synthetic_cities(n)
+    states = [
+        {stateqry.NAME: f'State {i}', stateqry.CODE: f'S{i}',
+         stateqry.COUNTRY_CODE: f'C{i % 200}'}
+        for i in range(500)
+    ]
+    countries = [
+        {countryqry.NAME: f'Country {i}', countryqry.CODE: f'C{i}'}
+        for i in range(200)
+    ]
+    for qry, docs in (
+        (cityqry, cities), (stateqry, states), (countryqry, countries),
+    ):
+        qry.clear_cache()
+        with patch.object(qry.dbc, 'read', return_value=docs):
+            qry.load_cache()
+            qry.cache_version()
+
+
+def page_load(client, etags):
+    """One page load; returns (seconds, body bytes received)."""
+    received = 0
+    start = time.perf_counter()
+    for url in PAGE_LOAD:
+        headers = {'If-None-Match': etags[url]} if url in etags else {}
+        resp = client.get(url, headers=headers)
+        received += len(resp.data)
+        etags[url] = resp.headers.get('ETag')
+    return time.perf_counter() - start, received
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else NUM_CITIES
+    n_loads = int(sys.argv[2]) if len(sys.argv) > 2 else NUM_LOADS
+    load_caches(n)
+    client = ep.app.test_client()
+
+    cold, warm = [], []
+    cold_bytes = warm_bytes = 0
+    for _ in range(n_loads):
+        secs, cold_bytes = page_load(client, {})
+        cold.append(secs)
+    etags = {}
+    page_load(client, etags)
+    for _ in range(n_loads):
+        secs, warm_bytes = page_load(client, etags)
+        warm.append(secs)
+
+    cold_p50 = statistics.median(cold) * 1000
+    warm_p50 = statistics.median(warm) * 1000
+    print(f'cities: {n}, requests per page load: {len(PAGE_LOAD)}')
+    print(f'no ETag (200):     p50 {cold_p50:8.2f} ms, {cold_bytes} bytes')
+    print(f'revalidated (304): p50 {warm_p50:8.2f} ms, {warm_bytes} bytes')
+    print(f'bytes saved per page load: {cold_bytes - warm_bytes}')
+    print(f'p50 speedup: {cold_p50 / warm_p50:.0f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Benchmark /system/dropdown-options city lookups: the precomputed
+per-state option index vs. the old scan-filter-sort of cityqry.read().
+
+Usage:
+    python3 benchmarks/bench_dropdown.py [num_cities] [num_queries]
+"""
+import os
+import sys
+import time
+from unittest.mock import patch
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import cities.queries as cityqry  # noqa: E402
+from benchmarks.bench_geo import synthetic_cities  # noqa: E402
+
+# Roughly the number of incorporated places in the US.
+NUM_CITIES = 20_000
+NUM_QUERIES = 200
+STATE_CODE = 'CA'
+
+
+def scan_options(state_code, country_code='USA'):
+    options = []
+    for c in cityqry.read().values():
+        sc = c.get('state_code', '')
+        if str(sc).upper() != state_code.upper():
+            continue
+        city_cc = str(c.get('country_code', '') or 'USA').strip().upper()
+        if city_cc != country_code:
+            continue
+        name = c.get('name', '')
+        options.append({'value': name, 'label': f'{name}, {sc}'})
+    options.sort(key=lambda o: o['label'].lower())
+    return options
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else NUM_CITIES
+    n_queries = int(sys.argv[2]) if len(sys.argv) > 2 else NUM_QUERIES
+    docs = synthetic_cities(n)
+    # Make the set US-only and give one state a California-sized share.
+    for i, doc in enumerate(docs):
+        doc[cityqry.COUNTRY_CODE] = 'USA'
+        if i % 8 == 0:
+            doc[cityqry.STATE_CODE] = STATE_CODE
+
+    cityqry.clear_cache()
+    with patch('cities.queries.dbc.read', return_value=docs):
+        cityqry.load_cache()
+
+    start = time.perf_counter()
+    expected = cityqry.city_options(STATE_CODE)
+    build_s = time.perf_counter() - start
+    assert expected == scan_options(STATE_CODE)
+
+    start = time.perf_counter()
+    for _ in range(n_queries):
+        cityqry.city_options(STATE_CODE)
+    indexed_s = time.perf_counter() - start
+
+    n_scan = min(20, n_queries)
+    start = time.perf_counter()
+    for _ in range(n_scan):
+        scan_options(STATE_CODE)
+    scan_s = time.perf_counter() - start
+
+    per_idx_ms = indexed_s / n_queries * 1000
+    per_scan_ms = scan_s / n_scan * 1000
+    print(f'cities: {n}, {STATE_CODE} options: {len(expected)}')
+    print(f'option index build (first query): {build_s * 1000:.1f} ms')
+    print(f'indexed city_options: {per_idx_ms:.4f} ms/query')
+    print(f'scan + sort of read(): {per_scan_ms:.3f} ms/query')
+    print(f'speedup: {per_scan_ms / per_idx_ms:.0f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Benchmark peak Python memory of exporting listings: NDJSON streamed from
+a lazy cursor (/listings/export) vs. building the whole dict and
+serializing it in one shot (/listings/read).
+
+Usage:
+    python3 benchmarks/bench_export.py [num_listings]
+"""
+import os
+import sys
+import time
+import tracemalloc
+from unittest.mock import patch
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import server.endpoints as ep  # noqa: E402
+import server.json_codec as codec  # noqa: E402
+from benchmarks.bench_json import synthetic_listings  # noqa: E402
+
+NUM_LISTINGS = 200_000
+BATCH = 10_000
+
+
+def lazy_cursor(n):
+    """Stands in for a Mongo cursor: docs are built batch by batch."""
+    for start in range(0, n, BATCH):
+        batch = synthetic_listings(min(BATCH, n - start), seed=start)
+        yield from batch.values()
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = fn()
+    secs = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return secs, peak, size
+
+
+def stream(n):
+    client = ep.app.test_client()
+    with patch.object(ep.listingqry, 'export', return_value=lazy_cursor(n)):
+        resp = client.get(f'{ep.LISTINGS_EPS}/{ep.EXPORT}', buffered=False)
+        size = sum(len(chunk) for chunk in resp.response)
+        resp.close()
+    return size
+
+
+def buffered(n):
+    listings = {}
+    for doc in lazy_cursor(n):
+        listings[str(doc['_id'])] = doc
+    return len(codec.dumps({'Listings': listings}))
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else NUM_LISTINGS
+    print(f'listings: {n}')
+    for name, fn in (('streamed NDJSON', stream), ('dict + dumps', buffered)):
+        secs, peak, size = measure(lambda: fn(n))
+        print(
+            f'{name:16}: {secs:6.2f} s, peak {peak / 1e6:8.1f} MB, '
+            f'{size / 1e6:8.1f} MB out'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark k-nearest city lookups against the in-memory spatial index.
+
+Usage:
+    python3 benchmarks/bench_geo.py [num_cities] [num_queries]
+"""
+import os
+import random
+import sys
+import time
+from unittest.mock import patch
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import cities.queries as cityqry  # noqa: E402
+import data.geo as geo  # noqa: E402
+
+NUM_CITIES = 300_000
+NUM_QUERIES = 1_000
+K = 10
+RADIUS_KM = 100.0
+SEED = 2026
+
+
+def synthetic_cities(n: int, seed: int = SEED) -> list:
+    rng = random.Random(seed)
+    return [
+        {
+            cityqry.NAME: f'City {i}',
+            cityqry.STATE_CODE: f'S{i % 500}',
+            cityqry.COUNTRY_CODE: f'C{i % 200}',
+            cityqry.LATITUDE: rng.uniform(-60, 70),
+            cityqry.LONGITUDE: rng.uniform(-180, 180),
+        }
+        for i in range(n)
+    ]
+
+
+def linear_knn(docs, lat, lon, radius_km, k):
+    hits = []
+    for doc in docs:
+        dist = geo.haversine_km(
+            lat, lon, doc[cityqry.LATITUDE], doc[cityqry.LONGITUDE],
+        )
+        if dist <= radius_km:
+            hits.append(dist)
+    return sorted(hits)[:k]
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else NUM_CITIES
+    n_queries = int(sys.argv[2]) if len(sys.argv) > 2 else NUM_QUERIES
+    docs = synthetic_cities(n)
+    rng = random.Random(SEED + 1)
+    queries = [
+        (rng.uniform(-60, 70), rng.uniform(-180, 180))
+        for _ in range(n_queries)
+    ]
+
+    cityqry.clear_cache()
+    start = time.perf_counter()
+    with patch('cities.queries.dbc.read', return_value=docs):
+        cityqry.load_cache()
+    build_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for lat, lon in queries:
+        cityqry.search_nearby(lat, lon, radius_km=RADIUS_KM, limit=K)
+    indexed_s = time.perf_counter() - start
+
+    n_linear = min(20, n_queries)
+    start = time.perf_counter()
+    for lat, lon in queries[:n_linear]:
+        linear_knn(docs, lat, lon, RADIUS_KM, K)
+    linear_s = time.perf_counter() - start
+
+    per_idx_ms = indexed_s / n_queries * 1000
+    per_lin_ms = linear_s / n_linear * 1000
+    print(f'cities: {n}, k={K}, radius={RADIUS_KM:g} km')
+    print(f'load_cache (incl. index build): {build_s:.2f} s')
+    print(f'indexed search_nearby: {per_idx_ms:.3f} ms/query')
+    print(f'linear scan:           {per_lin_ms:.3f} ms/query')
+    print(f'speedup: {per_lin_ms / per_idx_ms:.0f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Benchmark JSON encode throughput for /listings/read-shaped payloads:
+stdlib json vs. orjson (when installed), via server.json_codec.
+
+Usage:
+    python3 benchmarks/bench_json.py [num_listings] [rounds]
+"""
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import listings.queries as listingqry  # noqa: E402
+import server.json_codec as codec  # noqa: E402
+
+NUM_LISTINGS = 10_000
+ROUNDS = 5
+SEED = 2026
+
+
+def synthetic_listings(n: int, seed: int = SEED) -> dict:
+    """Listings with the fields create() stores, keyed like the cache."""
+    rng = random.Random(seed)
+    start = datetime(2025, 9, 1, tzinfo=timezone.utc)
+    out = {}
+    for i in range(n):
+        oid = ObjectId()
+        lat, lon = rng.uniform(25, 49), rng.uniform(-124, -67)
+        out[str(oid)] = {
+            '_id': oid,
+            listingqry.TITLE: f'Listing {i} - lightly used item',
+            listingqry.DESCRIPTION: 'Pick up near campus. ' * 3,
+            listingqry.IMAGES: [
+                f'https://res.cloudinary.com/demo/image/upload/{i}_{k}.jpg'
+                for k in range(rng.randint(0, 3))
+            ],
+            listingqry.TRANSACTION_TYPE: rng.choice(['free', 'sell']),
+            listingqry.OWNER: f'user{i % 500}@nyu.edu',
+            listingqry.CITY: 'New York',
+            listingqry.STATE: 'NY',
+            listingqry.COUNTRY: 'USA',
+            listingqry.PRICE: round(rng.uniform(0, 200), 2),
+            listingqry.NUM_LIKES: rng.randint(0, 50),
+            listingqry.STATUS: 'available',
+            listingqry.CREATED_AT: start + timedelta(minutes=i),
+            listingqry.LOCATION: {
+                'type': 'Point', 'coordinates': [lon, lat],
+            },
+        }
+    return out
+
+
+def throughput(encoder, body, rounds):
+    os.environ[codec.ENCODER_ENV] = encoder
+    size = len(codec.dumps(body))
+    start = time.perf_counter()
+    for _ in range(rounds):
+        codec.dumps(body)
+    secs = (time.perf_counter() - start) / rounds
+    return secs, size
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else NUM_LISTINGS
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else ROUNDS
+    listings = synthetic_listings(n)
+    body = {'Listings': listings, 'Number of Records': n}
+
+    encoders = [codec.STDLIB]
+    if codec.orjson is not None:
+        encoders.append(codec.ORJSON)
+    results = {}
+    print(f'listings: {n}, rounds: {rounds}')
+    for enc in encoders:
+        secs, size = throughput(enc, body, rounds)
+        results[enc] = secs
+        print(
+            f'{enc:7}: {secs * 1000:8.2f} ms/encode, '
+            f'{size / secs / 1e6:7.1f} MB/s, {n / secs:10.0f} docs/s'
+        )
+    if len(results) == 2:
+        print(f'speedup: {results[codec.STDLIB] / results[codec.ORJSON]:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
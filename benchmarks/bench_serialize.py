@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Benchmark /cities/read response cost: flask-restx serializing the cities
+dict on every request vs. the pre-encoded bytes kept per cache version,
+plain and gzipped.
+
+Usage:
+    python3 benchmarks/bench_serialize.py [num_cities] [num_requests]
+"""
+import os
+import statistics
+import sys
+import time
+from unittest.mock import patch
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import cities.queries as cityqry  # noqa: E402
+import server.endpoints as ep  # noqa: E402
+import server.http_cache as http_cache  # noqa: E402
+from benchmarks.bench_geo import synthetic_cities  # noqa: E402
+
+NUM_CITIES = 50_000
+NUM_REQUESTS = 20
+URL = f'{ep.CITIES_EPS}/{ep.READ}'
+
+
+def p50_ms(client, n, headers=None):
+    times = []
+    size = 0
+    for _ in range(n):
+        start = time.perf_counter()
+        resp = client.get(URL, headers=headers or {})
+        size = len(resp.data)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000, size
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else NUM_CITIES
+    n_req = int(sys.argv[2]) if len(sys.argv) > 2 else NUM_REQUESTS
+    cityqry.clear_cache()
+    with patch('cities.queries.dbc.read', return_value=synthetic_cities(n)):
+        cityqry.load_cache()
+    cityqry.cache_version()
+    http_cache.clear_encoded()
+    client = ep.app.test_client()
+
+    # Without a version the endpoint falls back to restx serialization.
+    with patch.object(cityqry, 'cache_version', return_value=None):
+        live_ms, live_size = p50_ms(client, n_req)
+
+    start = time.perf_counter()
+    client.get(URL, headers={'Accept-Encoding': 'gzip'})
+    first_s = time.perf_counter() - start
+    cached_ms, cached_size = p50_ms(client, n_req)
+    gz_ms, gz_size = p50_ms(client, n_req, {'Accept-Encoding': 'gzip'})
+
+    print(f'cities: {n}, requests: {n_req}')
+    print(f'serialize per request:  p50 {live_ms:8.2f} ms, {live_size} B')
+    print(f'first request (encode + gzip): {first_s * 1000:8.2f} ms')
+    print(f'pre-encoded:            p50 {cached_ms:8.2f} ms, {cached_size} B')
+    print(f'pre-encoded gzip:       p50 {gz_ms:8.2f} ms, {gz_size} B')
+    print(f'speedup: {live_ms / cached_ms:.0f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Benchmark /listings/read payload size and encode time for view=full vs.
+view=summary (listings.queries.make_summary).
+
+Usage:
+    python3 benchmarks/bench_views.py [num_listings] [rounds]
+"""
+import os
+import sys
+import time
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import listings.queries as listingqry  # noqa: E402
+import server.json_codec as codec  # noqa: E402
+from benchmarks.bench_json import synthetic_listings  # noqa: E402
+
+NUM_LISTINGS = 10_000
+ROUNDS = 5
+
+
+def encode_time(body, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        codec.dumps(body)
+    return (time.perf_counter() - start) / rounds
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else NUM_LISTINGS
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else ROUNDS
+    full = synthetic_listings(n)
+    start = time.perf_counter()
+    summary = {key: listingqry.make_summary(doc) for key, doc in full.items()}
+    build_s = time.perf_counter() - start
+
+    print(f'listings: {n}, rounds: {rounds}, encoder: {codec.encoder_name()}')
+    print(f'summary build (all listings): {build_s * 1000:.1f} ms')
+    rows = []
+    for name, listings in (('full', full), ('summary', summary)):
+        body = {'Listings': listings, 'Number of Records': n}
+        size = len(codec.dumps(body))
+        secs = encode_time(body, rounds)
+        rows.append((name, size, secs))
+        print(f'{name:>8}: {size / 1e6:7.2f} MB  encode {secs * 1000:7.1f} ms')
+    (_, full_size, full_s), (_, sum_size, sum_s) = rows
+    print(f'summary is {full_size / sum_size:.1f}x smaller, '
+          f'{full_s / sum_s:.1f}x faster to encode')
+
+
+if __name__ == '__main__':
+    main()
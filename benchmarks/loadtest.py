@@ -0,0 +1,475 @@
+#!/usr/bin/env python3
+"""
+HTTP load test modelling Swapify traffic.
+
+Closed-loop workers (one thread and one keep-alive connection each) pick
+a scenario by weight, run it, record its latency and go again, for
+--duration seconds. Scenario choice and request data come from --seed,
+so two runs send the same mix of requests.
+
+Scenarios (default weight):
+    browse_feed     10  GET /listings/read, summary view, random page
+    search           4  GET /listings/search?q=
+    open_listing     4  GET /listings/by-user (the seller's page)
+    login            1  POST /auth/login
+    like             2  POST /listings/like (Basic Auth)
+    create_listing   1  POST /listings/upload-image, then /listings/create
+
+Per scenario it reports count, errors, throughput and latency
+percentiles, and --out saves them as JSON; --compare fails the run when
+a scenario's p95 grew by more than --threshold.
+
+Against a running server, seed its database first (users `lt_*` with
+@loadtest.edu emails and their listings; --cleanup removes them):
+    python3 benchmarks/loadtest.py --base-url http://localhost:8000 \\
+        --setup --users 20 --listings 500
+Or let --serve run the app in this process on a free port, with
+Cloudinary mocked (AXIS_CLOUDINARY_MOCK=1):
+    python3 benchmarks/loadtest.py --serve --setup --cleanup \\
+        --duration 30 --concurrency 8 --out benchmarks/loadtest.json
+"""
+import argparse
+import base64
+import http.client
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+import threading
+import time
+import uuid
+from urllib.parse import urlencode, urlsplit
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from benchmarks.suite import compare, git_sha  # noqa: E402
+from server.metrics import quantile  # noqa: E402
+
+DURATION = 30
+CONCURRENCY = 8
+THRESHOLD = 0.25
+SEED = 2026
+USERS = 20
+LISTINGS = 500
+TIMEOUT = 30
+
+USER_PREFIX = 'lt_'
+EMAIL_DOMAIN = 'loadtest.edu'
+PASSWORD = 'loadtest-password'
+PAGE_SIZE = 20
+
+SEARCH_TERMS = ('lamp', 'desk', 'chair', 'bike', 'book', 'mini fridge')
+ADJECTIVES = ('used', 'like new', 'vintage', 'sturdy', 'small')
+# Any bytes do: the mock uploader only hashes them.
+IMAGE_BYTES = b'\xff\xd8\xff\xe0' + bytes(range(256)) * 16 + b'\xff\xd9'
+
+WEIGHTS = {
+    'browse_feed': 10,
+    'search': 4,
+    'open_listing': 4,
+    'login': 1,
+    'like': 2,
+    'create_listing': 1,
+}
+
+
+class HTTPError(Exception):
+    pass
+
+
+def user_email(i: int) -> str:
+    return f'{USER_PREFIX}{i}@{EMAIL_DOMAIN}'
+
+
+def basic_auth(email: str, password: str = PASSWORD) -> str:
+    token = base64.b64encode(f'{email}:{password}'.encode()).decode()
+    return f'Basic {token}'
+
+
+def listing_doc(rng, owner: str) -> dict:
+    item = rng.choice(SEARCH_TERMS)
+    return {
+        'title': f'{rng.choice(ADJECTIVES)} {item}',
+        'description': f'A {item} from a dorm move-out.',
+        'transaction_type': rng.choice(('sell', 'free')),
+        'owner': owner,
+        'city': 'New York',
+        'state': 'NY',
+        'country': 'USA',
+        'price': round(rng.uniform(0, 200), 2),
+    }
+
+
+class Client:
+    """One keep-alive connection; reconnects after errors."""
+
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        self._cls = (http.client.HTTPSConnection
+                     if parts.scheme == 'https'
+                     else http.client.HTTPConnection)
+        self._host = parts.netloc
+        self._conn = None
+
+    def request(self, method, path, params=None, body=None,
+                headers=None, expect=(200, 201)):
+        if params:
+            path = f'{path}?{urlencode(params)}'
+        if self._conn is None:
+            self._conn = self._cls(self._host, timeout=TIMEOUT)
+        try:
+            self._conn.request(method, path, body=body,
+                               headers=headers or {})
+            resp = self._conn.getresponse()
+            data = resp.read()
+        except (OSError, http.client.HTTPException):
+            self.close()
+            raise
+        if resp.status not in expect:
+            raise HTTPError(f'{method} {path} -> {resp.status}')
+        return json.loads(data) if data else None
+
+    def get(self, path, **params):
+        return self.request('GET', path, params=params)
+
+    def post_json(self, path, doc, params=None, auth=None):
+        headers = {'Content-Type': 'application/json'}
+        if auth:
+            headers['Authorization'] = auth
+        return self.request('POST', path, params=params,
+                            body=json.dumps(doc), headers=headers)
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def _multipart(field, filename, content):
+    boundary = uuid.uuid4().hex
+    body = (
+        f'--{boundary}\r\n'
+        f'Content-Disposition: form-data; name="{field}"; '
+        f'filename="{filename}"\r\n'
+        'Content-Type: image/jpeg\r\n\r\n'
+    ).encode() + content + f'\r\n--{boundary}--\r\n'.encode()
+    return body, f'multipart/form-data; boundary={boundary}'
+
+
+class Shared:
+    """State workers share: listing ids seen in feeds, user count."""
+
+    def __init__(self, users):
+        self.users = users
+        self.listing_ids = []
+        self._lock = threading.Lock()
+
+    def remember(self, items):
+        ids = [it['_id'] for it in items if it.get('_id')]
+        if ids:
+            with self._lock:
+                # Keep a bounded, recent sample.
+                self.listing_ids = (self.listing_ids + ids)[-1000:]
+
+    def some_listing(self, rng):
+        with self._lock:
+            return rng.choice(self.listing_ids) if self.listing_ids else None
+
+
+def browse_feed(client, rng, shared):
+    page = client.get('/listings/read', page=rng.randint(1, 5),
+                      page_size=PAGE_SIZE, view='summary')
+    shared.remember(page.get('items') or [])
+
+
+def search(client, rng, shared):
+    client.get('/listings/search', q=rng.choice(SEARCH_TERMS))
+
+
+def open_listing(client, rng, shared):
+    client.get('/listings/by-user',
+               username=user_email(rng.randrange(shared.users)))
+
+
+def login(client, rng, shared):
+    client.post_json('/auth/login', {
+        'email': user_email(rng.randrange(shared.users)),
+        'password': PASSWORD,
+    })
+
+
+def like(client, rng, shared):
+    listing_id = shared.some_listing(rng)
+    if listing_id is None:
+        return browse_feed(client, rng, shared)
+    client.request(
+        'POST', '/listings/like', params={'id': listing_id},
+        headers={'Authorization': basic_auth(
+            user_email(rng.randrange(shared.users)))},
+    )
+
+
+def create_listing(client, rng, shared):
+    email = user_email(rng.randrange(shared.users))
+    auth = basic_auth(email)
+    body, content_type = _multipart('image', 'photo.jpg', IMAGE_BYTES)
+    uploaded = client.request(
+        'POST', '/listings/upload-image', body=body,
+        headers={'Content-Type': content_type, 'Authorization': auth},
+    )
+    doc = listing_doc(rng, email)
+    doc['images'] = [uploaded['url']]
+    client.post_json('/listings/create', doc, auth=auth)
+
+
+SCENARIOS = {
+    'browse_feed': browse_feed,
+    'search': search,
+    'open_listing': open_listing,
+    'login': login,
+    'like': like,
+    'create_listing': create_listing,
+}
+
+
+def _worker(base_url, seed, deadline, weights, shared, record):
+    rng = random.Random(seed)
+    names = list(weights)
+    cum = list(itertools.accumulate(weights[n] for n in names))
+    client = Client(base_url)
+    try:
+        while time.monotonic() < deadline:
+            name = rng.choices(names, cum_weights=cum)[0]
+            start = time.perf_counter()
+            error = None
+            try:
+                SCENARIOS[name](client, rng, shared)
+            except (HTTPError, OSError, http.client.HTTPException,
+                    ValueError, KeyError, TypeError) as exc:
+                error = exc
+            record(name, time.perf_counter() - start, error)
+    finally:
+        client.close()
+
+
+def summarize(samples, errors, elapsed) -> dict:
+    """Per-scenario stats from latency lists (seconds)."""
+    results = {}
+    for name in sorted(set(samples) | set(errors)):
+        lat = sorted(samples.get(name, []))
+        count = len(lat) + errors.get(name, 0)
+        results[name] = {
+            'count': count,
+            'errors': errors.get(name, 0),
+            'rps': count / elapsed if elapsed else 0.0,
+            'median': quantile(lat, 0.5),
+            'p90': quantile(lat, 0.9),
+            'p95': quantile(lat, 0.95),
+            'p99': quantile(lat, 0.99),
+            'max': lat[-1] if lat else None,
+        }
+    return results
+
+
+def run(base_url, duration, concurrency, seed, users, weights=None,
+        log=print):
+    weights = weights or WEIGHTS
+    shared = Shared(users)
+    samples, errors, first_error = {}, {}, {}
+    lock = threading.Lock()
+
+    def record(name, secs, error):
+        with lock:
+            if error is None:
+                samples.setdefault(name, []).append(secs)
+            else:
+                errors[name] = errors.get(name, 0) + 1
+                first_error.setdefault(name, error)
+
+    # Prime the listing ids so early likes have something to hit.
+    try:
+        browse_feed(Client(base_url), random.Random(seed), shared)
+    except (HTTPError, OSError, http.client.HTTPException) as exc:
+        log(f'# warm-up request failed: {exc}')
+    deadline = time.monotonic() + duration
+    start = time.perf_counter()
+    threads = [
+        threading.Thread(
+            target=_worker, name=f'loadtest-{i}', daemon=True,
+            args=(base_url, seed + i, deadline, weights, shared, record),
+        )
+        for i in range(concurrency)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    for name, exc in sorted(first_error.items()):
+        log(f'# {name}: first error: {exc}')
+    return summarize(samples, errors, elapsed), elapsed
+
+
+def report_lines(results):
+    def ms(v):
+        return f'{v * 1000:9.1f}' if v is not None else f'{"-":>9}'
+    yield (f'{"scenario":16} {"count":>7} {"err":>5} {"rps":>8} '
+           f'{"p50 ms":>9} {"p90 ms":>9} {"p95 ms":>9} {"p99 ms":>9} '
+           f'{"max ms":>9}')
+    for name, r in results.items():
+        yield (f'{name:16} {r["count"]:7d} {r["errors"]:5d} '
+               f'{r["rps"]:8.1f} {ms(r["median"])} {ms(r["p90"])} '
+               f'{ms(r["p95"])} {ms(r["p99"])} {ms(r["max"])}')
+
+
+def setup(users, listings, seed, log=print):
+    """Create lt_* users and `listings` listings owned by them."""
+    import listings.queries as listingqry
+    import users.queries as userqry
+
+    rng = random.Random(seed)
+    userqry.load_cache()
+    for i in range(users):
+        if f'{USER_PREFIX}{i}' in userqry.cache:
+            continue
+        userqry.create({
+            userqry.USERNAME: f'{USER_PREFIX}{i}',
+            userqry.PASSWORD: PASSWORD,
+            userqry.NAME: f'Load Test {i}',
+            userqry.AGE: 20,
+            userqry.EMAIL: user_email(i),
+            userqry.CITY: 'New York',
+            userqry.STATE: 'NY',
+            userqry.COUNTRY: 'USA',
+        }, reload=False)
+    userqry.load_cache()
+    for _ in range(listings):
+        doc = listing_doc(rng, user_email(rng.randrange(users)))
+        doc['images'] = [
+            f'https://res.cloudinary.com/mock/image/upload/'
+            f'{rng.getrandbits(64):016x}.jpg'
+        ]
+        listingqry.create(doc, reload=False)
+    listingqry.load_cache()
+    log(f'# seeded {users} users, {listings} listings')
+
+
+def cleanup(log=print):
+    """Remove everything setup() and the run created."""
+    import data.db_connect as dbc
+    import listings.queries as listingqry
+    import users.queries as userqry
+
+    pattern = {'$regex': rf'@{EMAIL_DOMAIN.replace(".", r"[.]")}$'}
+    n_listings = dbc.delete_many(listingqry.LISTING_COLLECTION,
+                                 {listingqry.OWNER: pattern})
+    n_users = dbc.delete_many(userqry.USER_COLLECTION,
+                              {userqry.EMAIL: pattern})
+    listingqry.clear_cache()
+    userqry.clear_cache()
+    log(f'# removed {n_users} users, {n_listings} listings')
+
+
+def serve():
+    """Run the app in a background thread; returns (base_url, server)."""
+    from werkzeug.serving import make_server
+
+    os.environ.setdefault('AXIS_CLOUDINARY_MOCK', '1')
+    import server.endpoints as ep
+
+    srv = make_server('127.0.0.1', 0, ep.app, threaded=True)
+    threading.Thread(target=srv.serve_forever, name='loadtest-server',
+                     daemon=True).start()
+    return f'http://127.0.0.1:{srv.server_port}', srv
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--base-url', help='e.g. http://localhost:8000')
+    target.add_argument('--serve', action='store_true',
+                        help='run the app in-process with mock Cloudinary')
+    parser.add_argument('--duration', type=float, default=DURATION)
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY)
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--users', type=int, default=USERS)
+    parser.add_argument('--listings', type=int, default=LISTINGS)
+    parser.add_argument('--setup', action='store_true',
+                        help='seed lt_* users and listings first')
+    parser.add_argument('--cleanup', action='store_true',
+                        help='delete lt_* users and their listings after')
+    parser.add_argument('--weight', action='append', default=[],
+                        metavar='SCENARIO=N',
+                        help='override a scenario weight (0 disables it)')
+    parser.add_argument('--out', help='write JSON results here')
+    parser.add_argument('--compare', help='baseline JSON from --out')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD)
+    return parser.parse_args(argv)
+
+
+def parse_weights(overrides) -> dict:
+    weights = dict(WEIGHTS)
+    for item in overrides:
+        name, _, value = item.partition('=')
+        if name not in SCENARIOS:
+            raise ValueError(f'Unknown scenario: {name!r}')
+        weights[name] = int(value)
+    weights = {n: w for n, w in weights.items() if w > 0}
+    if not weights:
+        raise ValueError('Every scenario weight is 0')
+    return weights
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    weights = parse_weights(args.weight)
+    server = None
+    if args.serve:
+        base_url, server = serve()
+    else:
+        base_url = args.base_url.rstrip('/')
+    try:
+        if args.setup:
+            setup(args.users, args.listings, args.seed)
+        results, elapsed = run(base_url, args.duration, args.concurrency,
+                               args.seed, args.users, weights)
+    finally:
+        if args.cleanup:
+            cleanup()
+        if server is not None:
+            server.shutdown()
+    for line in report_lines(results):
+        print(line)
+    total = sum(r['count'] for r in results.values())
+    print(f'# {total} scenarios in {elapsed:.1f} s '
+          f'({total / elapsed:.1f}/s)')
+    report = {
+        'meta': {
+            'git_sha': git_sha(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'base_url': 'in-process' if args.serve else base_url,
+            'duration': args.duration,
+            'concurrency': args.concurrency,
+            'seed': args.seed,
+            'weights': weights,
+        },
+        'results': results,
+    }
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+        if compare(results, baseline, args.threshold, stat='p95'):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the query modules and JSON serialization.
+
+Every case runs at each requested data size and reports per-call time
+(min / median / mean over several rounds, loops auto-calibrated as
+timeit does). Data comes from data.synthetic, so every size is the same
+consistent world, just bigger. Results are written as JSON so two runs
+can be compared; with --compare the run fails when a case got slower
+than --threshold.
+
+Backends:
+    memory    (default) dbc.read is fed the synthetic documents directly;
+              measures our code, not Mongo.
+    mongomock documents are inserted into a mongomock client (needs the
+              `mongomock` package).
+    mongod    documents are inserted into a scratch database on the
+              MONGO_HOST/MONGO_PORT server, dropped afterwards.
+
+Usage:
+    python3 benchmarks/suite.py [--sizes 1000,100000] [--backend memory]
+        [--only listings] [--rounds 5] [--out results.json]
+        [--compare baseline.json] [--threshold 0.25]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import timeit
+from contextlib import ExitStack
+from unittest.mock import patch
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import cities.queries as cityqry  # noqa: E402
+import countries.queries as countryqry  # noqa: E402
+import data.db_connect as dbc  # noqa: E402
+import data.synthetic as synthetic  # noqa: E402
+import listings.queries as listingqry  # noqa: E402
+import server.json_codec as codec  # noqa: E402
+import states.queries as stateqry  # noqa: E402
+import users.queries as userqry  # noqa: E402
+
+SIZES = (1_000, 100_000)
+ROUNDS = 5
+THRESHOLD = 0.25
+SEED = 2026
+BENCH_DB = 'axis_bench'
+# Low bcrypt cost keeps setup fast; authenticate() cost scales with it.
+BCRYPT_ROUNDS = 4
+
+MEMORY = 'memory'
+MONGOMOCK = 'mongomock'
+MONGOD = 'mongod'
+BACKENDS = (MEMORY, MONGOMOCK, MONGOD)
+
+
+def generator(n: int) -> synthetic.Generator:
+    # Reference data stays small in reality; cap it.
+    countries = min(n, 250)
+    return synthetic.Generator(
+        seed=SEED, countries=countries,
+        states_per_country=max(1, min(n, 5_000) // countries),
+        cities=n, users=n, listings=n, bcrypt_rounds=BCRYPT_ROUNDS,
+    )
+
+
+def dataset(n: int) -> dict:
+    """collection -> documents for a run at size n."""
+    gen = generator(n)
+    return {kind: list(gen.iter_docs(kind)) for kind in synthetic.KINDS}
+
+
+class _ScratchClient:
+    """Routes dbc's default database to a scratch one."""
+
+    def __init__(self, client, db_name):
+        self._client = client
+        self._db_name = db_name
+
+    def __getitem__(self, name):
+        return self._client[self._db_name if name == dbc.GEO_DB else name]
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+def _memory_read(data):
+    def read(collection, db=dbc.GEO_DB, no_id=True):
+        out = []
+        for doc in data.get(collection, []):
+            doc = dict(doc)
+            if no_id:
+                doc.pop(dbc.MONGO_ID, None)
+            elif dbc.MONGO_ID in doc:
+                doc[dbc.MONGO_ID] = str(doc[dbc.MONGO_ID])
+            out.append(doc)
+        return out
+    return read
+
+
+def install(backend, data, stack: ExitStack):
+    """Make dbc serve `data` for the duration of `stack`."""
+    if backend == MEMORY:
+        stack.enter_context(patch.object(dbc, 'read', _memory_read(data)))
+        return
+    if backend == MONGOMOCK:
+        import mongomock
+        real = mongomock.MongoClient()
+    else:
+        real = dbc.connect_db()
+        if isinstance(real, _ScratchClient):
+            real = real._client
+    scratch = _ScratchClient(real, BENCH_DB)
+    real.drop_database(BENCH_DB)
+    for collection, docs in data.items():
+        if docs:
+            real[BENCH_DB][collection].insert_many(
+                [dict(doc) for doc in docs],
+            )
+    stack.enter_context(patch.object(dbc, 'client', scratch))
+    stack.callback(real.drop_database, BENCH_DB)
+
+
+def _clear_caches():
+    for mod in (cityqry, stateqry, countryqry, listingqry, userqry):
+        mod.clear_cache()
+
+
+def _warm(*mods):
+    for mod in mods:
+        mod.load_cache()
+
+
+def cases(n):
+    """(name, setup, fn) per case; setup runs untimed before timing."""
+    gen = generator(n)
+    last_user = gen.user(n - 1)[userqry.EMAIL]
+    user_name = gen.user(n // 2)[userqry.NAME]
+    city = gen.city(min(12, n - 1))
+    state = gen.state(1 % gen.sizes[stateqry.STATE_COLLECTION])
+    country = gen.country(1 % gen.sizes[countryqry.COUNTRY_COLLECTION])
+    listings_body = {}
+
+    def listings_json_setup():
+        listingqry.load_cache()
+        listings_body['body'] = {
+            'Listings': listingqry.cache, 'Number of Records': n,
+        }
+
+    return [
+        ('cities.load_cache', None, cityqry.load_cache),
+        ('listings.load_cache', None, listingqry.load_cache),
+        ('users.load_cache', None, userqry.load_cache),
+        ('cities.search_cities_by_name', lambda: _warm(cityqry),
+         lambda: cityqry.search_cities_by_name(city[cityqry.NAME][:5])),
+        ('states.search_states_by_name', lambda: _warm(stateqry),
+         lambda: stateqry.search_states_by_name(state[stateqry.NAME][:5])),
+        ('countries.search_countries_by_name', lambda: _warm(countryqry),
+         lambda: countryqry.search_countries_by_name(
+             country[countryqry.NAME][:5])),
+        ('listings.search_listings_by_title', lambda: _warm(listingqry),
+         lambda: listingqry.search_listings_by_title('lightly')),
+        ('users.search_users_by_name', lambda: _warm(userqry),
+         lambda: userqry.search_users_by_name(user_name)),
+        ('listings.read_paginated', lambda: _warm(listingqry),
+         lambda: listingqry.read_paginated(page=2, page_size=20)),
+        ('listings.read_paginated.summary', lambda: _warm(listingqry),
+         lambda: listingqry.read_paginated(page=2, view='summary')),
+        ('users.authenticate', lambda: _warm(userqry),
+         lambda: userqry.authenticate(last_user, synthetic.PASSWORD)),
+        ('cities.city_options', lambda: _warm(cityqry),
+         lambda: cityqry.city_options(
+             city[cityqry.STATE_CODE], city[cityqry.COUNTRY_CODE])),
+        ('states.state_options', lambda: _warm(stateqry),
+         lambda: stateqry.state_options(state[stateqry.COUNTRY_CODE])),
+        ('countries.country_options', lambda: _warm(countryqry),
+         countryqry.country_options),
+        ('json.listings_read', listings_json_setup,
+         lambda: codec.dumps(listings_body['body'])),
+    ]
+
+
+def measure(fn, rounds):
+    timer = timeit.Timer(fn)
+    loops, _ = timer.autorange()
+    per_call = [t / loops for t in timer.repeat(repeat=rounds, number=loops)]
+    return {
+        'min': min(per_call),
+        'median': statistics.median(per_call),
+        'mean': statistics.fmean(per_call),
+        'loops': loops,
+        'rounds': rounds,
+    }
+
+
+def run(sizes, backend, rounds, only=None, log=print):
+    results = {}
+    for n in sizes:
+        start = time.perf_counter()
+        data = dataset(n)
+        log(f'# size {n}: data generated in '
+            f'{time.perf_counter() - start:.1f} s')
+        with ExitStack() as stack:
+            install(backend, data, stack)
+            for name, setup, fn in cases(n):
+                if only and not any(o in name for o in only):
+                    continue
+                _clear_caches()
+                if setup is not None:
+                    setup()
+                res = measure(fn, rounds)
+                key = f'{name}[{n}]'
+                results[key] = res
+                log(f'{key:48} {res["median"] * 1000:12.4f} ms '
+                    f'(min {res["min"] * 1000:.4f})')
+        _clear_caches()
+    return results
+
+
+def git_sha():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=project_root,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold, log=print,
+            stat='median') -> list:
+    """Cases whose `stat` grew by more than threshold; logs every diff."""
+    regressions = []
+    for key, res in sorted(results.items()):
+        base = baseline.get(key)
+        if not base or not base.get(stat) or res.get(stat) is None:
+            continue
+        change = res[stat] / base[stat] - 1
+        flag = ''
+        if change > threshold:
+            regressions.append(key)
+            flag = '  REGRESSION'
+        log(f'{key:48} {change:+8.1%}{flag}')
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument(
+        '--sizes', default=','.join(str(s) for s in SIZES),
+        help='comma-separated record counts, e.g. 1000,100000,1000000',
+    )
+    parser.add_argument('--backend', choices=BACKENDS, default=MEMORY)
+    parser.add_argument('--rounds', type=int, default=ROUNDS)
+    parser.add_argument('--only', action='append',
+                        help='run cases whose name contains this')
+    parser.add_argument('--out', help='write JSON results here')
+    parser.add_argument('--compare', help='baseline JSON from --out')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    sizes = [int(s) for s in args.sizes.split(',') if s.strip()]
+    results = run(sizes, args.backend, args.rounds, args.only)
+    report = {
+        'meta': {
+            'git_sha': git_sha(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'backend': args.backend,
+            'json_encoder': codec.encoder_name(),
+            'sizes': sizes,
+        },
+        'results': results,
+    }
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,9 +2,13 @@
 """
 This file deals with our city-level data.
 """
+import threading
 from functools import wraps
 
+import data.cache_utils as cache_utils
 import data.db_connect as dbc
+import data.geo as geo
+import data.params as params
 from bson import ObjectId
 
 MIN_ID_LEN = 1
@@ -18,8 +22,17 @@ COUNTRY_CODE = 'country_code'
 LATITUDE = 'latitude'
 LONGITUDE = 'longitude'
 
+DISTANCE_KM = 'distance_km'
+
 _DEFAULT_COUNTRY = 'USA'
 
+NEARBY_RADIUS_KM_DEFAULT = 50.0
+NEARBY_RADIUS_KM_MAX = 1000.0
+NEARBY_LIMIT_DEFAULT = 20
+NEARBY_LIMIT_MAX = 100
+BBOX_LIMIT_DEFAULT = 500
+BBOX_LIMIT_MAX = 5000
+
 SAMPLE_CITY = {
     NAME: 'Los Angeles',
     STATE_CODE: 'CA',
@@ -33,44 +46,144 @@ SAMPLE_KEY = (
 )
 
 cache = None
+cache_utils.track(CITY_COLLECTION, lambda: cache)
+# Indexes derived from the cache (see cache_utils.Derived), each tied to
+# the dict it was built from.
+# Spatial index over cache keys; built by load_cache() with the cache.
+geo_index = cache_utils.Derived()
+# Per-level map clusters; built on first use after each cache load.
+cluster_grid = cache_utils.Derived()
+# Geohash-sorted keys for bbox lookups; built on first use after a load.
+bbox_index = cache_utils.Derived()
+# (country_code, state_code) -> sorted dropdown options; built on first use
+# after a load.
+options_index = cache_utils.Derived()
+# Content version of the loaded cache; computed by load_cache() before the
+# cache is published.
+version = cache_utils.Derived()
+# Held while a new cache is published, so a write's patch is never based
+# on a cache that is being replaced.
+_publish_lock = threading.Lock()
 
 
 def needs_cache(fn):
     @wraps(fn)
     def wrapper(*args, **kwargs):
         if not cache:
+            cache_utils.record_miss(CITY_COLLECTION)
             load_cache()
+        else:
+            cache_utils.record_hit(CITY_COLLECTION)
         return fn(*args, **kwargs)
     return wrapper
 
 
+def _cache_entry(city: dict):
+    """
+    (key, doc) for a city as load_cache() stores it, with name, state
+    and country normalized; None if it has no name or state.
+    """
+    nm = str(city.get(NAME, '') or '').strip()
+    sc = str(city.get(STATE_CODE, '') or '').strip().upper()
+    if not nm or not sc:
+        return None
+    cc_raw = city.get(COUNTRY_CODE)
+    cc = (
+        str(cc_raw).strip().upper()
+        if cc_raw is not None and str(cc_raw).strip()
+        else _DEFAULT_COUNTRY
+    )
+    doc = dict(city)
+    doc[NAME] = nm
+    doc[STATE_CODE] = sc
+    doc[COUNTRY_CODE] = cc
+    return f'{nm},{sc},{cc}', doc
+
+
+@cache_utils.timed_reload(CITY_COLLECTION)
 def load_cache():
+    """
+    Read every city into a new dict and publish it in one assignment,
+    with its spatial index and content version, so a concurrent request
+    sees either the old cache or the new one, never a half-filled dict.
+    """
     global cache
-    cache = {}
+    new_cache = {}
     cities = dbc.read(CITY_COLLECTION)
     for city in cities:
-        nm = str(city.get(NAME, '') or '').strip()
-        sc = str(city.get(STATE_CODE, '') or '').strip().upper()
-        if not nm or not sc:
-            continue
-        cc_raw = city.get(COUNTRY_CODE)
-        cc = (
-            str(cc_raw).strip().upper()
-            if cc_raw is not None and str(cc_raw).strip()
-            else _DEFAULT_COUNTRY
-        )
-        key = f'{nm},{sc},{cc}'
-        doc = dict(city)
-        doc[NAME] = nm
-        doc[STATE_CODE] = sc
-        doc[COUNTRY_CODE] = cc
-        cache[key] = doc
+        entry = _cache_entry(city)
+        if entry:
+            key, doc = entry
+            new_cache[key] = doc
+    version.prime(new_cache, cache_utils.content_version(new_cache))
+    geo_index.prime(new_cache, _build_geo_index(new_cache))
+    with _publish_lock:
+        cache = new_cache
+
+
+def _patch_cache(key: str, doc: dict = None) -> None:
+    """
+    Publish a copy of the cache with one city replaced (None removes it)
+    instead of reloading every city from Mongo. The spatial index and a
+    built cluster grid are copied and moved by that one point; the other
+    indexes and the version are recomputed on their next use. Nothing to
+    do while no cache is loaded.
+    """
+    global cache
+    with _publish_lock:
+        old = cache
+        if old is None:
+            return
+        new_cache = dict(old)
+        prev = new_cache.pop(key, None)
+        if doc is not None:
+            new_cache[key] = doc
+        before = geo.coords_of(prev, LATITUDE, LONGITUDE) if prev else None
+        after = geo.coords_of(doc, LATITUDE, LONGITUDE) if doc else None
+        idx = geo_index.get(old, _build_geo_index).copy()
+        if before:
+            idx.remove(key, *before)
+        if after:
+            idx.add(key, *after)
+        geo_index.prime(new_cache, idx)
+        grid = cluster_grid.peek(old)
+        if grid is not None:
+            grid = grid.copy()
+            if before:
+                grid.remove(*before)
+            if after:
+                grid.add(*after)
+            cluster_grid.prime(new_cache, grid)
+        cache = new_cache
 
 
 def clear_cache():
     """Clear the cache. Useful for testing."""
     global cache
     cache = None
+    for derived in (version, geo_index, cluster_grid, bbox_index,
+                    options_index):
+        derived.reset()
+
+
+def _build_geo_index(cities) -> geo.GridIndex:
+    idx = geo.GridIndex()
+    for key, city in cities.items():
+        coords = geo.coords_of(city, LATITUDE, LONGITUDE)
+        if coords:
+            idx.add(key, *coords)
+    return idx
+
+
+def cache_version():
+    """
+    Content version of the loaded cache (see data.cache_utils), or None
+    if nothing is loaded yet. Computed once per load.
+    """
+    loaded = cache
+    if loaded is None:
+        return None
+    return version.get(loaded, cache_utils.content_version)
 
 
 def _normalized_country(cc_raw):
@@ -155,10 +268,12 @@ def create(city, reload=True):
     doc[COUNTRY_CODE] = cc
     doc[LATITUDE] = float(doc[LATITUDE])
     doc[LONGITUDE] = float(doc[LONGITUDE])
+    # Taken before the insert, which adds an _id the cache never holds.
+    entry = _cache_entry(doc)
 
     rec_id = dbc.create(CITY_COLLECTION, doc)
-    if reload:
-        load_cache()
+    if reload and entry:
+        _patch_cache(*entry)
     return rec_id
 
 
@@ -177,6 +292,8 @@ def delete(
         ret = dbc.delete(CITY_COLLECTION, {dbc.MONGO_ID: obj_id})
         if ret < 1:
             raise ValueError(f'City not found: {name_or_id}')
+        # Cached cities carry no _id to find the deleted one by.
+        load_cache()
     else:
         # name + state_code + normalized country_code (defaults like create())
         nm = str(name_or_id).strip()
@@ -186,8 +303,7 @@ def delete(
         ret = dbc.delete_many(CITY_COLLECTION, filt)
         if ret < 1:
             raise ValueError(f'City not found: {nm}, {sc}, {cc}')
-
-    load_cache()
+        _patch_cache(f'{nm},{sc},{cc}')
     return bool(ret > 0)
 
 
@@ -196,6 +312,23 @@ def read() -> dict:
     return cache
 
 
+@needs_cache
+def get_coords(name: str, state_code: str, country_code: str = None):
+    """
+    Return (lat, lon) for a city identified like the cache key
+    (name, state_code, country_code defaulting to USA), or None if the
+    city is unknown or has no usable coordinates.
+    """
+    nm = str(name or '').strip()
+    sc = str(state_code or '').strip().upper()
+    if not nm or not sc:
+        return None
+    city = cache.get(f'{nm},{sc},{_normalized_country(country_code)}')
+    if not city:
+        return None
+    return geo.coords_of(city, LATITUDE, LONGITUDE)
+
+
 @needs_cache
 def search_cities_by_name(search_term: str) -> dict:
     """
@@ -224,6 +357,142 @@ def search_cities_by_name(search_term: str) -> dict:
     return matching_cities
 
 
+@needs_cache
+def search_nearby(
+    lat,
+    lon,
+    radius_km=NEARBY_RADIUS_KM_DEFAULT,
+    limit=NEARBY_LIMIT_DEFAULT,
+) -> list:
+    """
+    Return cities within radius_km of (lat, lon), nearest first.
+    Each result is a copy of the cached city with a 'distance_km' field.
+    Raises:
+        ValueError: on missing/out-of-range coordinates, radius or limit
+    """
+    lat = geo.parse_lat(lat)
+    lon = geo.parse_lon(lon)
+    radius_km = geo.parse_coord(
+        radius_km, 'radius_km', 0.0, NEARBY_RADIUS_KM_MAX,
+    )
+    limit = params.positive_int(limit, 'limit', NEARBY_LIMIT_MAX)
+
+    cities = cache
+    index = geo_index.get(cities, _build_geo_index)
+    results = []
+    for dist, key in index.nearby(lat, lon, radius_km, limit):
+        city = dict(cities[key])
+        city[DISTANCE_KM] = round(dist, 3)
+        results.append(city)
+    return results
+
+
+def _build_cluster_grid(cities) -> geo.ClusterGrid:
+    grid = geo.ClusterGrid()
+    for city in cities.values():
+        coords = geo.coords_of(city, LATITUDE, LONGITUDE)
+        if coords:
+            grid.add(*coords)
+    return grid
+
+
+@needs_cache
+def get_clusters(bbox: tuple, level: int) -> list:
+    """
+    City counts per map cell overlapping bbox at a cluster level
+    (see geo.cluster_level). The per-level grid is computed once per
+    cache load and reused by every viewport query.
+    """
+    return cluster_grid.get(cache, _build_cluster_grid).clusters(bbox, level)
+
+
+def _build_bbox_index(cities) -> geo.GeohashIndex:
+    idx = geo.GeohashIndex()
+    for key, city in cities.items():
+        coords = geo.coords_of(city, LATITUDE, LONGITUDE)
+        if coords:
+            idx.add(key, *coords)
+    idx.sort()
+    return idx
+
+
+@needs_cache
+def search_in_bbox(bbox: tuple, limit=BBOX_LIMIT_DEFAULT) -> tuple:
+    """
+    Cities inside bbox (west, south, east, north; west > east crosses the
+    antimeridian), via geohash prefix range scans.
+    Returns (dict keyed like read(), truncated) where truncated is True
+    when more than `limit` cities matched.
+    """
+    limit = params.positive_int(limit, 'limit', BBOX_LIMIT_MAX)
+    cities = cache
+    keys = bbox_index.get(cities, _build_bbox_index).in_bbox(bbox, limit + 1)
+    return {key: cities[key] for key in keys[:limit]}, len(keys) > limit
+
+
+def _build_options_index(cities) -> dict:
+    """
+    Group cities into {(country_code, state_code): [option, ...]} with
+    each list sorted by label, ready for /system/dropdown-options.
+    """
+    index = {}
+    for city in cities.values():
+        name = city.get(NAME, '')
+        sc = str(city.get(STATE_CODE, '') or '').strip().upper()
+        cc = _normalized_country(city.get(COUNTRY_CODE))
+        index.setdefault((cc, sc), []).append(
+            {'value': name, 'label': f'{name}, {sc}'}
+        )
+    for options in index.values():
+        options.sort(key=lambda o: o['label'].lower())
+    return index
+
+
+@needs_cache
+def city_options(state_code: str, country_code: str = None) -> list:
+    """
+    Sorted dropdown options ({value, label}) for the cities in a state.
+    country_code defaults to USA. The returned list is shared; callers
+    must not modify it.
+    """
+    index = options_index.get(cache, _build_options_index)
+    sc = str(state_code or '').strip().upper()
+    return index.get((_normalized_country(country_code), sc), [])
+
+
+def export(state_code=None, country_code=None, after=None, limit=None):
+    """
+    Stream cities straight from Mongo in _id order, bypassing the cache
+    so memory stays flat for any collection size.
+
+    state_code and country_code are optional case-insensitive filters;
+    country_code=USA also matches legacy docs without a country. `after`
+    is the _id of the last city already received; `limit` caps the count.
+    Invalid input raises ValueError before the generator is returned.
+    """
+    filt = {}
+    if state_code and str(state_code).strip():
+        filt[STATE_CODE] = dbc.icase_equals(state_code)
+    if country_code and str(country_code).strip():
+        cc = _normalized_country(country_code)
+        if cc == _DEFAULT_COUNTRY:
+            filt['$or'] = [
+                {COUNTRY_CODE: dbc.icase_equals(cc)},
+                {COUNTRY_CODE: {'$exists': False}},
+                {COUNTRY_CODE: None},
+                {COUNTRY_CODE: ''},
+            ]
+        else:
+            filt[COUNTRY_CODE] = dbc.icase_equals(cc)
+    return dbc.iter_docs(
+        CITY_COLLECTION,
+        filt,
+        after=after,
+        limit=params.optional_positive_int(limit, 'limit'),
+        no_id=False,
+    )
+
+
 def main():
     print(read())
 
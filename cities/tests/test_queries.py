@@ -1,5 +1,6 @@
 # To run test: PYTHONPATH=$(pwd) pytest -v cities/tests/test_queries.py
 
+import threading
 from copy import deepcopy
 from unittest.mock import patch
 
@@ -7,6 +8,7 @@ import pytest
 from bson import ObjectId
 
 import cities.queries as qry
+import data.cache_utils as cache_utils
 
 
 def safe_delete(city):
@@ -516,3 +518,242 @@ def test_search_trimming_and_case_insensitivity():
         assert 'Los Angeles' in names
         assert 'Los Angeles County' in names
         assert 'San Diego' not in names
+
+
+_NEARBY_DB = [
+    {'name': 'New York', 'state_code': 'NY', 'country_code': 'USA',
+     'latitude': 40.7128, 'longitude': -74.0060},
+    {'name': 'Newark', 'state_code': 'NJ', 'country_code': 'USA',
+     'latitude': '40.7357', 'longitude': '-74.1724'},
+    {'name': 'Los Angeles', 'state_code': 'CA', 'country_code': 'USA',
+     'latitude': 34.0522, 'longitude': -118.2437},
+    {'name': 'Nowhere', 'state_code': 'NY', 'country_code': 'USA'},
+]
+
+
+def test_search_nearby_sorted_with_distance():
+    qry.clear_cache()
+    with patch('cities.queries.dbc.read', return_value=_NEARBY_DB):
+        results = qry.search_nearby(40.7128, -74.0060, radius_km=50)
+    assert [c[qry.NAME] for c in results] == ['New York', 'Newark']
+    assert results[0][qry.DISTANCE_KM] == 0
+    assert results[1][qry.DISTANCE_KM] > 0
+    # Results are copies; the cached city does not gain distance_km.
+    assert qry.DISTANCE_KM not in qry.cache['New York,NY,USA']
+
+
+def test_search_nearby_limit():
+    qry.clear_cache()
+    with patch('cities.queries.dbc.read', return_value=_NEARBY_DB):
+        results = qry.search_nearby(
+            40.7357, -74.1724, radius_km=qry.NEARBY_RADIUS_KM_MAX, limit=1,
+        )
+    assert [c[qry.NAME] for c in results] == ['Newark']
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'lat': 'x', 'lon': 0},
+    {'lat': 0, 'lon': 200},
+    {'lat': 0, 'lon': 0, 'radius_km': -1},
+    {'lat': 0, 'lon': 0, 'radius_km': qry.NEARBY_RADIUS_KM_MAX + 1},
+    {'lat': 0, 'lon': 0, 'limit': 0},
+    {'lat': 0, 'lon': 0, 'limit': 'many'},
+])
+def test_search_nearby_invalid_inputs(kwargs):
+    qry.clear_cache()
+    with patch('cities.queries.dbc.read', return_value=_NEARBY_DB):
+        with pytest.raises(ValueError):
+            qry.search_nearby(**kwargs)
+
+
+def test_get_coords_normalizes_key():
+    qry.clear_cache()
+    with patch('cities.queries.dbc.read', return_value=_NEARBY_DB):
+        assert qry.get_coords(' Newark ', 'nj') == (40.7357, -74.1724)
+        assert qry.get_coords('Newark', 'NJ', 'usa') == (40.7357, -74.1724)
+        assert qry.get_coords('Newark', 'NJ', 'CAN') is None
+        assert qry.get_coords('Nowhere', 'NY') is None
+        assert qry.get_coords('', 'NY') is None
+
+
+def test_get_clusters_built_once_per_load():
+    qry.clear_cache()
+    with patch('cities.queries.dbc.read', return_value=_NEARBY_DB):
+        world = (-180, -85, 180, 85)
+        clusters = qry.get_clusters(world, 0)
+        assert clusters[0]['count'] == 3  # 'Nowhere' has no coordinates
+        grid = qry.cluster_grid.peek(qry.cache)
+        assert grid is not None
+        qry.get_clusters(world, 4)
+        assert qry.cluster_grid.peek(qry.cache) is grid
+        qry.load_cache()
+        assert qry.cluster_grid.peek(qry.cache) is None
+
+
+def test_writes_patch_clusters_without_reloading():
+    qry.clear_cache()
+    with patch('cities.queries.dbc.read', return_value=_NEARBY_DB):
+        qry.load_cache()
+    world = (-180, -85, 180, 85)
+    assert qry.get_clusters(world, 0)[0]['count'] == 3
+    before = qry.cache
+    hoboken = {'name': 'Hoboken', 'state_code': 'nj',
+               'latitude': '40.7440', 'longitude': '-74.0324'}
+    with patch('cities.queries.dbc.read') as fake_read, \
+            patch('cities.queries.dbc.create', return_value='new-id'):
+        qry.create(hoboken)
+        assert qry.get_clusters(world, 0)[0]['count'] == 4
+        nearby = [c['name'] for c in qry.search_nearby(40.744, -74.0324, 1)]
+        assert nearby == ['Hoboken']
+        assert 'Hoboken,NJ,USA' in qry.read()
+        with patch('cities.queries.dbc.delete_many', return_value=1):
+            qry.delete('Hoboken', 'nj')
+        assert qry.get_clusters(world, 0)[0]['count'] == 3
+        assert qry.search_nearby(40.744, -74.0324, 1) == []
+        fake_read.assert_not_called()
+    # Requests still holding the old cache see it unchanged.
+    assert 'Hoboken,NJ,USA' not in before
+    assert qry.cache_version() == cache_utils.content_version(qry.cache)
+    qry.clear_cache()
+
+
+def test_search_in_bbox():
+    qry.clear_cache()
+    with patch('cities.queries.dbc.read', return_value=_NEARBY_DB):
+        cities, truncated = qry.search_in_bbox((-75, 40, -73, 41))
+        assert set(cities) == {'New York,NY,USA', 'Newark,NJ,USA'}
+        assert truncated is False
+        cities, truncated = qry.search_in_bbox((-75, 40, -73, 41), limit=1)
+        assert len(cities) == 1
+        assert truncated is True
+        with pytest.raises(ValueError):
+            qry.search_in_bbox((-75, 40, -73, 41), limit=0)
+
+
+def test_search_in_bbox_across_antimeridian():
+    fiji = [
+        {'name': 'Suva', 'state_code': 'C', 'country_code': 'FJI',
+         'latitude': -18.14, 'longitude': 178.44},
+        {'name': 'Apia', 'state_code': 'TU', 'country_code': 'WSM',
+         'latitude': -13.83, 'longitude': -171.76},
+        {'name': 'Cairns', 'state_code': 'QLD', 'country_code': 'AUS',
+         'latitude': -16.92, 'longitude': 145.77},
+    ]
+    qry.clear_cache()
+    with patch('cities.queries.dbc.read', return_value=fiji):
+        cities, _ = qry.search_in_bbox((175, -20, -170, -10))
+    assert {c['name'] for c in cities.values()} == {'Suva', 'Apia'}
+
+
+_OPTIONS_DB = [
+    {'name': 'Buffalo', 'state_code': 'NY', 'country_code': 'USA'},
+    {'name': 'Albany', 'state_code': 'ny', 'country_code': 'USA'},
+    {'name': 'Houston', 'state_code': 'TX', 'country_code': 'USA'},
+    {'name': 'Seattle', 'state_code': 'WA'},
+    {'name': 'Perth', 'state_code': 'WA', 'country_code': 'AUS'},
+]
+
+
+def test_city_options_sorted_per_state_and_country():
+    qry.clear_cache()
+    with patch('cities.queries.dbc.read', return_value=_OPTIONS_DB):
+        assert qry.city_options('ny') == [
+            {'value': 'Albany', 'label': 'Albany, NY'},
+            {'value': 'Buffalo', 'label': 'Buffalo, NY'},
+        ]
+        # Missing country_code on a city and in the request both mean USA.
+        assert [o['value'] for o in qry.city_options('WA')] == ['Seattle']
+        assert [o['value'] for o in qry.city_options('wa', 'aus')] == [
+            'Perth',
+        ]
+        assert qry.city_options('ZZ') == []
+
+
+def test_city_options_index_reset_on_load():
+    qry.clear_cache()
+    with patch('cities.queries.dbc.read', return_value=_OPTIONS_DB):
+        qry.city_options('NY')
+        assert qry.options_index.peek(qry.cache) is not None
+        qry.load_cache()
+        assert qry.options_index.peek(qry.cache) is None
+
+
+def test_indexes_follow_the_cache_they_were_built_from():
+    qry.clear_cache()
+    with patch('cities.queries.dbc.read', return_value=_NEARBY_DB):
+        qry.load_cache()
+    old_cache = qry.cache
+    assert qry.city_options('NY')
+    world = (-180, -85, 180, 85)
+    assert qry.get_clusters(world, 0)[0]['count'] == 3
+    with patch('cities.queries.dbc.read', return_value=_OPTIONS_DB):
+        qry.load_cache()
+    # Built for the old dict, so rebuilt for the new one on first use.
+    assert [o['value'] for o in qry.city_options('NY')] == [
+        'Albany', 'Buffalo',
+    ]
+    assert qry.get_clusters(world, 0) == []
+    assert qry.search_in_bbox(world) == ({}, False)
+    assert qry.options_index.peek(old_cache) is None
+    qry.clear_cache()
+
+
+def test_cache_version_tracks_loads():
+    qry.clear_cache()
+    assert qry.cache_version() is None
+    with patch('cities.queries.dbc.read', return_value=_OPTIONS_DB):
+        qry.load_cache()
+        first = qry.cache_version()
+        assert first and qry.cache_version() == first
+        qry.load_cache()
+        assert qry.cache_version() == first
+    with patch('cities.queries.dbc.read', return_value=_OPTIONS_DB[:1]):
+        qry.load_cache()
+        assert qry.cache_version() != first
+    qry.clear_cache()
+
+
+def test_reload_publishes_cache_and_version_together():
+    qry.clear_cache()
+    with patch('cities.queries.dbc.read', return_value=_OPTIONS_DB[:1]):
+        qry.load_cache()
+    old_cache, old_version = qry.cache, qry.cache_version()
+    halfway = threading.Event()
+    resume = threading.Event()
+
+    def slow_read(collection):
+        yield _OPTIONS_DB[0]
+        halfway.set()
+        resume.wait(5)
+        yield from _OPTIONS_DB[1:]
+
+    with patch('cities.queries.dbc.read', side_effect=slow_read):
+        loader = threading.Thread(target=qry.load_cache)
+        loader.start()
+        assert halfway.wait(5)
+        # Mid-load, readers still get the old cache and its version.
+        assert qry.cache is old_cache
+        assert qry.cache_version() == old_version
+        resume.set()
+        loader.join(5)
+    assert len(qry.cache) == len(_OPTIONS_DB)
+    assert qry.cache_version() == cache_utils.content_version(qry.cache)
+    assert qry.cache_version() != old_version
+    qry.clear_cache()
+
+
+def test_export_filters_and_legacy_usa():
+    with patch('cities.queries.dbc.iter_docs', return_value=iter([])) as m:
+        assert list(qry.export(state_code='ny', country_code='usa')) == []
+    filt = m.call_args.args[1]
+    assert filt[qry.STATE_CODE]['$options'] == 'i'
+    assert {qry.COUNTRY_CODE: {'$exists': False}} in filt['$or']
+    with patch('cities.queries.dbc.iter_docs', return_value=iter([])) as m:
+        qry.export(country_code='aus', limit=10)
+    assert set(m.call_args.args[1]) == {qry.COUNTRY_CODE}
+    assert m.call_args.kwargs['limit'] == 10
+
+
+def test_export_rejects_bad_limit():
+    with pytest.raises(ValueError):
+        qry.export(limit='-1')
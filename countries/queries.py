@@ -4,6 +4,7 @@ This file deals with our country-level data.
 """
 from functools import wraps
 
+import data.cache_utils as cache_utils
 import data.db_connect as dbc
 from bson import ObjectId
 
@@ -22,20 +23,35 @@ SAMPLE_COUNTRY = {
 SAMPLE_KEY = SAMPLE_COUNTRY[CODE]
 
 cache = None
+cache_utils.track(COUNTRY_COLLECTION, lambda: cache)
+# Sorted dropdown options; built on first use after a load.
+options_list = cache_utils.Derived()
+# Content version of the loaded cache; computed by load_cache() before the
+# cache is published.
+version = cache_utils.Derived()
 
 
 def needs_cache(fn):
     @wraps(fn)
     def wrapper(*args, **kwargs):
         if not cache:
+            cache_utils.record_miss(COUNTRY_COLLECTION)
             load_cache()
+        else:
+            cache_utils.record_hit(COUNTRY_COLLECTION)
         return fn(*args, **kwargs)
     return wrapper
 
 
+@cache_utils.timed_reload(COUNTRY_COLLECTION)
 def load_cache():
+    """
+    Read every country into a new dict and publish it in one assignment,
+    with its content version, so a concurrent request never sees a
+    half-filled cache.
+    """
     global cache
-    cache = {}
+    new_cache = {}
     countries = dbc.read(COUNTRY_COLLECTION)
     for country in countries:
         code = str(country.get(CODE, '') or '').strip().upper()
@@ -43,13 +59,28 @@ def load_cache():
             continue
         doc = dict(country)
         doc[CODE] = code
-        cache[code] = doc
+        new_cache[code] = doc
+    version.prime(new_cache, cache_utils.content_version(new_cache))
+    cache = new_cache
 
 
 def clear_cache():
     """Clear the cache. Useful for testing."""
     global cache
     cache = None
+    options_list.reset()
+    version.reset()
+
+
+def cache_version():
+    """
+    Content version of the loaded cache (see data.cache_utils), or None
+    if nothing is loaded yet. Computed once per load.
+    """
+    loaded = cache
+    if loaded is None:
+        return None
+    return version.get(loaded, cache_utils.content_version)
 
 
 def is_valid_id(_id: str) -> bool:
@@ -146,6 +177,25 @@ def search_countries_by_name(search_term: str) -> dict:
     return matching_countries
 
 
+def _build_options_list(countries) -> list:
+    options = []
+    for country in countries.values():
+        code = country.get(CODE, '')
+        name = country.get(NAME, code)
+        options.append({'value': code, 'label': f'{name} ({code})'})
+    options.sort(key=lambda o: o['label'].lower())
+    return options
+
+
+@needs_cache
+def country_options() -> list:
+    """
+    Sorted dropdown options ({value, label}) for every country.
+    The returned list is shared; callers must not modify it.
+    """
+    return options_list.get(cache, _build_options_list)
+
+
 def main():
     print(read())
 
@@ -439,3 +439,17 @@ def test_create_rejects_whitespace_fields():
     for data in bad_inputs:
         with pytest.raises(ValueError):
             qry.create(data)
+
+
+def test_country_options_sorted_by_label():
+    sample_db = [
+        {'name': 'United States', 'code': 'USA'},
+        {'name': 'Canada', 'code': 'can'},
+    ]
+    qry.clear_cache()
+    with patch('countries.queries.dbc.read', return_value=sample_db):
+        assert qry.country_options() == [
+            {'value': 'CAN', 'label': 'Canada (CAN)'},
+            {'value': 'USA', 'label': 'United States (USA)'},
+        ]
+    qry.clear_cache()
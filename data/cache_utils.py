@@ -0,0 +1,216 @@
+"""
+Helpers shared by the in-memory query caches: content versions, values
+derived from a cache, and hit/miss/reload statistics.
+"""
+import hashlib
+import json
+import sys
+import threading
+import time
+from functools import wraps
+
+import data.tracing as tracing
+
+VERSION_LEN = 32
+
+
+def content_version(data) -> str:
+    """
+    Strong, deterministic version string for a cache's content.
+
+    Two workers that load the same documents get the same version, so it
+    can be used as an HTTP ETag without sticky sessions. Key order does
+    not matter.
+    """
+    blob = json.dumps(
+        data, sort_keys=True, separators=(',', ':'), default=str,
+    ).encode('utf-8')
+    return hashlib.blake2b(blob, digest_size=VERSION_LEN // 2).hexdigest()
+
+
+class Derived:
+    """
+    A value computed from one cache dict (its version, an index).
+
+    It remembers which dict it was built from and rebuilds when asked
+    about any other, so a request holding the dict from before a reload
+    never pairs it with the index of the new one. load_cache() builds the
+    new dict in a local, may prime() values for it, and only then assigns
+    it to the module's `cache` global.
+    """
+
+    def __init__(self):
+        # (source dict, value), swapped as one object.
+        self._memo = (None, None)
+
+    def get(self, data, build):
+        """The value for `data`, calling build(data) if there is none."""
+        source, value = self._memo
+        if source is not data:
+            value = build(data)
+            self._memo = (data, value)
+        return value
+
+    def peek(self, data):
+        """The value built for `data`, or None if there is none yet."""
+        source, value = self._memo
+        return value if source is data else None
+
+    def prime(self, data, value):
+        self._memo = (data, value)
+        return value
+
+    def reset(self):
+        self._memo = (None, None)
+
+
+# collection -> counters; see snapshot().
+_stats = {}
+_stats_lock = threading.Lock()
+# collection -> callable returning that module's current cache.
+_sources = {}
+# collection -> ((id, len) of the cache last measured, bytes).
+_size_memo = {}
+
+
+def _entry(name):
+    return _stats.setdefault(name, {
+        'hits': 0,
+        'misses': 0,
+        'reloads': 0,
+        'reload_errors': 0,
+        'reload_seconds': 0.0,
+        'last_reload_seconds': None,
+        'max_reload_seconds': 0.0,
+    })
+
+
+def track(name, get_cache):
+    """Register a module's cache so snapshot() can report its size."""
+    _sources[name] = get_cache
+    with _stats_lock:
+        _entry(name)
+
+
+def record_hit(name):
+    with _stats_lock:
+        _entry(name)['hits'] += 1
+
+
+def record_miss(name):
+    with _stats_lock:
+        _entry(name)['misses'] += 1
+
+
+def timed_reload(name):
+    """Decorator for load_cache(): counts and times full reloads."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                with tracing.span('cache.reload', collection=name):
+                    result = fn(*args, **kwargs)
+            except Exception:
+                with _stats_lock:
+                    _entry(name)['reload_errors'] += 1
+                raise
+            secs = time.perf_counter() - start
+            with _stats_lock:
+                st = _entry(name)
+                st['reloads'] += 1
+                st['reload_seconds'] += secs
+                st['last_reload_seconds'] = secs
+                st['max_reload_seconds'] = max(st['max_reload_seconds'], secs)
+            return result
+        return wrapper
+    return decorator
+
+
+def approx_bytes(obj) -> int:
+    """
+    Rough deep size of plain containers (dict/list/tuple/set and their
+    contents) via sys.getsizeof. Shared objects are counted once.
+    """
+    seen = set()
+    total = 0
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+    return total
+
+
+def _size(name, cache):
+    if not cache:
+        return 0, 0
+    # Reloads build a new dict, so (id, len) only changes when the
+    # content was replaced; in-place patches keep the old estimate.
+    key = (id(cache), len(cache))
+    memo = _size_memo.get(name)
+    if memo is None or memo[0] != key:
+        memo = _size_memo[name] = (key, approx_bytes(cache))
+    return len(cache), memo[1]
+
+
+def snapshot() -> dict:
+    """Counters plus current entries / approx bytes, per collection."""
+    with _stats_lock:
+        out = {name: dict(st) for name, st in _stats.items()}
+    for name, st in out.items():
+        get_cache = _sources.get(name)
+        entries, nbytes = _size(name, get_cache() if get_cache else None)
+        st['entries'] = entries
+        st['approx_bytes'] = nbytes
+        lookups = st['hits'] + st['misses']
+        st['hit_ratio'] = round(st['hits'] / lookups, 4) if lookups else None
+    return out
+
+
+def reset_stats():
+    """Zero the counters (tracked caches stay registered)."""
+    with _stats_lock:
+        for name in list(_stats):
+            del _stats[name]
+            _entry(name)
+        _size_memo.clear()
+
+
+def metric_families():
+    """Cache stats for server.metrics.register_collector()."""
+    snap = sorted(snapshot().items())
+
+    def samples(field):
+        return [
+            ({'collection': name}, st[field])
+            for name, st in snap
+            if st[field] is not None
+        ]
+    return [
+        ('cache_hits_total', 'counter',
+         'needs_cache lookups served from memory.', samples('hits')),
+        ('cache_misses_total', 'counter',
+         'needs_cache lookups that had to load the cache.',
+         samples('misses')),
+        ('cache_reloads_total', 'counter',
+         'Full cache reloads from Mongo.', samples('reloads')),
+        ('cache_reload_errors_total', 'counter',
+         'Cache reloads that raised.', samples('reload_errors')),
+        ('cache_reload_seconds_total', 'counter',
+         'Time spent in full reloads.', samples('reload_seconds')),
+        ('cache_last_reload_seconds', 'gauge',
+         'Duration of the most recent reload.',
+         samples('last_reload_seconds')),
+        ('cache_entries', 'gauge',
+         'Entries in the cache.', samples('entries')),
+        ('cache_approx_bytes', 'gauge',
+         'Approximate deep size of the cache.', samples('approx_bytes')),
+    ]
@@ -8,20 +8,39 @@ Required environment variables:
                              Settings > API Keys > API key
     CLOUDINARY_API_SECRET  — found in your Cloudinary dashboard under
                              Settings > API Keys > API secret
+
+For local load tests set AXIS_CLOUDINARY_MOCK=1: nothing is uploaded,
+upload_image() returns a fake URL derived from the file's bytes after
+AXIS_CLOUDINARY_MOCK_LATENCY_MS (default 0) milliseconds.
 """
+import hashlib
 import os
+import time
 
-import cloudinary
-import cloudinary.api
-import cloudinary.uploader
+import data.tracing as tracing
 
 CLOUDINARY_FOLDER = 'axis_listings'
 
+MOCK_ENV = 'AXIS_CLOUDINARY_MOCK'
+MOCK_LATENCY_ENV = 'AXIS_CLOUDINARY_MOCK_LATENCY_MS'
+MOCK_URL_PREFIX = 'https://res.cloudinary.com/mock/image/upload/'
+
 CLOUD_NAME = os.environ.get('CLOUDINARY_CLOUD_NAME')
 API_KEY = os.environ.get('CLOUDINARY_API_KEY')
 API_SECRET = os.environ.get('CLOUDINARY_API_SECRET')
 
 
+def _sdk():
+    """
+    The cloudinary package, imported on first use: it is slow to import
+    and most processes never talk to Cloudinary.
+    """
+    import cloudinary
+    import cloudinary.api
+    import cloudinary.uploader
+    return cloudinary
+
+
 def _configure():
     if not CLOUD_NAME:
         raise ValueError(
@@ -35,20 +54,42 @@ def _configure():
         raise ValueError(
             'CLOUDINARY_API_SECRET environment variable is not set.'
         )
+    cloudinary = _sdk()
     cloudinary.config(
         cloud_name=CLOUD_NAME,
         api_key=API_KEY,
         api_secret=API_SECRET,
         secure=True,
     )
+    return cloudinary
+
+
+def is_mock() -> bool:
+    return os.environ.get(MOCK_ENV, '0').strip() == '1'
+
+
+def _mock_upload(file) -> str:
+    if isinstance(file, str):
+        data = file.encode('utf-8')
+    else:
+        data = file.read()
+    try:
+        latency_ms = float(os.environ.get(MOCK_LATENCY_ENV, '0') or 0)
+    except ValueError:
+        latency_ms = 0
+    if latency_ms > 0:
+        time.sleep(latency_ms / 1000)
+    digest = hashlib.sha1(data).hexdigest()[:16]
+    return f'{MOCK_URL_PREFIX}{CLOUDINARY_FOLDER}/{digest}.jpg'
 
 
 def ping() -> None:
     """
     Verify Cloudinary credentials and reachability. Raises on failure.
     """
-    _configure()
-    cloudinary.api.ping()
+    if is_mock():
+        return
+    _configure().api.ping()
 
 
 def upload_image(file) -> str:
@@ -66,10 +107,14 @@ def upload_image(file) -> str:
         ValueError: If Cloudinary credentials are missing.
         Exception: If the Cloudinary upload fails.
     """
-    _configure()
-    result = cloudinary.uploader.upload(
-        file,
-        folder=CLOUDINARY_FOLDER,
-        resource_type='image',
-    )
+    if is_mock():
+        with tracing.span('cloudinary.upload', mock=True):
+            return _mock_upload(file)
+    cloudinary = _configure()
+    with tracing.span('cloudinary.upload'):
+        result = cloudinary.uploader.upload(
+            file,
+            folder=CLOUDINARY_FOLDER,
+            resource_type='image',
+        )
     return result['secure_url']
@@ -0,0 +1,149 @@
+"""
+In-process write coalescing for hot `$inc` counters (e.g. num_likes).
+
+Deltas are summed per document in memory and written with one unordered
+`bulk_write` every `flush_ms` or after `max_ops` increments, whichever
+comes first, and once more at interpreter shutdown. A burst of 500 likes
+on one listing becomes a single `$inc: 500`.
+
+The trade-off is durability: deltas not yet flushed are lost if the
+process is killed hard, and other instances see them late. Callers
+choose per counter whether that is acceptable (see listings.queries).
+"""
+import atexit
+import logging
+import threading
+
+from bson import ObjectId
+
+import data.db_connect as dbc
+
+logger = logging.getLogger(__name__)
+
+FLUSH_MS_DEFAULT = 500
+MAX_OPS_DEFAULT = 200
+
+
+class CounterBuffer:
+    def __init__(
+        self,
+        collection: str,
+        field: str,
+        flush_ms: int = FLUSH_MS_DEFAULT,
+        max_ops: int = MAX_OPS_DEFAULT,
+        db: str = dbc.GEO_DB,
+    ):
+        """
+        flush_ms <= 0 disables the timer (flush on max_ops / shutdown /
+        explicit flush() only).
+        """
+        self.collection = collection
+        self.field = field
+        self.flush_ms = flush_ms
+        self.max_ops = max(1, max_ops)
+        self.db = db
+        self._pending = {}
+        self._ops = 0
+        self._lock = threading.Lock()
+        # Serializes flushes so a failed batch is merged back before the
+        # next one is taken.
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._at_exit = False
+        self._stats = {'adds': 0, 'flushes': 0, 'docs_written': 0,
+                       'failed_flushes': 0}
+
+    def add(self, key: str, delta: int) -> None:
+        """Queue `delta` for document `key` (an _id string)."""
+        with self._lock:
+            self._pending[key] = self._pending.get(key, 0) + delta
+            self._ops += 1
+            self._stats['adds'] += 1
+            full = self._ops >= self.max_ops
+        self._ensure_at_exit()
+        self._ensure_timer()
+        if full:
+            self.flush()
+
+    def pending(self) -> dict:
+        """Unflushed net deltas by key."""
+        with self._lock:
+            return {k: d for k, d in self._pending.items() if d}
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self._stats)
+            out['pending_docs'] = sum(1 for d in self._pending.values() if d)
+        return out
+
+    def flush(self) -> int:
+        """
+        Write all pending deltas in one bulk_write. Returns the number of
+        documents written. On failure the deltas are put back so the next
+        flush retries them.
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch = {k: d for k, d in self._pending.items() if d}
+                self._pending = {}
+                self._ops = 0
+            if not batch:
+                return 0
+            from pymongo import UpdateOne  # see db_connect: lazy pymongo
+            requests = [
+                UpdateOne(
+                    {dbc.MONGO_ID: ObjectId(key)},
+                    {'$inc': {self.field: delta}},
+                )
+                for key, delta in batch.items()
+            ]
+            try:
+                dbc.bulk_write(self.collection, requests, db=self.db)
+            except Exception:
+                logger.exception('counter flush to %s.%s failed; will retry',
+                                 self.collection, self.field)
+                with self._lock:
+                    for key, delta in batch.items():
+                        self._pending[key] = self._pending.get(key, 0) + delta
+                    self._stats['failed_flushes'] += 1
+                return 0
+            with self._lock:
+                self._stats['flushes'] += 1
+                self._stats['docs_written'] += len(batch)
+            return len(batch)
+
+    def _ensure_at_exit(self):
+        # Registered on the first add whether or not there is a timer:
+        # with flush_ms <= 0 the shutdown flush is the only one left.
+        if self._at_exit:
+            return
+        with self._lock:
+            if self._at_exit:
+                return
+            self._at_exit = True
+        atexit.register(self.close)
+
+    def _ensure_timer(self):
+        if self.flush_ms <= 0 or self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._run,
+                name=f'counter-flush-{self.collection}.{self.field}',
+                daemon=True,
+            )
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_ms / 1000):
+            self.flush()
+
+    def close(self) -> None:
+        """Stop the timer and flush whatever is left (runs at exit)."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.flush()
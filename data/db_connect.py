@@ -1,14 +1,20 @@
 """
 All interaction with MongoDB should be through this file!
 We may be required to use a new database at any point.
+
+pymongo itself is imported on first connect, not at import time: it
+is slow to import, and nothing needs it before the first query.
 """
 import logging
 import os
+import re
 
-import certifi
-import pymongo as pm
+from bson import ObjectId
+from bson.errors import InvalidId
 from functools import wraps
 
+import data.db_monitor as db_monitor
+
 logger = logging.getLogger(__name__)
 
 LOCAL = "0"
@@ -22,6 +28,9 @@ MONGO_ID = '_id'
 
 MIN_ID_LEN = 4
 
+# Docs per round trip for streamed reads (iter_docs).
+ITER_BATCH_SIZE = 1000
+
 USERNAME = os.environ.get('MONGO_USER')
 PASSWORD = os.environ.get('MONGO_PASSWD')
 MONGO_TYPE = os.environ.get('CLOUD_MONGO', LOCAL)
@@ -64,6 +73,7 @@ def connect_db():
     """
     global client
     if client is None:  # not connected yet!
+        import pymongo as pm
         print('Setting client because it is None.')
         if MONGO_TYPE == CLOUD:
             # Cloud MongoDB connection
@@ -78,12 +88,16 @@ def connect_db():
                     + 'to use Mongo in the cloud.'
                 )
             print('Connecting to Mongo in the cloud.')
+            import certifi
             client = pm.MongoClient(f'mongodb+srv://{USERNAME}:{PASSWORD}'
                                     + '@geodb.f4tdnzf.mongodb.net/'
                                     + '?appName=geodb',
                                     serverSelectionTimeoutMS=5000,
                                     connectTimeoutMS=5000,
-                                    tlsCAFile=certifi.where())
+                                    tlsCAFile=certifi.where(),
+                                    event_listeners=(
+                                        db_monitor.event_listeners()
+                                    ))
 
             # Test the connection to ensure MongoDB is accessible
             try:
@@ -114,7 +128,8 @@ def connect_db():
             client = pm.MongoClient(
                 connection_string,
                 serverSelectionTimeoutMS=5000,  # 5 second timeout
-                connectTimeoutMS=5000
+                connectTimeoutMS=5000,
+                event_listeners=db_monitor.event_listeners(),
             )
 
             # Test the connection to ensure MongoDB is running
@@ -170,6 +185,21 @@ def read_one(collection, filt, db=GEO_DB):
         return doc
 
 
+@needs_db
+def read_many(collection, filt, db=GEO_DB, no_id=True) -> list:
+    """
+    Return every doc matching filt as a list, in one query.
+    """
+    ret = []
+    for doc in client[db][collection].find(filt):
+        if no_id:
+            del doc[MONGO_ID]
+        else:
+            convert_mongo_id(doc)
+        ret.append(doc)
+    return ret
+
+
 @needs_db
 def delete(collection: str, filt: dict, db=GEO_DB):
     """
@@ -193,6 +223,50 @@ def update(collection, filters, update_dict, db=GEO_DB):
     return client[db][collection].update_one(filters, {'$set': update_dict})
 
 
+@needs_db
+def update_with(collection, filters, operators, db=GEO_DB):
+    """
+    update_one with raw update operators (e.g. $inc, $addToSet, $pull),
+    for atomic changes that must not be a read-modify-write.
+    """
+    return client[db][collection].update_one(filters, operators)
+
+
+@needs_db
+def insert_many(collection, docs, db=GEO_DB) -> int:
+    """
+    Insert many docs in one unordered round trip; returns the number
+    inserted.
+    """
+    logger.debug('insert %d docs into %s.%s', len(docs), db, collection)
+    ret = client[db][collection].insert_many(docs, ordered=False)
+    return len(ret.inserted_ids)
+
+
+@needs_db
+def bulk_write(collection, requests, db=GEO_DB):
+    """
+    Send many write operations (pymongo UpdateOne etc.) in one unordered
+    round trip.
+    """
+    return client[db][collection].bulk_write(requests, ordered=False)
+
+
+@needs_db
+def find_one_and_update(collection, filters, operators, db=GEO_DB):
+    """
+    Atomically apply update operators to the first doc matching filters
+    and return it as it is after the update, or None if nothing matched.
+    """
+    from pymongo import ReturnDocument
+    doc = client[db][collection].find_one_and_update(
+        filters, operators, return_document=ReturnDocument.AFTER,
+    )
+    if doc is not None:
+        convert_mongo_id(doc)
+    return doc
+
+
 @needs_db
 def read(collection, db=GEO_DB, no_id=True) -> list:
     """
@@ -208,6 +282,53 @@ def read(collection, db=GEO_DB, no_id=True) -> list:
     return ret
 
 
+def icase_equals(value: str) -> dict:
+    """
+    Filter clause for a case-insensitive exact match (surrounding
+    whitespace in the stored value is ignored).
+    """
+    return {
+        '$regex': rf'^\s*{re.escape(str(value).strip())}\s*$',
+        '$options': 'i',
+    }
+
+
+def _iter_cursor(cursor, no_id):
+    try:
+        for doc in cursor:
+            if no_id:
+                del doc[MONGO_ID]
+            else:
+                convert_mongo_id(doc)
+            yield doc
+    finally:
+        cursor.close()
+
+
+@needs_db
+def iter_docs(collection, filt=None, after=None, limit=None,
+              db=GEO_DB, no_id=True, batch_size=ITER_BATCH_SIZE):
+    """
+    Lazily yield docs matching filt in _id order, fetching batch_size at
+    a time from a server-side cursor, so memory use does not grow with
+    the collection. `after` (an _id string) resumes after that doc;
+    `limit` caps the number of docs. Invalid `after` raises ValueError
+    here, before anything is yielded.
+    """
+    filt = dict(filt or {})
+    if after:
+        try:
+            filt[MONGO_ID] = {'$gt': ObjectId(after)}
+        except (InvalidId, TypeError):
+            raise ValueError(f'Invalid id for after: {after!r}')
+    from pymongo import ASCENDING
+    cursor = client[db][collection].find(filt, batch_size=batch_size)
+    cursor = cursor.sort(MONGO_ID, ASCENDING)
+    if limit:
+        cursor = cursor.limit(limit)
+    return _iter_cursor(cursor, no_id)
+
+
 def read_dict(collection, key, db=GEO_DB, no_id=True) -> dict:
     """
     Doesn't need db decorator because read() has it
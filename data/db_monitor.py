@@ -0,0 +1,234 @@
+"""
+MongoDB command monitoring: per-command latency, documents returned and
+the route that issued it, plus a slow-query log.
+
+connect_db() registers LISTENER on the client (through event_listeners(),
+which only then imports pymongo). The server tags each
+request with set_route() so commands can be attributed to endpoints.
+Logged filters are reduced to their shape (keys and operators, values
+replaced by '?'), so no user data ends up in the log.
+
+Knobs (env):
+    AXIS_DB_MONITOR            '0' disables the listener (default on)
+    AXIS_SLOW_QUERY_MS         log commands slower than this (default 100)
+    AXIS_DB_MONITOR_REPLY_BYTES '1' also measures reply size by
+                               re-encoding each reply (costs CPU; off)
+"""
+import logging
+import os
+import threading
+from contextvars import ContextVar
+
+import bson
+
+import data.tracing as tracing
+
+logger = logging.getLogger(__name__)
+
+ENABLED_ENV = 'AXIS_DB_MONITOR'
+SLOW_MS_ENV = 'AXIS_SLOW_QUERY_MS'
+REPLY_BYTES_ENV = 'AXIS_DB_MONITOR_REPLY_BYTES'
+SLOW_MS_DEFAULT = 100
+
+NO_ROUTE = '-'
+PLACEHOLDER = '?'
+
+# Commands whose first value is not a collection name.
+_NO_COLLECTION = {'getMore'}
+
+_route = ContextVar('axis_db_route', default=None)
+
+
+def enabled() -> bool:
+    return os.environ.get(ENABLED_ENV, '1').strip() != '0'
+
+
+def slow_ms() -> float:
+    raw = os.environ.get(SLOW_MS_ENV, '').strip()
+    try:
+        return float(raw) if raw else SLOW_MS_DEFAULT
+    except ValueError:
+        return SLOW_MS_DEFAULT
+
+
+def set_route(route):
+    """Attribute Mongo commands on this context to `route`; returns a
+    token for reset_route()."""
+    return _route.set(route)
+
+
+def reset_route(token):
+    _route.reset(token)
+
+
+def shape(value):
+    """Structure of a filter with every leaf value replaced by '?'."""
+    if isinstance(value, dict):
+        return {k: shape(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        if value and all(isinstance(v, dict) for v in value):
+            return [shape(v) for v in value]
+        return [PLACEHOLDER] if value else []
+    return PLACEHOLDER
+
+
+def _collection(name, command):
+    if name in _NO_COLLECTION:
+        return command.get('collection')
+    value = command.get(name)
+    return value if isinstance(value, str) else None
+
+
+def _filter(name, command):
+    if name in ('find', 'count', 'distinct'):
+        return command.get('filter', command.get('query'))
+    if name == 'findAndModify':
+        return command.get('query')
+    if name in ('update', 'delete'):
+        ops = command.get(name + 's') or []
+        return ops[0].get('q') if ops else None
+    if name == 'aggregate':
+        pipeline = command.get('pipeline') or []
+        return pipeline[0].get('$match') if pipeline else None
+    return None
+
+
+def _docs_returned(reply):
+    cursor = reply.get('cursor')
+    if isinstance(cursor, dict):
+        batch = cursor.get('firstBatch', cursor.get('nextBatch'))
+        return len(batch) if batch is not None else 0
+    if 'value' in reply:  # findAndModify
+        return int(reply['value'] is not None)
+    if 'n' in reply:
+        return reply['n']
+    return 0
+
+
+class CommandMonitor:
+    """
+    Aggregates per (route, command, collection) and logs slow ones.
+    Implements pymongo's CommandListener interface; event_listeners()
+    wraps it in a real subclass so pymongo accepts it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._stats = {}
+
+    def started(self, event):
+        name = event.command_name
+        command = event.command
+        self._inflight[(event.connection_id, event.request_id)] = (
+            _route.get() or NO_ROUTE,
+            _collection(name, command),
+            _filter(name, command),
+        )
+
+    def _finish(self, event, reply=None, failed=False):
+        info = self._inflight.pop(
+            (event.connection_id, event.request_id), None,
+        )
+        route, collection, filt = info or (NO_ROUTE, None, None)
+        secs = event.duration_micros / 1e6
+        docs = _docs_returned(reply) if reply else 0
+        nbytes = 0
+        if reply and os.environ.get(REPLY_BYTES_ENV) == '1':
+            nbytes = len(bson.encode(reply))
+        tracing.record_span(
+            f'mongo.{event.command_name}', event.duration_micros * 1000,
+            error=failed, collection=collection, docs=docs,
+        )
+        slow = secs * 1000 >= slow_ms()
+        key = (route, event.command_name, collection or NO_ROUTE)
+        with self._lock:
+            st = self._stats.get(key)
+            if st is None:
+                st = self._stats[key] = {
+                    'count': 0, 'seconds': 0.0, 'max_seconds': 0.0,
+                    'docs': 0, 'reply_bytes': 0, 'failures': 0, 'slow': 0,
+                }
+            st['count'] += 1
+            st['seconds'] += secs
+            st['max_seconds'] = max(st['max_seconds'], secs)
+            st['docs'] += docs
+            st['reply_bytes'] += nbytes
+            st['failures'] += int(failed)
+            st['slow'] += int(slow)
+        if slow:
+            logger.warning(
+                'slow mongo %s on %s.%s: %.1f ms, %d docs, route=%s, '
+                'filter=%s',
+                event.command_name, event.database_name, collection,
+                secs * 1000, docs, route,
+                shape(filt) if filt is not None else None,
+            )
+
+    def succeeded(self, event):
+        self._finish(event, reply=event.reply)
+
+    def failed(self, event):
+        self._finish(event, failed=True)
+
+    def snapshot(self) -> list:
+        """One dict per (route, command, collection)."""
+        with self._lock:
+            return [
+                dict(st, route=route, command=cmd, collection=coll)
+                for (route, cmd, coll), st in self._stats.items()
+            ]
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._inflight.clear()
+
+
+LISTENER = CommandMonitor()
+
+
+def event_listeners() -> list:
+    """Listeners for MongoClient(event_listeners=...)."""
+    if not enabled():
+        return []
+    from pymongo import monitoring
+
+    class _Listener(monitoring.CommandListener):
+        started = staticmethod(LISTENER.started)
+        succeeded = staticmethod(LISTENER.succeeded)
+        failed = staticmethod(LISTENER.failed)
+
+    return [_Listener()]
+
+
+def metric_families():
+    """Aggregates for server.metrics.register_collector()."""
+    rows = sorted(
+        LISTENER.snapshot(),
+        key=lambda r: (r['route'], r['command'], r['collection']),
+    )
+
+    def samples(field):
+        return [
+            ({'route': r['route'], 'command': r['command'],
+              'collection': r['collection']}, r[field])
+            for r in rows
+        ]
+    return [
+        ('mongo_commands_total', 'counter',
+         'Mongo commands by issuing route.', samples('count')),
+        ('mongo_command_seconds_total', 'counter',
+         'Time spent in Mongo commands.', samples('seconds')),
+        ('mongo_command_max_seconds', 'gauge',
+         'Slowest single Mongo command.', samples('max_seconds')),
+        ('mongo_documents_returned_total', 'counter',
+         'Documents returned or affected.', samples('docs')),
+        ('mongo_reply_bytes_total', 'counter',
+         f'Reply bytes (only when {REPLY_BYTES_ENV}=1).',
+         samples('reply_bytes')),
+        ('mongo_command_failures_total', 'counter',
+         'Failed Mongo commands.', samples('failures')),
+        ('mongo_slow_commands_total', 'counter',
+         f'Commands over {SLOW_MS_ENV}.', samples('slow')),
+    ]
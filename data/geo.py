@@ -0,0 +1,516 @@
+"""
+Geospatial helpers shared by the location-aware caches (cities, listings).
+
+Everything here works on plain WGS84 decimal degrees and kilometres; nothing
+talks to MongoDB, so the indexes can be rebuilt from a cache in one pass.
+"""
+import bisect
+import heapq
+import math
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEG_LAT = math.pi * EARTH_RADIUS_KM / 180.0
+
+LAT_MIN = -90.0
+LAT_MAX = 90.0
+LON_MIN = -180.0
+LON_MAX = 180.0
+
+# Grid cell edge for GridIndex. One degree keeps a 50 km radius query to a
+# handful of cells while leaving each cell small enough to scan linearly.
+CELL_DEG = 1.0
+
+
+def parse_coord(value, name: str, lo: float, hi: float) -> float:
+    """
+    Convert a query/body value to a float within [lo, hi].
+    Raises ValueError with a caller-facing message otherwise.
+    """
+    if value is None or (isinstance(value, str) and not value.strip()):
+        raise ValueError(f"'{name}' is required")
+    try:
+        num = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"'{name}' must be a number")
+    if math.isnan(num) or num < lo or num > hi:
+        raise ValueError(f"'{name}' must be between {lo} and {hi}")
+    return num
+
+
+def parse_lat(value, name: str = 'lat') -> float:
+    return parse_coord(value, name, LAT_MIN, LAT_MAX)
+
+
+def parse_lon(value, name: str = 'lon') -> float:
+    return parse_coord(value, name, LON_MIN, LON_MAX)
+
+
+def coords_of(rec: dict, lat_fld: str, lon_fld: str):
+    """
+    Return (lat, lon) floats from a record, or None if either is missing
+    or out of range. Legacy docs sometimes carry coordinates as strings.
+    """
+    try:
+        lat = float(rec.get(lat_fld))
+        lon = float(rec.get(lon_fld))
+    except (TypeError, ValueError):
+        return None
+    if not (LAT_MIN <= lat <= LAT_MAX and LON_MIN <= lon <= LON_MAX):
+        return None
+    return lat, lon
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points, in kilometres."""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lon2 - lon1)
+    a = (
+        math.sin(dphi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class GridIndex:
+    """
+    In-memory spatial index: points bucketed into fixed lat/lon cells.
+
+    A radius query only visits the cells overlapping the circle's bounding
+    box (wrapping across the antimeridian and widening near the poles),
+    then refines the candidates with an exact haversine distance.
+    """
+
+    def __init__(self, cell_deg: float = CELL_DEG):
+        self.cell_deg = cell_deg
+        self.n_rows = int(math.ceil((LAT_MAX - LAT_MIN) / cell_deg))
+        self.n_cols = int(math.ceil((LON_MAX - LON_MIN) / cell_deg))
+        self.cells = {}
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def _row(self, lat: float) -> int:
+        return min(int((lat - LAT_MIN) // self.cell_deg), self.n_rows - 1)
+
+    def _col(self, lon: float) -> int:
+        return int((lon - LON_MIN) // self.cell_deg) % self.n_cols
+
+    def add(self, key, lat: float, lon: float) -> None:
+        cell = (self._row(lat), self._col(lon))
+        self.cells.setdefault(cell, []).append((key, lat, lon))
+        self.size += 1
+
+    def remove(self, key, lat: float, lon: float) -> bool:
+        """Remove the point added as (key, lat, lon); False if absent."""
+        cell = (self._row(lat), self._col(lon))
+        bucket = self.cells.get(cell)
+        for i, entry in enumerate(bucket or ()):
+            if entry[0] == key:
+                del bucket[i]
+                if not bucket:
+                    del self.cells[cell]
+                self.size -= 1
+                return True
+        return False
+
+    def copy(self) -> 'GridIndex':
+        """
+        Independent copy, for updating an index other threads may still
+        be querying: change the copy, then swap it in.
+        """
+        other = GridIndex(self.cell_deg)
+        other.cells = {cell: list(b) for cell, b in self.cells.items()}
+        other.size = self.size
+        return other
+
+    def _candidate_cells(self, lat: float, lon: float, radius_km: float):
+        dlat = radius_km / KM_PER_DEG_LAT
+        south = max(LAT_MIN, lat - dlat)
+        north = min(LAT_MAX, lat + dlat)
+        rows = range(self._row(south), self._row(north) + 1)
+        widest = max(abs(south), abs(north))
+        if north >= LAT_MAX or south <= LAT_MIN or widest >= 89.0:
+            cols = range(self.n_cols)
+        else:
+            dlon = dlat / math.cos(math.radians(widest))
+            if dlon >= 180.0:
+                cols = range(self.n_cols)
+            else:
+                first = int((lon - dlon - LON_MIN) // self.cell_deg)
+                last = int((lon + dlon - LON_MIN) // self.cell_deg)
+                span = min(last - first + 1, self.n_cols)
+                cols = [(first + i) % self.n_cols for i in range(span)]
+        for row in rows:
+            for col in cols:
+                bucket = self.cells.get((row, col))
+                if bucket:
+                    yield bucket
+
+    def nearby(self, lat: float, lon: float, radius_km: float,
+               limit: int = None) -> list:
+        """
+        Return [(distance_km, key), ...] for points within radius_km,
+        nearest first, truncated to `limit` when given.
+        """
+        hits = []
+        for bucket in self._candidate_cells(lat, lon, radius_km):
+            for key, plat, plon in bucket:
+                dist = haversine_km(lat, lon, plat, plon)
+                if dist <= radius_km:
+                    hits.append((dist, key))
+        if limit is not None and limit < len(hits):
+            return heapq.nsmallest(limit, hits, key=lambda h: h[0])
+        hits.sort(key=lambda h: h[0])
+        return hits
+
+
+# Web-Mercator tiles stop at this latitude; points beyond are clamped.
+MERCATOR_LAT_MAX = 85.05112878
+# Cluster cells are tiles CLUSTER_CELL_SHIFT levels below the map zoom,
+# i.e. a 4x4 grid of cells per rendered 256px tile.
+CLUSTER_CELL_SHIFT = 2
+# Deepest precomputed level (~10 km cells); higher zooms reuse it.
+CLUSTER_LEVEL_MAX = 12
+# Upper bound on cells a single viewport query may return; wide boxes at
+# high zoom fall back to a coarser level so payloads stay bounded.
+CLUSTER_CELLS_MAX = 1024
+ZOOM_MAX = 22
+
+
+def parse_bbox(value) -> tuple:
+    """
+    Parse 'west,south,east,north' (degrees) into a tuple of floats.
+    west > east is allowed and means the box crosses the antimeridian.
+    """
+    if not value or not str(value).strip():
+        raise ValueError("'bbox' is required as west,south,east,north")
+    parts = str(value).split(',')
+    if len(parts) != 4:
+        raise ValueError("'bbox' must be west,south,east,north")
+    west = parse_lon(parts[0], 'bbox west')
+    south = parse_lat(parts[1], 'bbox south')
+    east = parse_lon(parts[2], 'bbox east')
+    north = parse_lat(parts[3], 'bbox north')
+    if south > north:
+        raise ValueError("'bbox' south must not exceed north")
+    return west, south, east, north
+
+
+def parse_zoom(value) -> int:
+    msg = f"'zoom' must be an integer between 0 and {ZOOM_MAX}"
+    try:
+        zoom = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(msg)
+    if zoom < 0 or zoom > ZOOM_MAX:
+        raise ValueError(msg)
+    return zoom
+
+
+def tile_xy(lat: float, lon: float, level: int) -> tuple:
+    """Web-Mercator tile (x, y) containing the point at a zoom level."""
+    n = 1 << level
+    lat = max(-MERCATOR_LAT_MAX, min(MERCATOR_LAT_MAX, lat))
+    x = int((lon - LON_MIN) / 360.0 * n)
+    y = int(
+        (1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n
+    )
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def quadkey(x: int, y: int, level: int) -> str:
+    """Bing-style quadkey for a tile; prefixes name its parent tiles."""
+    digits = []
+    for i in range(level, 0, -1):
+        mask = 1 << (i - 1)
+        digit = 0
+        if x & mask:
+            digit += 1
+        if y & mask:
+            digit += 2
+        digits.append(str(digit))
+    return ''.join(digits)
+
+
+def _bbox_tile_ranges(bbox: tuple, level: int) -> tuple:
+    """([x ranges], y range) covering bbox at a level."""
+    west, south, east, north = bbox
+    x_west, y_north = tile_xy(north, west, level)
+    x_east, y_south = tile_xy(south, east, level)
+    if west <= east:
+        x_ranges = [range(x_west, x_east + 1)]
+    else:
+        x_ranges = [
+            range(x_west, 1 << level),
+            range(0, x_east + 1),
+        ]
+    return x_ranges, range(y_north, y_south + 1)
+
+
+def cluster_level(bbox: tuple, zoom: int) -> int:
+    """
+    Cell level for a viewport: zoom + CLUSTER_CELL_SHIFT, capped at
+    CLUSTER_LEVEL_MAX and coarsened until the box spans at most
+    CLUSTER_CELLS_MAX cells.
+    """
+    level = min(zoom + CLUSTER_CELL_SHIFT, CLUSTER_LEVEL_MAX)
+    while level > 0:
+        x_ranges, y_range = _bbox_tile_ranges(bbox, level)
+        n_cells = sum(len(r) for r in x_ranges) * len(y_range)
+        if n_cells <= CLUSTER_CELLS_MAX:
+            break
+        level -= 1
+    return level
+
+
+class ClusterGrid:
+    """
+    Point counts per Web-Mercator tile, for every level up to
+    CLUSTER_LEVEL_MAX. Each cell keeps [count, sum_lat, sum_lon] so the
+    centroid is available and points can be folded in one at a time.
+    """
+
+    def __init__(self, max_level: int = CLUSTER_LEVEL_MAX):
+        self.max_level = max_level
+        self.levels = [{} for _ in range(max_level + 1)]
+
+    def add(self, lat: float, lon: float) -> None:
+        x, y = tile_xy(lat, lon, self.max_level)
+        for level in range(self.max_level, -1, -1):
+            shift = self.max_level - level
+            cell = self.levels[level].get((x >> shift, y >> shift))
+            if cell is None:
+                self.levels[level][(x >> shift, y >> shift)] = [1, lat, lon]
+            else:
+                cell[0] += 1
+                cell[1] += lat
+                cell[2] += lon
+
+    def remove(self, lat: float, lon: float) -> None:
+        """Take back a point added with add(lat, lon)."""
+        x, y = tile_xy(lat, lon, self.max_level)
+        for level in range(self.max_level, -1, -1):
+            shift = self.max_level - level
+            xy = (x >> shift, y >> shift)
+            cell = self.levels[level].get(xy)
+            if cell is None:
+                continue
+            if cell[0] <= 1:
+                del self.levels[level][xy]
+            else:
+                cell[0] -= 1
+                cell[1] -= lat
+                cell[2] -= lon
+
+    def copy(self) -> 'ClusterGrid':
+        """
+        Independent copy, for updating a grid other threads may still be
+        querying: change the copy, then swap it in.
+        """
+        other = ClusterGrid(self.max_level)
+        other.levels = [
+            {xy: list(cell) for xy, cell in cells.items()}
+            for cells in self.levels
+        ]
+        return other
+
+    def clusters(self, bbox: tuple, level: int) -> list:
+        """Non-empty cells overlapping bbox at a level, largest first."""
+        cells = self.levels[level]
+        x_ranges, y_range = _bbox_tile_ranges(bbox, level)
+        n_cells = sum(len(r) for r in x_ranges) * len(y_range)
+        if n_cells <= len(cells):
+            hits = (
+                ((x, y), cells[(x, y)])
+                for x_range in x_ranges
+                for x in x_range
+                for y in y_range
+                if (x, y) in cells
+            )
+        else:
+            hits = (
+                (xy, cell) for xy, cell in cells.items()
+                if xy[1] in y_range
+                and any(xy[0] in x_range for x_range in x_ranges)
+            )
+        out = [
+            {
+                'key': quadkey(x, y, level),
+                'count': count,
+                'lat': round(sum_lat / count, 5),
+                'lon': round(sum_lon / count, 5),
+            }
+            for (x, y), (count, sum_lat, sum_lon) in hits
+        ]
+        out.sort(key=lambda c: (-c['count'], c['key']))
+        return out
+
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+# Precision stored per point (~38 m x 19 m cells).
+GEOHASH_PRECISION = 8
+# Most prefix range scans one bbox query may issue.
+GEOHASH_COVER_MAX = 16
+
+
+def geohash_encode(lat: float, lon: float,
+                   precision: int = GEOHASH_PRECISION) -> str:
+    """Standard base-32 geohash of a point."""
+    lat_lo, lat_hi = LAT_MIN, LAT_MAX
+    lon_lo, lon_hi = LON_MIN, LON_MAX
+    chars = []
+    bits = 0
+    n_bits = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if lon >= mid:
+                bits = (bits << 1) | 1
+                lon_lo = mid
+            else:
+                bits <<= 1
+                lon_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                bits = (bits << 1) | 1
+                lat_lo = mid
+            else:
+                bits <<= 1
+                lat_hi = mid
+        even = not even
+        n_bits += 1
+        if n_bits == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits = 0
+            n_bits = 0
+    return ''.join(chars)
+
+
+def _geohash_cell_size(precision: int) -> tuple:
+    """(lat_height, lon_width) in degrees of a geohash cell."""
+    total = 5 * precision
+    lon_bits = (total + 1) // 2
+    lat_bits = total // 2
+    return (
+        (LAT_MAX - LAT_MIN) / (1 << lat_bits),
+        (LON_MAX - LON_MIN) / (1 << lon_bits),
+    )
+
+
+def _split_antimeridian(bbox: tuple) -> list:
+    west, south, east, north = bbox
+    if west <= east:
+        return [bbox]
+    return [(west, south, LON_MAX, north), (LON_MIN, south, east, north)]
+
+
+def geohash_cover(bbox: tuple) -> list:
+    """
+    Geohash prefixes whose cells together cover bbox, using the longest
+    prefix length that needs at most GEOHASH_COVER_MAX prefixes.
+    """
+    boxes = _split_antimeridian(bbox)
+    best = ['']
+    for precision in range(1, GEOHASH_PRECISION + 1):
+        height, width = _geohash_cell_size(precision)
+        prefixes = set()
+        for west, south, east, north in boxes:
+            row_lo = int((south - LAT_MIN) // height)
+            row_hi = int(min(north - LAT_MIN, LAT_MAX - LAT_MIN - 1e-9)
+                         // height)
+            col_lo = int((west - LON_MIN) // width)
+            col_hi = int(min(east - LON_MIN, LON_MAX - LON_MIN - 1e-9)
+                         // width)
+            n_cells = (row_hi - row_lo + 1) * (col_hi - col_lo + 1)
+            if len(prefixes) + n_cells > GEOHASH_COVER_MAX:
+                return best
+            for row in range(row_lo, row_hi + 1):
+                for col in range(col_lo, col_hi + 1):
+                    prefixes.add(geohash_encode(
+                        LAT_MIN + (row + 0.5) * height,
+                        LON_MIN + (col + 0.5) * width,
+                        precision,
+                    ))
+        best = sorted(prefixes)
+    return best
+
+
+def in_bbox(lat: float, lon: float, bbox: tuple) -> bool:
+    west, south, east, north = bbox
+    if not south <= lat <= north:
+        return False
+    if west <= east:
+        return west <= lon <= east
+    return lon >= west or lon <= east
+
+
+class GeohashIndex:
+    """
+    Points sorted by geohash. A bbox query turns into a few prefix range
+    scans (bisect on the sorted hashes) followed by an exact bbox check.
+    """
+
+    def __init__(self):
+        self.entries = []
+        self.hashes = []
+        self._sorted = True
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, key, lat: float, lon: float) -> None:
+        self.entries.append((geohash_encode(lat, lon), key, lat, lon))
+        self._sorted = False
+
+    def sort(self) -> None:
+        """
+        Sort now instead of on the first in_bbox(); do this before the
+        index is shared between threads.
+        """
+        if not self._sorted:
+            self.entries.sort(key=lambda e: e[0])
+            self.hashes = [e[0] for e in self.entries]
+            self._sorted = True
+
+    def remove(self, key, lat: float, lon: float) -> bool:
+        """Remove the point added as (key, lat, lon); False if absent."""
+        self.sort()
+        gh = geohash_encode(lat, lon)
+        lo = bisect.bisect_left(self.hashes, gh)
+        hi = bisect.bisect_right(self.hashes, gh)
+        for i in range(lo, hi):
+            if self.entries[i][1] == key:
+                del self.entries[i]
+                del self.hashes[i]
+                return True
+        return False
+
+    def copy(self) -> 'GeohashIndex':
+        """
+        Independent copy, for updating an index other threads may still
+        be querying: change the copy, sort() it, then swap it in.
+        """
+        self.sort()
+        other = GeohashIndex()
+        other.entries = list(self.entries)
+        other.hashes = list(self.hashes)
+        return other
+
+    def in_bbox(self, bbox: tuple, limit: int = None) -> list:
+        """Keys of points inside bbox in geohash order, up to limit."""
+        self.sort()
+        keys = []
+        for prefix in geohash_cover(bbox):
+            lo = bisect.bisect_left(self.hashes, prefix)
+            hi = bisect.bisect_left(self.hashes, prefix + '~')
+            for _, key, lat, lon in self.entries[lo:hi]:
+                if in_bbox(lat, lon, bbox):
+                    keys.append(key)
+                    if limit is not None and len(keys) >= limit:
+                        return keys
+        return keys
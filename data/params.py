@@ -0,0 +1,27 @@
+"""
+Parsing of numeric query parameters shared by the query modules.
+
+Each helper raises ValueError with a caller-facing message, which the
+endpoints turn into a 400.
+"""
+
+
+def positive_int(value, name: str, max_value: int = None) -> int:
+    """
+    Convert a query/body value to an int >= 1, clamped to max_value when
+    one is given.
+    """
+    try:
+        num = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"'{name}' must be a positive integer")
+    if num < 1:
+        raise ValueError(f"'{name}' must be a positive integer")
+    return num if max_value is None else min(num, max_value)
+
+
+def optional_positive_int(value, name: str):
+    """positive_int(), except that a missing or empty value gives None."""
+    if value is None or value == '':
+        return None
+    return positive_int(value, name)
@@ -0,0 +1,520 @@
+"""
+Deterministic synthetic data at any scale: countries, states, cities
+(with coordinates), users and listings, all consistent with each other.
+
+Every record is a pure function of (seed, kind, index), so the same seed
+always gives the same data, any slice can be generated on its own, and
+nothing has to be held in memory to keep references straight:
+
+    countries   3-letter codes AAA.., each with a centre coordinate
+    states      2-letter codes unique within their country, placed near
+                the country's centre
+    cities      spread round-robin over the states, near their centre
+    users       `.edu` emails, living in one of the cities; every
+                password is PASSWORD, stored as one pre-computed bcrypt
+                hash (cost --bcrypt-rounds) so generation stays fast
+    listings    owned by a user (by email, as /listings/create requires)
+                and located in that user's city
+
+Documents use the fields the query modules store. Output is one file
+per collection, TSV (ETL/ column layout) or NDJSON, or a bulk load into
+a Mongo database:
+
+    python3 -m data.synthetic --cities 1000000 --users 1000000 \\
+        --listings 5000000 --format ndjson --out /tmp/axis-data
+    python3 -m data.synthetic --format mongo --db axis_synthetic --drop
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import bcrypt
+from bson import ObjectId
+
+import cities.queries as cityqry
+import countries.queries as countryqry
+import data.db_connect as dbc
+import listings.queries as listingqry
+import states.queries as stateqry
+import users.queries as userqry
+
+SEED = 2026
+PASSWORD = 'synthetic-password'
+BCRYPT_ROUNDS = 4
+
+COUNTRIES = 200
+STATES_PER_COUNTRY = 20
+CITIES = 10_000
+USERS = 10_000
+LISTINGS = 100_000
+
+MAX_COUNTRIES = 26 ** 3
+MAX_STATES_PER_COUNTRY = 26 ** 2
+
+TSV = 'tsv'
+NDJSON = 'ndjson'
+MONGO = 'mongo'
+FORMATS = (TSV, NDJSON, MONGO)
+DEFAULT_DB = 'axis_synthetic'
+BATCH_SIZE = 5_000
+
+# Generation order; later kinds reference earlier ones.
+KINDS = (
+    countryqry.COUNTRY_COLLECTION,
+    stateqry.STATE_COLLECTION,
+    cityqry.CITY_COLLECTION,
+    userqry.USER_COLLECTION,
+    listingqry.LISTING_COLLECTION,
+)
+
+# Header rows of the ETL/*.tsv fixtures, mapped to document fields.
+TSV_COLUMNS = {
+    countryqry.COUNTRY_COLLECTION: [
+        ('country_name', countryqry.NAME),
+        ('country_code', countryqry.CODE),
+    ],
+    stateqry.STATE_COLLECTION: [
+        ('country_code', stateqry.COUNTRY_CODE),
+        ('code', stateqry.CODE),
+        ('name', stateqry.NAME),
+    ],
+    cityqry.CITY_COLLECTION: [
+        ('city_name', cityqry.NAME),
+        ('state_code', cityqry.STATE_CODE),
+        ('latitude', cityqry.LATITUDE),
+        ('longitude', cityqry.LONGITUDE),
+        ('country_code', cityqry.COUNTRY_CODE),
+    ],
+    userqry.USER_COLLECTION: [
+        (fld, fld) for fld in (
+            userqry.USERNAME, userqry.PASSWORD, userqry.NAME, userqry.AGE,
+            userqry.BIO, userqry.IS_VERIFIED, userqry.EMAIL, userqry.CITY,
+            userqry.STATE, userqry.COUNTRY,
+        )
+    ],
+    listingqry.LISTING_COLLECTION: [
+        (fld, fld) for fld in (
+            listingqry.TITLE, listingqry.DESCRIPTION, listingqry.IMAGES,
+            listingqry.TRANSACTION_TYPE, listingqry.OWNER, listingqry.CITY,
+            listingqry.STATE, listingqry.COUNTRY, listingqry.PRICE,
+            listingqry.NUM_LIKES, listingqry.STATUS,
+        )
+    ],
+}
+
+SYLLABLES = (
+    'ba', 'ka', 'lo', 'mi', 'ra', 'ten', 'vor', 'shi', 'du', 'nel',
+    'po', 'ri', 'sa', 'ti', 'go', 'ver', 'an', 'mar', 'el', 'cor',
+)
+FIRST_NAMES = (
+    'Mateo', 'Trang', 'Aisha', 'Liam', 'Sofia', 'Noah', 'Priya', 'Omar',
+    'Mei', 'Lucas', 'Zara', 'Ethan', 'Ana', 'Kofi', 'Hana', 'Diego',
+)
+LAST_NAMES = (
+    'Rivera', 'Nguyen', 'Khan', 'Smith', 'Rossi', 'Kim', 'Patel', 'Ali',
+    'Chen', 'Silva', 'Mensah', 'Garcia', 'Sato', 'Cohen', 'Okafor', 'Diaz',
+)
+SCHOOLS = (
+    'nyu', 'fordham', 'pace', 'columbia', 'cuny', 'newschool', 'stonybrook',
+    'rutgers', 'cornell', 'syracuse',
+)
+ITEMS = (
+    'desk lamp', 'mini fridge', 'textbook', 'office chair', 'bike',
+    'monitor', 'rug', 'coffee maker', 'calculator', 'bookshelf',
+    'headphones', 'microwave', 'winter coat', 'guitar', 'mattress topper',
+)
+CONDITIONS = ('like new', 'lightly used', 'used', 'vintage', 'needs repair')
+BIOS = (
+    'Swapping dorm essentials before move-out.',
+    'Always looking for textbooks.',
+    'Trades gaming gear and accessories.',
+    'Loves thrifting and upcycling.',
+)
+STATUSES = ('available',) * 8 + ('pending', 'sold')
+
+_MASK = (1 << 64) - 1
+_EPOCH = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def _mix(x: int) -> int:
+    """splitmix64 finalizer: a well-spread 64-bit hash of x."""
+    x = (x + 0x9E3779B97F4A7C15) & _MASK
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK
+    return x ^ (x >> 31)
+
+
+class _Draws:
+    """Independent pseudo-random draws for one record."""
+
+    __slots__ = ('_state',)
+
+    def __init__(self, base, index):
+        self._state = _mix(base ^ index)
+
+    def next(self) -> int:
+        self._state = _mix(self._state)
+        return self._state
+
+    def below(self, n: int) -> int:
+        return self.next() % n
+
+    def pick(self, seq):
+        return seq[self.below(len(seq))]
+
+    def uniform(self, lo: float, hi: float) -> float:
+        return lo + (hi - lo) * (self.next() >> 11) / (1 << 53)
+
+
+def _letters(n: int, width: int) -> str:
+    out = []
+    for _ in range(width):
+        n, r = divmod(n, 26)
+        out.append(chr(ord('A') + r))
+    return ''.join(reversed(out))
+
+
+def _word(n: int, syllables: int = 3) -> str:
+    """Pronounceable name; distinct n below 20**syllables differ."""
+    parts = []
+    for _ in range(syllables):
+        n, r = divmod(n, len(SYLLABLES))
+        parts.append(SYLLABLES[r])
+    return ''.join(parts).capitalize()
+
+
+def _clamp_lat(lat: float) -> float:
+    return max(-89.9, min(89.9, lat))
+
+
+def _wrap_lon(lon: float) -> float:
+    return (lon + 180.0) % 360.0 - 180.0
+
+
+def _object_id(draws: _Draws) -> ObjectId:
+    return ObjectId(draws.next().to_bytes(8, 'big')
+                    + (draws.next() & 0xFFFFFFFF).to_bytes(4, 'big'))
+
+
+def password_hash(password: str = PASSWORD,
+                  rounds: int = BCRYPT_ROUNDS) -> str:
+    return bcrypt.hashpw(
+        password.encode('utf-8'), bcrypt.gensalt(rounds=rounds),
+    ).decode('utf-8')
+
+
+class Generator:
+    """
+    Record factory for one data set. country(i), state(i), city(i),
+    user(i) and listing(i) build a single document; iter_docs(kind)
+    streams a whole collection.
+    """
+
+    def __init__(self, seed=SEED, countries=COUNTRIES,
+                 states_per_country=STATES_PER_COUNTRY, cities=CITIES,
+                 users=USERS, listings=LISTINGS, bcrypt_rounds=BCRYPT_ROUNDS,
+                 hashed_password=None):
+        if not 1 <= countries <= MAX_COUNTRIES:
+            raise ValueError(
+                f'countries must be between 1 and {MAX_COUNTRIES}'
+            )
+        if not 1 <= states_per_country <= MAX_STATES_PER_COUNTRY:
+            raise ValueError(
+                'states_per_country must be between 1 and '
+                f'{MAX_STATES_PER_COUNTRY}'
+            )
+        if cities < 1 or users < 0 or listings < 0:
+            raise ValueError('cities must be positive; users and listings '
+                             'must not be negative')
+        if listings and not users:
+            raise ValueError('listings need at least one user')
+        self.seed = seed
+        self.sizes = {
+            countryqry.COUNTRY_COLLECTION: countries,
+            stateqry.STATE_COLLECTION: countries * states_per_country,
+            cityqry.CITY_COLLECTION: cities,
+            userqry.USER_COLLECTION: users,
+            listingqry.LISTING_COLLECTION: listings,
+        }
+        self.states_per_country = states_per_country
+        self._rounds = bcrypt_rounds
+        self._hashed = hashed_password
+        self._bases = {}
+        self._state_centres = {}
+
+    @property
+    def hashed_password(self) -> str:
+        # Computed once, on first use: every user shares it.
+        if self._hashed is None:
+            self._hashed = password_hash(rounds=self._rounds)
+        return self._hashed
+
+    def _draws(self, kind, index, stream=0) -> _Draws:
+        base = self._bases.get((kind, stream))
+        if base is None:
+            base = self._bases[(kind, stream)] = _mix(
+                _mix(self.seed * len(KINDS) + KINDS.index(kind)) ^ stream
+            )
+        return _Draws(base, index)
+
+    def _home_city(self, user_i) -> int:
+        """Index of the city user `user_i` lives in."""
+        return self._draws(userqry.USER_COLLECTION, user_i, 1).below(
+            self.sizes[cityqry.CITY_COLLECTION],
+        )
+
+    def _centre(self, kind, index, spread, around=None):
+        draws = self._draws(kind, index)
+        if around is None:
+            return draws.uniform(-55, 70), draws.uniform(-180, 180)
+        lat, lon = around
+        return (_clamp_lat(lat + draws.uniform(-spread, spread)),
+                _wrap_lon(lon + draws.uniform(-spread, spread)))
+
+    def _country_centre(self, i):
+        return self._centre(countryqry.COUNTRY_COLLECTION, i, None)
+
+    def _state_centre(self, i):
+        # Every city looks its state up; there are far fewer states.
+        centre = self._state_centres.get(i)
+        if centre is None:
+            country = self._country_centre(i // self.states_per_country)
+            centre = self._state_centres[i] = self._centre(
+                stateqry.STATE_COLLECTION, i, 6.0, country,
+            )
+        return centre
+
+    def country(self, i: int) -> dict:
+        return {
+            countryqry.NAME: _word(i),
+            countryqry.CODE: _letters(i, 3),
+        }
+
+    def state(self, i: int) -> dict:
+        country_i, local = divmod(i, self.states_per_country)
+        name = _word(self._draws(stateqry.STATE_COLLECTION, i, 1).below(
+            len(SYLLABLES) ** 3,
+        ))
+        return {
+            stateqry.NAME: f'{name} Province',
+            stateqry.CODE: _letters(local, 2),
+            stateqry.COUNTRY_CODE: _letters(country_i, 3),
+        }
+
+    def city(self, i: int) -> dict:
+        state_i = i % self.sizes[stateqry.STATE_COLLECTION]
+        country_i, local = divmod(state_i, self.states_per_country)
+        lat, lon = self._centre(
+            cityqry.CITY_COLLECTION, i, 1.5, self._state_centre(state_i),
+        )
+        return {
+            cityqry.NAME: _word(self._draws(cityqry.CITY_COLLECTION, i, 1)
+                                .below(len(SYLLABLES) ** 3)),
+            cityqry.STATE_CODE: _letters(local, 2),
+            cityqry.COUNTRY_CODE: _letters(country_i, 3),
+            cityqry.LATITUDE: round(lat, 4),
+            cityqry.LONGITUDE: round(lon, 4),
+        }
+
+    def _identity(self, i):
+        """(draws, first, last, username, email) of user i."""
+        draws = self._draws(userqry.USER_COLLECTION, i)
+        first, last = draws.pick(FIRST_NAMES), draws.pick(LAST_NAMES)
+        username = f'{first[0]}{last}{i}'.lower()
+        email = f'{username}@{draws.pick(SCHOOLS)}.edu'
+        return draws, first, last, username, email
+
+    def user(self, i: int) -> dict:
+        draws, first, last, username, email = self._identity(i)
+        city = self.city(self._home_city(i))
+        return {
+            userqry.USERNAME: username,
+            userqry.PASSWORD: self.hashed_password,
+            userqry.NAME: f'{first} {last}',
+            userqry.AGE: 18 + draws.below(13),
+            userqry.BIO: draws.pick(BIOS),
+            userqry.IS_VERIFIED: draws.below(4) != 0,
+            userqry.EMAIL: email,
+            userqry.CITY: city[cityqry.NAME],
+            userqry.STATE: city[cityqry.STATE_CODE],
+            userqry.COUNTRY: city[cityqry.COUNTRY_CODE],
+            userqry.SAVED_LISTINGS: [],
+            userqry.CREATED_AT: (
+                _EPOCH + timedelta(minutes=i)
+            ).isoformat(),
+        }
+
+    def listing(self, i: int) -> dict:
+        draws = self._draws(listingqry.LISTING_COLLECTION, i)
+        owner_i = draws.below(self.sizes[userqry.USER_COLLECTION])
+        owner_email = self._identity(owner_i)[-1]
+        city = self.city(self._home_city(owner_i))
+        item = draws.pick(ITEMS)
+        condition = draws.pick(CONDITIONS)
+        free = draws.below(5) == 0
+        lat = _clamp_lat(city[cityqry.LATITUDE] + draws.uniform(-0.05, 0.05))
+        lon = _wrap_lon(city[cityqry.LONGITUDE] + draws.uniform(-0.05, 0.05))
+        oid = _object_id(draws)
+        return {
+            dbc.MONGO_ID: oid,
+            listingqry.TITLE: f'{item.capitalize()} - {condition}',
+            listingqry.DESCRIPTION: (
+                f'{condition.capitalize()} {item}, pick up near campus.'
+            ),
+            listingqry.IMAGES: [
+                f'https://res.cloudinary.com/synthetic/image/upload/'
+                f'{oid}_{k}.jpg'
+                for k in range(draws.below(4))
+            ],
+            listingqry.TRANSACTION_TYPE: 'free' if free else 'sell',
+            listingqry.OWNER: owner_email,
+            listingqry.CITY: city[cityqry.NAME],
+            listingqry.STATE: city[cityqry.STATE_CODE],
+            listingqry.COUNTRY: city[cityqry.COUNTRY_CODE],
+            listingqry.PRICE: (
+                None if free else round(draws.uniform(1, 300), 2)
+            ),
+            listingqry.NUM_LIKES: draws.below(40),
+            listingqry.STATUS: draws.pick(STATUSES),
+            listingqry.CREATED_AT: (
+                _EPOCH + timedelta(seconds=30 * i)
+            ).isoformat(),
+            listingqry.LOCATION: {
+                'type': 'Point', 'coordinates': [round(lon, 5),
+                                                 round(lat, 5)],
+            },
+        }
+
+    def iter_docs(self, kind, start=0, stop=None):
+        """Documents start..stop (default: all) of one collection."""
+        make = {
+            countryqry.COUNTRY_COLLECTION: self.country,
+            stateqry.STATE_COLLECTION: self.state,
+            cityqry.CITY_COLLECTION: self.city,
+            userqry.USER_COLLECTION: self.user,
+            listingqry.LISTING_COLLECTION: self.listing,
+        }[kind]
+        stop = self.sizes[kind] if stop is None else stop
+        for i in range(start, stop):
+            yield make(i)
+
+
+def _tsv_value(value) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, list):
+        return ','.join(str(v) for v in value)
+    return str(value)
+
+
+def write_tsv(path, kind, docs) -> int:
+    """ETL-style TSV (header row first); returns rows written."""
+    columns = TSV_COLUMNS[kind]
+    n = 0
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f, delimiter='\t', lineterminator='\n')
+        writer.writerow([header for header, _ in columns])
+        for doc in docs:
+            writer.writerow([_tsv_value(doc.get(fld)) for _, fld in columns])
+            n += 1
+    return n
+
+
+def write_ndjson(path, kind, docs) -> int:
+    """One JSON document per line (_id as a hex string)."""
+    n = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        for doc in docs:
+            f.write(json.dumps(doc, default=str, separators=(',', ':')))
+            f.write('\n')
+            n += 1
+    return n
+
+
+def load_mongo(kind, docs, db=DEFAULT_DB, batch_size=BATCH_SIZE) -> int:
+    """insert_many in batches; returns documents inserted."""
+    n = 0
+    batch = []
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            n += dbc.insert_many(kind, batch, db=db)
+            batch = []
+    if batch:
+        n += dbc.insert_many(kind, batch, db=db)
+    return n
+
+
+def generate(gen, fmt, out=None, db=DEFAULT_DB, kinds=KINDS, drop=False,
+             log=print) -> dict:
+    """Write or load every kind in `kinds`; returns kind -> count."""
+    counts = {}
+    if fmt != MONGO:
+        os.makedirs(out, exist_ok=True)
+    for kind in kinds:
+        start = time.perf_counter()
+        docs = gen.iter_docs(kind)
+        if fmt == MONGO:
+            if drop:
+                dbc.delete_many(kind, {}, db=db)
+            n = load_mongo(kind, docs, db=db)
+            where = f'{db}.{kind}'
+        else:
+            where = os.path.join(out, f'{kind}.{fmt}')
+            write = write_tsv if fmt == TSV else write_ndjson
+            n = write(where, kind, docs)
+        counts[kind] = n
+        log(f'{kind:10} {n:>10} docs -> {where} '
+            f'({time.perf_counter() - start:.1f} s)')
+    return counts
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--countries', type=int, default=COUNTRIES)
+    parser.add_argument('--states-per-country', type=int,
+                        default=STATES_PER_COUNTRY)
+    parser.add_argument('--cities', type=int, default=CITIES)
+    parser.add_argument('--users', type=int, default=USERS)
+    parser.add_argument('--listings', type=int, default=LISTINGS)
+    parser.add_argument('--bcrypt-rounds', type=int, default=BCRYPT_ROUNDS)
+    parser.add_argument('--format', choices=FORMATS, default=NDJSON)
+    parser.add_argument('--out', default='synthetic',
+                        help='output directory for tsv/ndjson')
+    parser.add_argument('--db', default=DEFAULT_DB,
+                        help='database for --format mongo')
+    parser.add_argument('--drop', action='store_true',
+                        help='empty each collection before a mongo load')
+    parser.add_argument('--only', action='append', choices=KINDS,
+                        help='generate just this collection (repeatable)')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        gen = Generator(
+            seed=args.seed, countries=args.countries,
+            states_per_country=args.states_per_country,
+            cities=args.cities, users=args.users, listings=args.listings,
+            bcrypt_rounds=args.bcrypt_rounds,
+        )
+    except ValueError as exc:
+        print(f'error: {exc}', file=sys.stderr)
+        return 2
+    kinds = [k for k in KINDS if not args.only or k in args.only]
+    generate(gen, args.format, out=args.out, db=args.db, kinds=kinds,
+             drop=args.drop)
+    print(f'every user password is {PASSWORD!r}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
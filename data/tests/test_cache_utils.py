@@ -0,0 +1,84 @@
+import data.cache_utils as cache_utils
+
+
+def test_content_version_ignores_key_order():
+    a = {'x': {'name': 'X', 'n': 1}, 'y': {'name': 'Y'}}
+    b = {'y': {'name': 'Y'}, 'x': {'n': 1, 'name': 'X'}}
+    assert cache_utils.content_version(a) == cache_utils.content_version(b)
+    assert len(cache_utils.content_version(a)) == cache_utils.VERSION_LEN
+
+
+def test_content_version_changes_with_content():
+    before = cache_utils.content_version({'x': {'name': 'X'}})
+    after = cache_utils.content_version({'x': {'name': 'X2'}})
+    assert before != after
+
+
+def test_derived_rebuilds_per_source_dict():
+    builds = []
+
+    def build(data):
+        builds.append(data)
+        return len(data)
+
+    derived = cache_utils.Derived()
+    old, new = {'a': 1}, {'a': 1, 'b': 2}
+    assert derived.get(old, build) == 1
+    assert derived.get(old, build) == 1
+    assert derived.peek(new) is None
+    # Equal content is not enough; the value belongs to one dict object.
+    assert derived.get(dict(old), build) == 1
+    assert len(builds) == 2
+    derived.prime(new, 'primed')
+    assert derived.get(new, build) == 'primed'
+    assert derived.peek(old) is None
+    derived.reset()
+    assert derived.peek(new) is None
+
+
+def test_hit_miss_reload_stats():
+    name = 'test-coll'
+    state = {'cache': None}
+    cache_utils.track(name, lambda: state['cache'])
+    cache_utils.reset_stats()
+
+    @cache_utils.timed_reload(name)
+    def load():
+        state['cache'] = {'a': {'title': 'x' * 100}, 'b': {}}
+
+    cache_utils.record_miss(name)
+    load()
+    cache_utils.record_hit(name)
+    cache_utils.record_hit(name)
+    cache_utils.record_hit(name)
+    st = cache_utils.snapshot()[name]
+    assert st['hits'] == 3
+    assert st['misses'] == 1
+    assert st['hit_ratio'] == 0.75
+    assert st['reloads'] == 1
+    assert st['last_reload_seconds'] >= 0
+    assert st['entries'] == 2
+    assert st['approx_bytes'] > 100
+
+
+def test_failed_reload_counted():
+    name = 'test-fail'
+    cache_utils.track(name, lambda: None)
+
+    @cache_utils.timed_reload(name)
+    def load():
+        raise ConnectionError('down')
+
+    try:
+        load()
+    except ConnectionError:
+        pass
+    st = cache_utils.snapshot()[name]
+    assert st['reload_errors'] == 1
+    assert st['reloads'] == 0
+    assert st['entries'] == 0
+
+
+def test_approx_bytes_counts_shared_objects_once():
+    shared = 'y' * 1000
+    assert cache_utils.approx_bytes([shared, shared]) < 2000
@@ -1,3 +1,4 @@
+import io
 from unittest.mock import patch
 
 import pytest
@@ -44,10 +45,10 @@ def test_configure_success_calls_cloudinary_config():
         CLOUD_NAME='test_cloud',
         API_KEY='test_key',
         API_SECRET='test_secret',
-    ), patch('data.cloudinary_connect.cloudinary.config') as mock_config:
+    ), patch('data.cloudinary_connect._sdk') as mock_sdk:
         ccon._configure()
 
-    mock_config.assert_called_once_with(
+    mock_sdk.return_value.config.assert_called_once_with(
         cloud_name='test_cloud',
         api_key='test_key',
         api_secret='test_secret',
@@ -63,9 +64,8 @@ def test_upload_image_returns_secure_url():
         CLOUD_NAME='test_cloud',
         API_KEY='test_key',
         API_SECRET='test_secret',
-    ), patch('data.cloudinary_connect.cloudinary.config'), patch(
-        'data.cloudinary_connect.cloudinary.uploader.upload'
-    ) as mock_upload:
+    ), patch('data.cloudinary_connect._sdk') as mock_sdk:
+        mock_upload = mock_sdk.return_value.uploader.upload
         mock_upload.return_value = {'secure_url': expected_url}
         url = ccon.upload_image('fake_file')
 
@@ -75,3 +75,25 @@ def test_upload_image_returns_secure_url():
         folder=ccon.CLOUDINARY_FOLDER,
         resource_type='image',
     )
+
+
+def test_upload_image_mock_skips_cloudinary(monkeypatch):
+    monkeypatch.setenv(ccon.MOCK_ENV, '1')
+    with patch('data.cloudinary_connect._sdk') as mock_sdk:
+        first = ccon.upload_image(io.BytesIO(b'jpeg bytes'))
+        again = ccon.upload_image(io.BytesIO(b'jpeg bytes'))
+        other = ccon.upload_image(io.BytesIO(b'other bytes'))
+
+    mock_sdk.assert_not_called()
+    assert first.startswith(ccon.MOCK_URL_PREFIX)
+    assert first == again
+    assert first != other
+
+
+def test_ping_mock_skips_credentials(monkeypatch):
+    monkeypatch.setenv(ccon.MOCK_ENV, '1')
+    with patch.multiple(ccon, CLOUD_NAME=None, API_KEY=None,
+                        API_SECRET=None), \
+            patch('data.cloudinary_connect._sdk') as mock_sdk:
+        ccon.ping()
+    mock_sdk.assert_not_called()
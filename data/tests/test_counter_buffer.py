@@ -0,0 +1,90 @@
+from unittest.mock import patch
+
+import pytest
+from bson import ObjectId
+
+import data.counter_buffer as cb
+
+ID_A = str(ObjectId())
+ID_B = str(ObjectId())
+
+
+@pytest.fixture(autouse=True)
+def at_exit():
+    # Keep test buffers from flushing to a real Mongo at interpreter exit.
+    with patch('data.counter_buffer.atexit.register') as register:
+        yield register
+
+
+def _incs(requests):
+    return {
+        str(req._filter['_id']): req._doc['$inc']['num_likes']
+        for req in requests
+    }
+
+
+def test_add_coalesces_per_key():
+    buf = cb.CounterBuffer('listings', 'num_likes', flush_ms=0)
+    for _ in range(5):
+        buf.add(ID_A, 1)
+    buf.add(ID_A, -2)
+    buf.add(ID_B, 1)
+    assert buf.pending() == {ID_A: 3, ID_B: 1}
+
+
+@patch('data.counter_buffer.dbc.bulk_write')
+def test_flush_writes_one_bulk_and_clears(fake_bulk):
+    buf = cb.CounterBuffer('listings', 'num_likes', flush_ms=0)
+    buf.add(ID_A, 1)
+    buf.add(ID_A, 1)
+    buf.add(ID_B, 1)
+    buf.add(ID_B, -1)
+    assert buf.flush() == 1
+    fake_bulk.assert_called_once()
+    coll, requests = fake_bulk.call_args.args
+    assert coll == 'listings'
+    assert _incs(requests) == {ID_A: 2}
+    assert buf.pending() == {}
+    assert buf.flush() == 0
+    assert fake_bulk.call_count == 1
+
+
+@patch('data.counter_buffer.dbc.bulk_write')
+def test_flush_at_max_ops(fake_bulk):
+    buf = cb.CounterBuffer('listings', 'num_likes', flush_ms=0, max_ops=3)
+    buf.add(ID_A, 1)
+    buf.add(ID_A, 1)
+    fake_bulk.assert_not_called()
+    buf.add(ID_A, 1)
+    fake_bulk.assert_called_once()
+    assert _incs(fake_bulk.call_args.args[1]) == {ID_A: 3}
+
+
+def test_failed_flush_keeps_deltas():
+    buf = cb.CounterBuffer('listings', 'num_likes', flush_ms=0)
+    buf.add(ID_A, 2)
+    with patch('data.counter_buffer.dbc.bulk_write',
+               side_effect=RuntimeError('down')):
+        assert buf.flush() == 0
+    buf.add(ID_A, 1)
+    assert buf.pending() == {ID_A: 3}
+    assert buf.stats()['failed_flushes'] == 1
+
+
+@patch('data.counter_buffer.dbc.bulk_write')
+def test_timer_flushes_and_close_drains(fake_bulk):
+    buf = cb.CounterBuffer('listings', 'num_likes', flush_ms=10_000)
+    buf.add(ID_A, 1)
+    assert buf._thread is not None
+    buf.close()
+    assert not buf._thread.is_alive()
+    assert _incs(fake_bulk.call_args.args[1]) == {ID_A: 1}
+
+
+def test_first_add_registers_shutdown_flush_without_timer(at_exit):
+    buf = cb.CounterBuffer('listings', 'num_likes', flush_ms=0)
+    at_exit.assert_not_called()
+    buf.add(ID_A, 1)
+    buf.add(ID_A, 1)
+    at_exit.assert_called_once_with(buf.close)
+    assert buf._thread is None
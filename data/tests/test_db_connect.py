@@ -1,3 +1,6 @@
+import pytest
+from bson import ObjectId
+
 import data.db_connect as dbc
 
 VALID_ID = '1' * dbc.MIN_ID_LEN
@@ -23,4 +26,60 @@ def test_is_not_valid_id_empty_string():
 
 def test_is_not_valid_id_none():
     # None should be invalid (not a string)
-    assert not dbc.is_valid_id(None)
\ No newline at end of file
+    assert not dbc.is_valid_id(None)
+
+
+class _FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+        self.sorted_by = None
+        self.limited = None
+        self.closed = False
+
+    def sort(self, key, direction):
+        self.sorted_by = (key, direction)
+        return self
+
+    def limit(self, n):
+        self.limited = n
+        return self
+
+    def close(self):
+        self.closed = True
+
+    def __iter__(self):
+        return iter(self.docs[:self.limited] if self.limited else self.docs)
+
+
+def _fake_client(cursor, finds):
+    class Collection:
+        def find(self, filt, batch_size=None):
+            finds.append((filt, batch_size))
+            return cursor
+    return {dbc.GEO_DB: {'things': Collection()}}
+
+
+def test_iter_docs_streams_in_id_order(monkeypatch):
+    oid = ObjectId()
+    cursor = _FakeCursor([{dbc.MONGO_ID: oid, 'n': 1}, {dbc.MONGO_ID: 2}])
+    finds = []
+    monkeypatch.setattr(dbc, 'client', _fake_client(cursor, finds))
+    gen = dbc.iter_docs('things', {'n': 1}, after=str(oid), limit=1,
+                        no_id=False)
+    assert finds == [
+        ({'n': 1, dbc.MONGO_ID: {'$gt': oid}}, dbc.ITER_BATCH_SIZE),
+    ]
+    assert cursor.sorted_by == (dbc.MONGO_ID, 1)
+    assert list(gen) == [{dbc.MONGO_ID: str(oid), 'n': 1}]
+    assert cursor.closed
+
+
+def test_iter_docs_rejects_bad_after(monkeypatch):
+    monkeypatch.setattr(dbc, 'client', _fake_client(_FakeCursor([]), []))
+    with pytest.raises(ValueError):
+        dbc.iter_docs('things', after='not-an-id')
+
+
+def test_icase_equals_escapes():
+    clause = dbc.icase_equals(' a.b ')
+    assert clause == {'$regex': r'^\s*a\.b\s*$', '$options': 'i'}
@@ -0,0 +1,99 @@
+import logging
+from types import SimpleNamespace
+
+from pymongo import monitoring
+
+import data.db_monitor as mon
+
+
+def _started(request_id, name, command):
+    return SimpleNamespace(
+        connection_id=('localhost', 27017), request_id=request_id,
+        command_name=name, command=command, database_name='geo2025DB',
+    )
+
+
+def _succeeded(request_id, name, micros, reply):
+    return SimpleNamespace(
+        connection_id=('localhost', 27017), request_id=request_id,
+        command_name=name, duration_micros=micros, reply=reply,
+        database_name='geo2025DB',
+    )
+
+
+def test_shape_hides_values():
+    filt = {'owner': 'a@nyu.edu', '_id': {'$in': [1, 2, 3]},
+            '$or': [{'status': 'sold'}, {'price': {'$gte': 5}}]}
+    assert mon.shape(filt) == {
+        'owner': '?', '_id': {'$in': ['?']},
+        '$or': [{'status': '?'}, {'price': {'$gte': '?'}}],
+    }
+
+
+def test_listener_aggregates_by_route(monkeypatch):
+    monitor = mon.CommandMonitor()
+    token = mon.set_route('/listings/read')
+    try:
+        monitor.started(_started(1, 'find', {'find': 'listings',
+                                             'filter': {}}))
+    finally:
+        mon.reset_route(token)
+    monitor.succeeded(_succeeded(
+        1, 'find', 2000, {'cursor': {'firstBatch': [{}, {}, {}]}},
+    ))
+    monitor.started(_started(2, 'getMore', {'getMore': 9,
+                                            'collection': 'listings'}))
+    monitor.succeeded(_succeeded(
+        2, 'getMore', 1000, {'cursor': {'nextBatch': [{}]}},
+    ))
+    rows = {(r['route'], r['command']): r for r in monitor.snapshot()}
+    find = rows[('/listings/read', 'find')]
+    assert find['collection'] == 'listings'
+    assert find['count'] == 1
+    assert find['docs'] == 3
+    assert find['seconds'] == 0.002
+    assert rows[(mon.NO_ROUTE, 'getMore')]['docs'] == 1
+
+
+def test_slow_query_logged_with_shape(monkeypatch, caplog):
+    monkeypatch.setenv(mon.SLOW_MS_ENV, '5')
+    monitor = mon.CommandMonitor()
+    monitor.started(_started(3, 'find', {
+        'find': 'users', 'filter': {'username': 'alice'},
+    }))
+    with caplog.at_level(logging.WARNING, logger=mon.__name__):
+        monitor.succeeded(_succeeded(3, 'find', 9000, {'cursor': {
+            'firstBatch': [],
+        }}))
+    assert "filter={'username': '?'}" in caplog.text
+    assert 'alice' not in caplog.text
+    assert monitor.snapshot()[0]['slow'] == 1
+
+
+def test_failed_and_reply_bytes(monkeypatch):
+    monkeypatch.setenv(mon.REPLY_BYTES_ENV, '1')
+    monitor = mon.CommandMonitor()
+    monitor.started(_started(4, 'update', {
+        'update': 'listings', 'updates': [{'q': {'_id': 1}}],
+    }))
+    monitor.succeeded(_succeeded(4, 'update', 10, {'n': 1, 'ok': 1}))
+    monitor.started(_started(5, 'update', {'update': 'listings'}))
+    monitor.failed(SimpleNamespace(
+        connection_id=('localhost', 27017), request_id=5,
+        command_name='update', duration_micros=10,
+    ))
+    row = monitor.snapshot()[0]
+    assert row['count'] == 2
+    assert row['docs'] == 1
+    assert row['failures'] == 1
+    assert row['reply_bytes'] > 0
+
+
+def test_event_listeners_knob(monkeypatch):
+    [listener] = mon.event_listeners()
+    assert isinstance(listener, monitoring.CommandListener)
+    assert listener.started.__self__ is mon.LISTENER
+    assert listener.succeeded.__self__ is mon.LISTENER
+    assert listener.failed.__self__ is mon.LISTENER
+    monkeypatch.setenv(mon.ENABLED_ENV, '0')
+    assert mon.event_listeners() == []
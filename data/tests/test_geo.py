@@ -0,0 +1,272 @@
+import random
+
+import pytest
+
+import data.geo as geo
+
+NYC = (40.7128, -74.0060)
+NEWARK = (40.7357, -74.1724)
+LA = (34.0522, -118.2437)
+
+
+def test_haversine_zero():
+    assert geo.haversine_km(*NYC, *NYC) == 0
+
+
+def test_haversine_known_distance():
+    # NYC -> LA is roughly 3936 km great-circle.
+    assert geo.haversine_km(*NYC, *LA) == pytest.approx(3936, rel=0.01)
+
+
+def test_haversine_across_antimeridian():
+    # One degree of longitude at the equator, measured across +/-180.
+    dist = geo.haversine_km(0, 179.5, 0, -179.5)
+    assert dist == pytest.approx(geo.KM_PER_DEG_LAT, rel=0.001)
+
+
+@pytest.mark.parametrize('value', [None, '', '  ', 'abc', 'nan', 91, -90.5])
+def test_parse_lat_rejects(value):
+    with pytest.raises(ValueError):
+        geo.parse_lat(value)
+
+
+def test_parse_lon_accepts_strings():
+    assert geo.parse_lon('-118.25') == -118.25
+
+
+def test_coords_of():
+    assert geo.coords_of({'a': '1.5', 'b': 2}, 'a', 'b') == (1.5, 2.0)
+    assert geo.coords_of({'a': 1}, 'a', 'b') is None
+    assert geo.coords_of({'a': 100, 'b': 0}, 'a', 'b') is None
+
+
+def test_grid_index_nearby_sorted_and_filtered():
+    idx = geo.GridIndex()
+    idx.add('nyc', *NYC)
+    idx.add('newark', *NEWARK)
+    idx.add('la', *LA)
+    assert len(idx) == 3
+    hits = idx.nearby(*NYC, radius_km=50)
+    assert [key for _, key in hits] == ['nyc', 'newark']
+    assert hits[0][0] == 0
+
+
+def test_grid_index_limit():
+    idx = geo.GridIndex()
+    idx.add('nyc', *NYC)
+    idx.add('newark', *NEWARK)
+    hits = idx.nearby(*NEWARK, radius_km=50, limit=1)
+    assert [key for _, key in hits] == ['newark']
+
+
+def test_grid_index_copy_and_remove():
+    idx = geo.GridIndex()
+    idx.add('nyc', *NYC)
+    idx.add('newark', *NEWARK)
+    other = idx.copy()
+    assert other.remove('newark', *NEWARK) is True
+    assert other.remove('newark', *NEWARK) is False
+    other.add('la', *LA)
+    assert len(other) == 2
+    assert [key for _, key in other.nearby(*NYC, radius_km=50)] == ['nyc']
+    # The original is untouched.
+    assert len(idx) == 2
+    assert [key for _, key in idx.nearby(*NYC, radius_km=50)] == [
+        'nyc', 'newark',
+    ]
+    assert idx.nearby(*LA, radius_km=50) == []
+
+
+def test_grid_index_wraps_antimeridian():
+    idx = geo.GridIndex()
+    idx.add('east', -17.0, 179.9)
+    idx.add('west', -17.0, -179.9)
+    hits = idx.nearby(-17.0, 179.95, radius_km=50)
+    assert {key for _, key in hits} == {'east', 'west'}
+
+
+def test_grid_index_near_pole():
+    idx = geo.GridIndex()
+    idx.add('a', 89.9, 0)
+    idx.add('b', 89.9, 180)
+    hits = idx.nearby(90, 0, radius_km=50)
+    assert {key for _, key in hits} == {'a', 'b'}
+
+
+def test_grid_index_matches_linear_scan():
+    rng = random.Random(7)
+    pts = [
+        (i, rng.uniform(-80, 80), rng.uniform(-180, 180))
+        for i in range(3000)
+    ]
+    idx = geo.GridIndex()
+    for key, lat, lon in pts:
+        idx.add(key, lat, lon)
+    for _ in range(20):
+        qlat, qlon = rng.uniform(-80, 80), rng.uniform(-180, 180)
+        expected = sorted(
+            key for key, lat, lon in pts
+            if geo.haversine_km(qlat, qlon, lat, lon) <= 500
+        )
+        got = sorted(key for _, key in idx.nearby(qlat, qlon, 500))
+        assert got == expected
+
+
+def test_parse_bbox():
+    assert geo.parse_bbox('-75,40,-73,41') == (-75.0, 40.0, -73.0, 41.0)
+    # west > east crosses the antimeridian and is allowed.
+    assert geo.parse_bbox('170,-20,-170,-10')[0] == 170.0
+
+
+@pytest.mark.parametrize('value', [
+    None, '', '1,2,3', 'a,b,c,d', '0,50,10,40', '0,0,181,1',
+])
+def test_parse_bbox_rejects(value):
+    with pytest.raises(ValueError):
+        geo.parse_bbox(value)
+
+
+@pytest.mark.parametrize('value', [None, 'x', -1, geo.ZOOM_MAX + 1])
+def test_parse_zoom_rejects(value):
+    with pytest.raises(ValueError):
+        geo.parse_zoom(value)
+
+
+def test_tile_xy_and_quadkey():
+    assert geo.tile_xy(0, 0, 0) == (0, 0)
+    assert geo.tile_xy(10, -10, 1) == (0, 0)
+    assert geo.tile_xy(-10, 10, 1) == (1, 1)
+    # Poles clamp to the Mercator edge instead of overflowing.
+    assert geo.tile_xy(90, 180, 3) == (7, 0)
+    assert geo.quadkey(3, 5, 3) == '213'
+    assert geo.quadkey(0, 0, 0) == ''
+
+
+def test_cluster_grid_counts_roll_up():
+    grid = geo.ClusterGrid(max_level=6)
+    grid.add(*NYC)
+    grid.add(*NEWARK)
+    grid.add(*LA)
+    world = (-180, -85, 180, 85)
+    top = grid.clusters(world, 0)
+    assert len(top) == 1
+    assert top[0]['count'] == 3
+    level_6 = grid.clusters(world, 6)
+    assert sum(c['count'] for c in level_6) == 3
+    assert level_6[0]['count'] == 2  # NYC + Newark share a cell
+    assert all(len(c['key']) == 6 for c in level_6)
+
+
+def test_cluster_grid_copy_and_remove():
+    grid = geo.ClusterGrid(max_level=6)
+    grid.add(*NYC)
+    grid.add(*NEWARK)
+    world = (-180, -85, 180, 85)
+    other = grid.copy()
+    other.remove(*NEWARK)
+    other.add(*LA)
+    level_6 = other.clusters(world, 6)
+    assert sorted(c['count'] for c in level_6) == [1, 1]
+    nyc = [c for c in level_6 if abs(c['lat'] - NYC[0]) < 1e-6]
+    assert nyc and nyc[0]['lon'] == pytest.approx(NYC[1])
+    other.remove(*LA)
+    other.remove(*NYC)
+    assert other.clusters(world, 0) == []
+    # The original is untouched.
+    assert grid.clusters(world, 6)[0]['count'] == 2
+
+
+def test_cluster_grid_bbox_filters_and_wraps():
+    grid = geo.ClusterGrid(max_level=8)
+    grid.add(-17.0, 179.5)
+    grid.add(-17.0, -179.5)
+    grid.add(*NYC)
+    fiji = grid.clusters((179, -18, -179, -16), 8)
+    assert sum(c['count'] for c in fiji) == 2
+    east_only = grid.clusters((179, -18, 180, -16), 8)
+    assert sum(c['count'] for c in east_only) == 1
+
+
+def test_cluster_level_bounded():
+    city_box = (-74.1, 40.6, -73.9, 40.8)
+    assert geo.cluster_level(city_box, 3) == 3 + geo.CLUSTER_CELL_SHIFT
+    assert geo.cluster_level(city_box, 20) == geo.CLUSTER_LEVEL_MAX
+    world = (-180, -85, 180, 85)
+    level = geo.cluster_level(world, 20)
+    n = 1 << level
+    assert n * n <= geo.CLUSTER_CELLS_MAX
+
+
+def test_geohash_encode_reference():
+    # Reference value from the original geohash.org examples.
+    assert geo.geohash_encode(57.64911, 10.40744, 11) == 'u4pruydqqvj'
+    assert geo.geohash_encode(*NYC, 5) == 'dr5re'
+
+
+def test_geohash_cover_is_bounded():
+    cover = geo.geohash_cover((-74.1, 40.6, -73.9, 40.8))
+    assert 0 < len(cover) <= geo.GEOHASH_COVER_MAX
+    assert geo.geohash_encode(*NYC).startswith(tuple(cover))
+    # A world-sized box degrades to one full range scan.
+    assert geo.geohash_cover((-180, -90, 180, 90)) == ['']
+
+
+def test_in_bbox_antimeridian():
+    box = (170, -20, -170, -10)
+    assert geo.in_bbox(-17, 179.9, box)
+    assert geo.in_bbox(-17, -179.9, box)
+    assert not geo.in_bbox(-17, 0, box)
+    assert not geo.in_bbox(0, 179.9, box)
+
+
+def _linear_bbox(pts, box):
+    return sorted(k for k, lat, lon in pts if geo.in_bbox(lat, lon, box))
+
+
+def test_geohash_index_matches_linear_scan():
+    rng = random.Random(11)
+    pts = [
+        (i, rng.uniform(-89, 89), rng.uniform(-180, 180))
+        for i in range(5000)
+    ]
+    idx = geo.GeohashIndex()
+    for key, lat, lon in pts:
+        idx.add(key, lat, lon)
+    boxes = [
+        (-74.5, 40.0, -73.0, 41.5),
+        (170.0, -25.0, -170.0, -5.0),   # crosses the antimeridian
+        (179.0, -90.0, -179.0, 90.0),   # thin sliver across +/-180
+        (-180.0, 80.0, 180.0, 90.0),    # polar cap
+        (-10.0, -10.0, 10.0, 10.0),
+    ]
+    for _ in range(10):
+        west = rng.uniform(-180, 180)
+        east = rng.uniform(-180, 180)
+        south = rng.uniform(-90, 80)
+        boxes.append((west, south, east, rng.uniform(south, 90)))
+    for box in boxes:
+        assert sorted(idx.in_bbox(box)) == _linear_bbox(pts, box), box
+
+
+def test_geohash_index_limit():
+    idx = geo.GeohashIndex()
+    for i in range(10):
+        idx.add(i, 40 + i * 0.01, -74)
+    assert len(idx.in_bbox((-75, 39, -73, 41), limit=3)) == 3
+
+
+def test_geohash_index_copy_and_remove():
+    idx = geo.GeohashIndex()
+    idx.add('nyc', *NYC)
+    idx.add('newark', *NEWARK)
+    box = (-75, 40, -73, 41)
+    other = idx.copy()
+    assert other.remove('newark', *NEWARK)
+    assert not other.remove('newark', *NEWARK)
+    assert not other.remove('la', *LA)
+    other.add('la', *LA)
+    other.sort()
+    assert other.in_bbox(box) == ['nyc']
+    assert other.in_bbox((-119, 33, -118, 35)) == ['la']
+    # The original is untouched.
+    assert sorted(idx.in_bbox(box)) == ['newark', 'nyc']
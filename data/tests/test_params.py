@@ -0,0 +1,22 @@
+import pytest
+
+import data.params as params
+
+
+def test_positive_int_accepts_and_clamps():
+    assert params.positive_int('7', 'limit') == 7
+    assert params.positive_int(500, 'limit', max_value=100) == 100
+
+
+@pytest.mark.parametrize('value', [None, '', 'abc', '1.5', 0, -3])
+def test_positive_int_rejects(value):
+    with pytest.raises(ValueError, match="'page' must be a positive"):
+        params.positive_int(value, 'page')
+
+
+def test_optional_positive_int():
+    assert params.optional_positive_int(None, 'limit') is None
+    assert params.optional_positive_int('', 'limit') is None
+    assert params.optional_positive_int('3', 'limit') == 3
+    with pytest.raises(ValueError):
+        params.optional_positive_int('0', 'limit')
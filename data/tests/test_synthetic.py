@@ -0,0 +1,121 @@
+import csv
+import json
+from unittest.mock import patch
+
+import bcrypt
+import pytest
+
+import data.synthetic as syn
+
+HASH = syn.password_hash(rounds=4)
+
+
+def _gen(**kwargs):
+    sizes = dict(countries=5, states_per_country=3, cities=40, users=30,
+                 listings=60, hashed_password=HASH)
+    sizes.update(kwargs)
+    return syn.Generator(**sizes)
+
+
+def test_same_seed_same_data():
+    a, b = _gen(), _gen()
+    for kind in syn.KINDS:
+        assert list(a.iter_docs(kind)) == list(b.iter_docs(kind))
+
+
+def test_other_seed_other_data():
+    a, b = _gen(), _gen(seed=7)
+    assert list(a.iter_docs('listings')) != list(b.iter_docs('listings'))
+
+
+def test_slice_matches_full_run():
+    gen = _gen()
+    full = list(gen.iter_docs('users'))
+    assert list(gen.iter_docs('users', 10, 20)) == full[10:20]
+
+
+def test_references_are_consistent():
+    gen = _gen()
+    countries = {c['code'] for c in gen.iter_docs('countries')}
+    states = {(s['country_code'], s['code']) for s in gen.iter_docs('states')}
+    assert len(states) == 15
+    cities = {}
+    for city in gen.iter_docs('cities'):
+        assert city['country_code'] in countries
+        assert (city['country_code'], city['state_code']) in states
+        assert -90 <= city['latitude'] <= 90
+        assert -180 <= city['longitude'] <= 180
+        cities[(city['name'], city['state_code'],
+                city['country_code'])] = city
+    users = {}
+    for user in gen.iter_docs('users'):
+        assert user['email'].endswith('.edu')
+        assert (user['city'], user['state'], user['country']) in cities
+        users[user['email']] = user
+    for listing in gen.iter_docs('listings'):
+        owner = users[listing['owner']]
+        assert (listing['city'], listing['state'], listing['country']) \
+            == (owner['city'], owner['state'], owner['country'])
+        lon, lat = listing['location']['coordinates']
+        assert -90 <= lat <= 90
+
+
+def test_users_share_prehashed_password():
+    gen = syn.Generator(countries=1, states_per_country=1, cities=1,
+                        users=2, listings=0, bcrypt_rounds=4)
+    users = list(gen.iter_docs('users'))
+    hashed = users[0]['password']
+    assert users[1]['password'] == hashed
+    assert bcrypt.checkpw(syn.PASSWORD.encode(), hashed.encode())
+
+
+def test_listing_ids_unique():
+    ids = [doc['_id'] for doc in _gen(listings=500).iter_docs('listings')]
+    assert len(set(ids)) == len(ids)
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'countries': 0},
+    {'countries': syn.MAX_COUNTRIES + 1},
+    {'states_per_country': syn.MAX_STATES_PER_COUNTRY + 1},
+    {'cities': 0},
+    {'users': 0},
+])
+def test_invalid_sizes(kwargs):
+    with pytest.raises(ValueError):
+        _gen(**kwargs)
+
+
+def test_write_tsv_uses_etl_headers(tmp_path):
+    gen = _gen()
+    counts = syn.generate(gen, syn.TSV, out=str(tmp_path), log=lambda m: 0)
+    assert counts['cities'] == 40
+    with open(tmp_path / 'cities.tsv', encoding='utf-8') as f:
+        rows = list(csv.reader(f, delimiter='\t'))
+    assert rows[0] == ['city_name', 'state_code', 'latitude', 'longitude',
+                       'country_code']
+    assert len(rows) == 41
+    with open(tmp_path / 'listings.tsv', encoding='utf-8') as f:
+        header = next(csv.reader(f, delimiter='\t'))
+    assert 'owner' in header and '_id' not in header
+
+
+def test_write_ndjson_round_trips(tmp_path):
+    gen = _gen()
+    syn.generate(gen, syn.NDJSON, out=str(tmp_path),
+                 kinds=['listings'], log=lambda m: 0)
+    with open(tmp_path / 'listings.ndjson', encoding='utf-8') as f:
+        docs = [json.loads(line) for line in f]
+    assert len(docs) == 60
+    assert docs[0]['_id'] == str(gen.listing(0)['_id'])
+
+
+@patch('data.synthetic.dbc.insert_many', side_effect=lambda c, d, db: len(d))
+def test_load_mongo_batches(fake_insert):
+    gen = _gen(users=12)
+    n = syn.load_mongo('users', gen.iter_docs('users'), db='scratch',
+                       batch_size=5)
+    assert n == 12
+    assert [len(call.args[1]) for call in fake_insert.call_args_list] \
+        == [5, 5, 2]
+    assert fake_insert.call_args.kwargs['db'] == 'scratch'
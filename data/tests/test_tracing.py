@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+import data.tracing as tracing
+
+TRACE_ID = '4bf92f3577b34da6a3ce929d0e0e4736'
+PARENT_ID = '00f067aa0ba902b7'
+TRACEPARENT = f'00-{TRACE_ID}-{PARENT_ID}-01'
+
+
+@pytest.fixture
+def trace_file(tmp_path, monkeypatch):
+    path = tmp_path / 'spans.jsonl'
+    monkeypatch.setenv(tracing.TRACE_FILE_ENV, str(path))
+    return path
+
+
+def _spans(path):
+    tracing.flush()
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_parse_traceparent():
+    assert tracing.parse_traceparent(TRACEPARENT) == (TRACE_ID, PARENT_ID)
+    assert tracing.parse_traceparent(TRACEPARENT.upper()) == (
+        TRACE_ID, PARENT_ID,
+    )
+    assert tracing.parse_traceparent('garbage') is None
+    assert tracing.parse_traceparent(None) is None
+    assert tracing.parse_traceparent(f'00-{"0" * 32}-{PARENT_ID}-01') is None
+    assert tracing.parse_traceparent(f'ff-{TRACE_ID}-{PARENT_ID}-01') is None
+
+
+def test_disabled_is_noop(monkeypatch):
+    monkeypatch.delenv(tracing.TRACE_FILE_ENV, raising=False)
+    with tracing.span('nothing') as span:
+        assert span is None
+    assert tracing.current_span() is None
+
+
+def test_nested_spans_share_trace(trace_file):
+    with tracing.span('root', traceparent=TRACEPARENT) as root:
+        with tracing.span('child', step=1):
+            tracing.record_span('mongo.find', 2_000_000, collection='x')
+    spans = {s['name']: s for s in _spans(trace_file)}
+    assert spans['root']['traceId'] == TRACE_ID
+    assert spans['root']['parentSpanId'] == PARENT_ID
+    assert spans['child']['parentSpanId'] == root.span_id
+    assert spans['child']['attributes'] == {'step': 1}
+    find = spans['mongo.find']
+    assert find['parentSpanId'] == spans['child']['spanId']
+    assert find['endTimeUnixNano'] - find['startTimeUnixNano'] == 2_000_000
+    assert tracing.current_span() is None
+
+
+def test_error_marks_span(trace_file):
+    with pytest.raises(KeyError):
+        with tracing.span('boom'):
+            raise KeyError('x')
+    (span,) = _spans(trace_file)
+    assert span['status'] == {'code': tracing.STATUS_ERROR}
+    assert span['attributes']['error'] == 'KeyError'
+
+
+def test_record_span_needs_parent(trace_file):
+    tracing.record_span('orphan', 1000)
+    tracing.flush()
+    assert not trace_file.exists()
@@ -0,0 +1,204 @@
+"""
+Lightweight tracing spans, W3C Trace Context (`traceparent`) compatible.
+
+Disabled unless `AXIS_TRACE_FILE` names a file. Finished spans are then
+appended to it as JSON lines shaped like OTLP spans (traceId, spanId,
+parentSpanId, name, start/end in unix nanoseconds, attributes, status),
+so they can be inspected directly or replayed into a real collector.
+While disabled, span() costs one env lookup.
+
+    with tracing.span('cache.reload', collection='listings'):
+        ...
+
+The current span lives in a ContextVar; the server opens a root span per
+request (continuing an incoming `traceparent`) and everything called
+underneath nests inside it.
+"""
+import json
+import os
+import re
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+TRACE_FILE_ENV = 'AXIS_TRACE_FILE'
+TRACEPARENT = 'traceparent'
+
+STATUS_OK = 'OK'
+STATUS_ERROR = 'ERROR'
+
+# Spans buffered before a write (a root span ending also flushes).
+FLUSH_EVERY = 64
+
+_TRACEPARENT_RE = re.compile(
+    r'^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$'
+)
+_INVALID_TRACE = '0' * 32
+_INVALID_SPAN = '0' * 16
+
+_current = ContextVar('axis_span', default=None)
+_buffer = []
+_lock = threading.Lock()
+
+
+def trace_file():
+    return os.environ.get(TRACE_FILE_ENV, '').strip() or None
+
+
+def enabled() -> bool:
+    return trace_file() is not None
+
+
+class Span:
+    __slots__ = ('name', 'trace_id', 'span_id', 'parent_id', 'start_ns',
+                 'end_ns', 'attributes', 'status', 'remote_parent')
+
+    def __init__(self, name, trace_id, parent_id=None, attributes=None,
+                 remote_parent=False):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes or {})
+        self.status = STATUS_OK
+        self.remote_parent = remote_parent
+
+    def set(self, key, value):
+        self.attributes[key] = value
+
+    def traceparent(self) -> str:
+        return format_traceparent(self.trace_id, self.span_id)
+
+    def to_dict(self) -> dict:
+        return {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'parentSpanId': self.parent_id or '',
+            'name': self.name,
+            'startTimeUnixNano': self.start_ns,
+            'endTimeUnixNano': self.end_ns,
+            'attributes': self.attributes,
+            'status': {'code': self.status},
+        }
+
+
+def parse_traceparent(value):
+    """(trace_id, parent_span_id) from a traceparent header, or None."""
+    m = _TRACEPARENT_RE.match((value or '').strip().lower())
+    if not m:
+        return None
+    version, trace_id, span_id, _ = m.groups()
+    if version == 'ff' or trace_id == _INVALID_TRACE \
+            or span_id == _INVALID_SPAN:
+        return None
+    return trace_id, span_id
+
+
+def format_traceparent(trace_id, span_id, sampled=True) -> str:
+    return f'00-{trace_id}-{span_id}-{"01" if sampled else "00"}'
+
+
+def current_span():
+    return _current.get()
+
+
+def start_span(name, traceparent=None, **attributes):
+    """
+    Open a span as a child of the current one (or of `traceparent`, or
+    as a new root) and make it current. Returns (span, token) for
+    end_span(), or (None, None) when tracing is off.
+    """
+    if not enabled():
+        return None, None
+    parent = _current.get()
+    remote = False
+    if parent is not None:
+        trace_id, parent_id = parent.trace_id, parent.span_id
+    else:
+        ctx = parse_traceparent(traceparent)
+        if ctx is not None:
+            trace_id, parent_id = ctx
+            remote = True
+        else:
+            trace_id, parent_id = secrets.token_hex(16), None
+    span_ = Span(name, trace_id, parent_id, attributes, remote)
+    return span_, _current.set(span_)
+
+
+def end_span(span_, token, error=None):
+    if span_ is None:
+        return
+    span_.end_ns = time.time_ns()
+    if error is not None:
+        span_.status = STATUS_ERROR
+        span_.set('error', type(error).__name__)
+    _current.reset(token)
+    root = span_.parent_id is None or span_.remote_parent
+    _export(span_.to_dict(), flush=root)
+
+
+@contextmanager
+def span(name, **attributes):
+    """Context manager around start_span()/end_span(); yields the span
+    (None when tracing is off)."""
+    span_, token = start_span(name, **attributes)
+    try:
+        yield span_
+    except BaseException as exc:
+        end_span(span_, token, error=exc)
+        raise
+    end_span(span_, token)
+
+
+def traced(name):
+    """Decorator form of span()."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_span(name, duration_ns, error=False, **attributes):
+    """
+    Record an already finished operation (e.g. from a pymongo event) as
+    a child of the current span. No-op without a current span.
+    """
+    parent = _current.get()
+    if parent is None or not enabled():
+        return
+    span_ = Span(name, parent.trace_id, parent.span_id, attributes)
+    span_.end_ns = time.time_ns()
+    span_.start_ns = span_.end_ns - int(duration_ns)
+    if error:
+        span_.status = STATUS_ERROR
+    _export(span_.to_dict())
+
+
+def _export(record, flush=False):
+    with _lock:
+        _buffer.append(record)
+        if flush or len(_buffer) >= FLUSH_EVERY:
+            _flush_locked()
+
+
+def _flush_locked():
+    path = trace_file()
+    if _buffer and path:
+        with open(path, 'a', encoding='utf-8') as f:
+            for rec in _buffer:
+                f.write(json.dumps(rec, default=str) + '\n')
+    _buffer.clear()
+
+
+def flush():
+    """Write any buffered spans now."""
+    with _lock:
+        _flush_locked()
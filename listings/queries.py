@@ -1,10 +1,17 @@
 """
 This file deals with our listing-level data (marketplace items).
 """
+import os
+import threading
 from datetime import datetime, timezone
 from functools import wraps
 
+import cities.queries as cityqry
+import data.counter_buffer as counter_buffer
+import data.cache_utils as cache_utils
 import data.db_connect as dbc
+import data.geo as geo
+import data.params as params
 from bson import ObjectId
 
 MIN_ID_LEN = 1
@@ -26,9 +33,30 @@ COUNTRY = 'country'
 PRICE = 'price'
 NUM_LIKES = 'num_likes'
 CREATED_AT = 'created_at'
+# GeoJSON point resolved from city/state/country via the cities cache.
+LOCATION = 'location'
+DISTANCE = 'distance'
+DISTANCE_KM = 'distance_km'
+# Compact summary representation: first image only, for list views.
+IMAGE = 'image'
+
+# Listing representations for read endpoints.
+FULL = 'full'
+SUMMARY = 'summary'
+VIEWS = (FULL, SUMMARY)
 
 VALID_TRANSACTION_TYPES = {'free', 'sell'}
 
+# num_likes write mode (env): 'direct' writes every like straight to
+# Mongo; 'buffered' coalesces them in-process (data.counter_buffer) and
+# flushes every AXIS_LIKES_FLUSH_MS or AXIS_LIKES_FLUSH_OPS likes, at
+# the cost of losing unflushed likes on a hard crash.
+LIKES_WRITE_MODE_ENV = 'AXIS_LIKES_WRITE_MODE'
+LIKES_FLUSH_MS_ENV = 'AXIS_LIKES_FLUSH_MS'
+LIKES_FLUSH_OPS_ENV = 'AXIS_LIKES_FLUSH_OPS'
+DIRECT = 'direct'
+BUFFERED = 'buffered'
+
 SAMPLE_LISTING = {
     TITLE: 'Textbook - Intro to CS',
     DESCRIPTION: 'Like new, barely used.',
@@ -44,30 +72,216 @@ SAMPLE_LISTING = {
 }
 
 cache = None
+cache_utils.track(LISTING_COLLECTION, lambda: cache)
+# Spatial indexes derived from the cache (see cache_utils.Derived), each
+# tied to the dict it was built from. Each is built on first use; after
+# that, reloads and writes hand it on to the new dict (see
+# _carry_indexes) instead of rebuilding it.
+# Radius lookups for near_lat/near_lon.
+geo_index = cache_utils.Derived()
+# Per-level map clusters.
+cluster_grid = cache_utils.Derived()
+# Geohash-sorted keys for bbox lookups.
+bbox_index = cache_utils.Derived()
+# CounterBuffer for num_likes in buffered mode; created on first like.
+likes_buffer = None
+# Held while a buffered like checks, queues and applies its delta to the
+# cached listing, so concurrent likes never lose a cached increment.
+_likes_lock = threading.Lock()
+# Held while a new cache is published, so a write's patch is never based
+# on a cache that is being replaced.
+_publish_lock = threading.Lock()
 
 
 def needs_cache(fn):
     @wraps(fn)
     def wrapper(*args, **kwargs):
         if not cache:
+            cache_utils.record_miss(LISTING_COLLECTION)
             load_cache()
+        else:
+            cache_utils.record_hit(LISTING_COLLECTION)
         return fn(*args, **kwargs)
     return wrapper
 
 
+@cache_utils.timed_reload(LISTING_COLLECTION)
 def load_cache():
+    """
+    Read every listing into a new dict and publish it only once it is
+    complete. Spatial indexes built for the previous cache carry over,
+    patched for the listings whose location changed.
+    """
     global cache
-    cache = {}
+    new_cache = {}
     listings = dbc.read(LISTING_COLLECTION, no_id=False)
+    _overlay_pending_likes(listings)
     for listing in listings:
         key = listing[dbc.MONGO_ID]
-        cache[key] = listing
+        new_cache[key] = listing
+    with _publish_lock:
+        old = cache
+        if old is not None and _has_indexes(old):
+            _carry_indexes(old, new_cache, _moves(old, new_cache))
+        cache = new_cache
 
 
 def clear_cache():
     """Clear the cache. Useful for testing."""
     global cache
     cache = None
+    geo_index.reset()
+    cluster_grid.reset()
+    bbox_index.reset()
+
+
+def _build_geo_index(listings) -> geo.GridIndex:
+    idx = geo.GridIndex()
+    for key, listing in listings.items():
+        coords = _location_coords(listing)
+        if coords:
+            idx.add(key, *coords)
+    return idx
+
+
+def _has_indexes(listings) -> bool:
+    return any(
+        derived.peek(listings) is not None
+        for derived in (geo_index, cluster_grid, bbox_index)
+    )
+
+
+def _moves(old: dict, new: dict) -> list:
+    """
+    (key, coords before, coords after) for every listing whose location
+    differs between two caches; None stands for no location.
+    """
+    moves = []
+    for key in old.keys() | new.keys():
+        before = _location_coords(old[key]) if key in old else None
+        after = _location_coords(new[key]) if key in new else None
+        if before != after:
+            moves.append((key, before, after))
+    return moves
+
+
+def _carry_indexes(old: dict, new_cache: dict, moves: list) -> None:
+    """
+    Hand the spatial indexes built for `old` on to `new_cache`. With no
+    moves (see _moves) the same indexes are shared; otherwise copies are
+    patched, since other threads may still be querying the originals.
+    Indexes not yet built for `old` are left to build on first use.
+    """
+    idx = geo_index.peek(old)
+    if idx is not None:
+        if moves:
+            idx = idx.copy()
+            for key, before, after in moves:
+                if before:
+                    idx.remove(key, *before)
+                if after:
+                    idx.add(key, *after)
+        geo_index.prime(new_cache, idx)
+    grid = cluster_grid.peek(old)
+    if grid is not None:
+        if moves:
+            grid = grid.copy()
+            for _, before, after in moves:
+                if before:
+                    grid.remove(*before)
+                if after:
+                    grid.add(*after)
+        cluster_grid.prime(new_cache, grid)
+    hashes = bbox_index.peek(old)
+    if hashes is not None:
+        if moves:
+            hashes = hashes.copy()
+            for key, before, after in moves:
+                if before:
+                    hashes.remove(key, *before)
+                if after:
+                    hashes.add(key, *after)
+            hashes.sort()
+        bbox_index.prime(new_cache, hashes)
+
+
+def _patch_cache(listing_id: str, listing: dict = None) -> None:
+    """
+    Publish a copy of the cache with one listing replaced (None removes
+    it) instead of reloading every listing from Mongo, with its spatial
+    indexes carried over. Nothing to do while no cache is loaded.
+    """
+    global cache
+    with _publish_lock:
+        old = cache
+        if old is None:
+            return
+        new_cache = dict(old)
+        prev = new_cache.pop(listing_id, None)
+        if listing is not None:
+            new_cache[listing_id] = listing
+        before = _location_coords(prev) if prev else None
+        after = _location_coords(listing) if listing else None
+        moves = [(listing_id, before, after)] if before != after else []
+        _carry_indexes(old, new_cache, moves)
+        cache = new_cache
+
+
+def make_summary(listing: dict) -> dict:
+    """
+    What a browsing feed needs: id, title, price, status and the first
+    image URL (or None). Descriptions and the rest of the images are
+    left out.
+    """
+    images = listing.get(IMAGES) or []
+    return {
+        dbc.MONGO_ID: listing.get(dbc.MONGO_ID),
+        TITLE: listing.get(TITLE),
+        PRICE: listing.get(PRICE),
+        STATUS: listing.get(STATUS),
+        IMAGE: images[0] if images else None,
+    }
+
+
+def parse_view(view) -> str:
+    """Validate a `view` param; empty means FULL."""
+    if view is None or view == '':
+        return FULL
+    if not isinstance(view, str) or view.strip().lower() not in VIEWS:
+        raise ValueError(f"'view' must be one of {list(VIEWS)}")
+    return view.strip().lower()
+
+
+def _summary_of(listing: dict) -> dict:
+    summary = make_summary(listing)
+    if DISTANCE_KM in listing:
+        summary[DISTANCE_KM] = listing[DISTANCE_KM]
+    return summary
+
+
+def _location_point(city, state, country):
+    """
+    GeoJSON point for a listing's city/state/country, or None when the
+    city is not in the cities cache (the listing is then just not
+    reachable by distance queries).
+    """
+    coords = cityqry.get_coords(city, state, country)
+    if not coords:
+        return None
+    lat, lon = coords
+    return {'type': 'Point', 'coordinates': [lon, lat]}
+
+
+def _location_coords(listing: dict):
+    """(lat, lon) from a listing's stored location point, or None."""
+    point = listing.get(LOCATION)
+    if not isinstance(point, dict):
+        return None
+    try:
+        lon, lat = point['coordinates']
+    except (KeyError, TypeError, ValueError):
+        return None
+    return geo.coords_of({'lat': lat, 'lon': lon}, 'lat', 'lon')
 
 
 def is_valid_id(_id: str) -> bool:
@@ -213,10 +427,24 @@ def update(listing_id: str, update_dict: dict) -> dict:
             "city, state, country, price, num_likes."
         )
     _validate_listing_update(allowed)
+    if any(fld in allowed for fld in (CITY, STATE, COUNTRY)):
+        current = cache.get(listing_id) or {}
+        place = {
+            fld: allowed.get(fld, current.get(fld))
+            for fld in (CITY, STATE, COUNTRY)
+        }
+        allowed[LOCATION] = _location_point(
+            place[CITY], place[STATE], place[COUNTRY],
+        )
     result = dbc.update(LISTING_COLLECTION, {dbc.MONGO_ID: obj_id}, allowed)
     if result.matched_count < 1:
         raise ValueError(f"Listing not found: {listing_id}")
-    load_cache()
+    current = cache.get(listing_id)
+    if current is None:
+        # Written by another instance since our last load.
+        load_cache()
+    else:
+        _patch_cache(listing_id, dict(current, **allowed))
     return cache.get(listing_id, {})
 
 
@@ -239,9 +467,12 @@ def create(listing: dict, reload=True) -> str:
     if NUM_LIKES not in doc or doc[NUM_LIKES] is None:
         doc[NUM_LIKES] = 0
     doc[CREATED_AT] = datetime.now(timezone.utc).isoformat()
+    location = _location_point(doc[CITY], doc[STATE], doc[COUNTRY])
+    if location:
+        doc[LOCATION] = location
     rec_id = dbc.create(LISTING_COLLECTION, doc)
     if reload:
-        load_cache()
+        _patch_cache(rec_id, dict(doc, **{dbc.MONGO_ID: rec_id}))
     return rec_id
 
 
@@ -256,22 +487,36 @@ def delete(listing_id: str) -> bool:
     ret = dbc.delete(LISTING_COLLECTION, {dbc.MONGO_ID: obj_id})
     if ret < 1:
         raise ValueError(f'Listing not found: {listing_id}')
-    load_cache()
+    _patch_cache(listing_id)
     return ret > 0
 
 
 @needs_cache
-def read() -> dict:
+def read(view=FULL) -> dict:
+    """
+    All listings keyed by id; view=SUMMARY returns summaries (see
+    make_summary) instead of full documents.
+    """
+    view = parse_view(view)
     # In cloud environments with multiple backend instances, each process has
     # its own in-memory cache. Refresh on read to avoid returning stale listing
     # snapshots after like/unlike updates.
     load_cache()
-    return cache
+    listings = cache
+    if view == SUMMARY:
+        return {key: make_summary(it) for key, it in listings.items()}
+    return listings
 
 
 PAGE_SIZE_DEFAULT = 20
 PAGE_SIZE_MAX = 100
-SORTABLE_FIELDS = {CREATED_AT, TITLE, PRICE, NUM_LIKES}
+SORTABLE_FIELDS = {CREATED_AT, TITLE, PRICE, NUM_LIKES, DISTANCE}
+RADIUS_KM_DEFAULT = 25.0
+RADIUS_KM_MAX = 500.0
+BBOX_LIMIT_DEFAULT = 200
+BBOX_LIMIT_MAX = 1000
+# Filters /listings/export accepts; all are case-insensitive exact matches.
+EXPORT_FILTERS = (STATUS, OWNER, TRANSACTION_TYPE, CITY, STATE, COUNTRY)
 
 
 @needs_cache
@@ -281,6 +526,10 @@ def read_paginated(
     status=None,
     owner=None,
     sort=None,
+    near_lat=None,
+    near_lon=None,
+    radius_km=None,
+    view=FULL,
 ):
     """
     Return a paginated, filtered, sorted slice of listings.
@@ -291,26 +540,21 @@ def read_paginated(
       status: case-insensitive exact-match filter on the status field.
       owner: case-insensitive exact-match filter on the owner field.
       sort: field name with optional '-' prefix for descending. Allowed
-            fields: created_at, title, price, num_likes. Default
-            '-created_at'.
+            fields: created_at, title, price, num_likes, and distance
+            (needs near_lat/near_lon). Default '-created_at'.
+      near_lat, near_lon: restrict to listings within radius_km of this
+            point (served by the spatial index); each item then carries
+            'distance_km'.
+      radius_km: search radius (default RADIUS_KM_DEFAULT, max
+            RADIUS_KM_MAX); only used with near_lat/near_lon.
+      view: 'full' (default) or 'summary' for compact items.
 
     Returns dict: items (list), page, page_size, total, has_next.
     """
-    load_cache()
+    view = parse_view(view)
 
-    try:
-        page = int(page)
-    except (TypeError, ValueError):
-        raise ValueError("'page' must be a positive integer")
-    if page < 1:
-        raise ValueError("'page' must be a positive integer")
-    try:
-        page_size = int(page_size)
-    except (TypeError, ValueError):
-        raise ValueError("'page_size' must be a positive integer")
-    if page_size < 1:
-        raise ValueError("'page_size' must be at least 1")
-    page_size = min(page_size, PAGE_SIZE_MAX)
+    page = params.positive_int(page, 'page')
+    page_size = params.positive_int(page_size, 'page_size', PAGE_SIZE_MAX)
 
     if sort is None or sort == '':
         sort = f'-{CREATED_AT}'
@@ -324,11 +568,35 @@ def read_paginated(
             f"(prefix with '-' for descending), got {sort!r}"
         )
 
+    near = near_lat is not None or near_lon is not None
+    if sort_field == DISTANCE and not near:
+        raise ValueError("sort=distance requires 'near_lat' and 'near_lon'")
+    if near:
+        lat = geo.parse_lat(near_lat, 'near_lat')
+        lon = geo.parse_lon(near_lon, 'near_lon')
+        if radius_km is None or radius_km == '':
+            radius_km = RADIUS_KM_DEFAULT
+        radius_km = geo.parse_coord(
+            radius_km, 'radius_km', 0.0, RADIUS_KM_MAX,
+        )
+        # Served from the loaded cache and its spatial index (kept
+        # current by this instance's writes), not a fresh reload.
+        listings = cache
+        index = geo_index.get(listings, _build_geo_index)
+        candidates = []
+        for dist, key in index.nearby(lat, lon, radius_km):
+            listing = dict(listings[key])
+            listing[DISTANCE_KM] = round(dist, 3)
+            candidates.append(listing)
+    else:
+        load_cache()
+        candidates = cache.values()
+
     status_norm = status.strip().lower() if isinstance(status, str) else None
     owner_norm = owner.strip().lower() if isinstance(owner, str) else None
 
     items = []
-    for listing in cache.values():
+    for listing in candidates:
         if status_norm:
             if (listing.get(STATUS) or '').strip().lower() != status_norm:
                 continue
@@ -337,6 +605,9 @@ def read_paginated(
                 continue
         items.append(listing)
 
+    if sort_field == DISTANCE:
+        sort_field = DISTANCE_KM
+
     def _sort_key(it):
         value = it.get(sort_field)
         # None sorts last regardless of direction.
@@ -347,8 +618,11 @@ def read_paginated(
     total = len(items)
     start = (page - 1) * page_size
     end = start + page_size
+    page_items = items[start:end]
+    if view == SUMMARY:
+        page_items = [_summary_of(it) for it in page_items]
     return {
-        'items': items[start:end],
+        'items': page_items,
         'page': page,
         'page_size': page_size,
         'total': total,
@@ -415,6 +689,215 @@ def search_listings_by_owner(owner: str) -> dict:
     return matching
 
 
+def _build_cluster_grid(listings) -> geo.ClusterGrid:
+    grid = geo.ClusterGrid()
+    for listing in listings.values():
+        coords = _location_coords(listing)
+        if coords:
+            grid.add(*coords)
+    return grid
+
+
+@needs_cache
+def get_clusters(bbox: tuple, level: int) -> list:
+    """
+    Listing counts per map cell overlapping bbox at a cluster level
+    (see geo.cluster_level). The per-level grid is built once and kept
+    across reloads and writes (see _carry_indexes).
+    """
+    return cluster_grid.get(cache, _build_cluster_grid).clusters(bbox, level)
+
+
+def _build_bbox_index(listings) -> geo.GeohashIndex:
+    idx = geo.GeohashIndex()
+    for key, listing in listings.items():
+        coords = _location_coords(listing)
+        if coords:
+            idx.add(key, *coords)
+    idx.sort()
+    return idx
+
+
+@needs_cache
+def search_in_bbox(bbox: tuple, limit=BBOX_LIMIT_DEFAULT) -> tuple:
+    """
+    Listings located inside bbox (west, south, east, north; west > east
+    crosses the antimeridian), via geohash prefix range scans.
+    Returns (dict keyed by _id, truncated) where truncated is True when
+    more than `limit` listings matched.
+    """
+    limit = params.positive_int(limit, 'limit', BBOX_LIMIT_MAX)
+    listings = cache
+    keys = bbox_index.get(listings, _build_bbox_index).in_bbox(
+        bbox, limit + 1,
+    )
+    return {key: listings[key] for key in keys[:limit]}, len(keys) > limit
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, '').strip() or default)
+    except ValueError:
+        return default
+
+
+def likes_write_mode() -> str:
+    mode = os.environ.get(LIKES_WRITE_MODE_ENV, DIRECT).strip().lower()
+    return BUFFERED if mode == BUFFERED else DIRECT
+
+
+def _likes_buffer():
+    """The num_likes CounterBuffer, or None in direct mode."""
+    global likes_buffer
+    if likes_write_mode() != BUFFERED:
+        return None
+    if likes_buffer is None:
+        likes_buffer = counter_buffer.CounterBuffer(
+            LISTING_COLLECTION,
+            NUM_LIKES,
+            flush_ms=_env_int(LIKES_FLUSH_MS_ENV,
+                              counter_buffer.FLUSH_MS_DEFAULT),
+            max_ops=_env_int(LIKES_FLUSH_OPS_ENV,
+                             counter_buffer.MAX_OPS_DEFAULT),
+        )
+    return likes_buffer
+
+
+def _overlay_pending_likes(listings):
+    """Add not-yet-flushed like deltas to listings read from Mongo."""
+    if likes_buffer is None:
+        return
+    pending = likes_buffer.pending()
+    if not pending:
+        return
+    for listing in listings:
+        delta = pending.get(listing.get(dbc.MONGO_ID))
+        if delta:
+            listing[NUM_LIKES] = (listing.get(NUM_LIKES) or 0) + delta
+
+
+def add_likes(listing_id: str, delta: int):
+    """
+    Atomically `$inc` num_likes by delta (never below zero) and patch
+    the cached listing in place instead of reloading the cache. Returns
+    the updated listing, or None if it does not exist (or is already at
+    zero for a decrement).
+
+    In buffered mode the delta is queued on the likes buffer instead and
+    the returned count is the cached one plus pending deltas.
+    """
+    if not ObjectId.is_valid(listing_id):
+        raise ValueError(f'Invalid listing ID format: {listing_id}')
+    buf = _likes_buffer()
+    if buf is not None:
+        return _add_likes_buffered(buf, listing_id, delta)
+    filt = {dbc.MONGO_ID: ObjectId(listing_id)}
+    if delta < 0:
+        filt[NUM_LIKES] = {'$gte': -delta}
+    doc = dbc.find_one_and_update(
+        LISTING_COLLECTION, filt, {'$inc': {NUM_LIKES: delta}},
+    )
+    if doc is not None and cache is not None and doc[dbc.MONGO_ID] in cache:
+        cache[doc[dbc.MONGO_ID]][NUM_LIKES] = doc[NUM_LIKES]
+    return doc
+
+
+def _add_likes_buffered(buf, listing_id, delta):
+    listing = cache.get(listing_id) if cache is not None else None
+    if listing is None:
+        listing = get_by_ids([listing_id]).get(listing_id)
+        if listing is None:
+            return None
+    with _likes_lock:
+        current = listing.get(NUM_LIKES) or 0
+        if current + delta < 0:
+            return None
+        buf.add(listing_id, delta)
+        listing[NUM_LIKES] = current + delta
+        return dict(listing)
+
+
+def flush_likes() -> int:
+    """Flush buffered num_likes deltas now; returns listings written."""
+    if likes_buffer is None:
+        return 0
+    return likes_buffer.flush()
+
+
+def get_by_ids(listing_ids) -> dict:
+    """
+    Fetch listings by _id in one `$in` query, straight from Mongo so
+    another instance's recent writes are visible. Returns {id: listing};
+    ids that are malformed or no longer exist are simply absent.
+    """
+    oids = []
+    for listing_id in listing_ids:
+        if ObjectId.is_valid(listing_id):
+            oids.append(ObjectId(listing_id))
+    if not oids:
+        return {}
+    docs = dbc.read_many(
+        LISTING_COLLECTION, {dbc.MONGO_ID: {'$in': oids}}, no_id=False,
+    )
+    _overlay_pending_likes(docs)
+    return {doc[dbc.MONGO_ID]: doc for doc in docs}
+
+
+def export(after=None, limit=None, **filters):
+    """
+    Stream listings straight from Mongo in _id order, bypassing the
+    cache so memory stays flat for any collection size.
+
+    Params:
+      after: _id of the last listing already received; resumes after it.
+      limit: max number of listings (default: all).
+      filters: any of EXPORT_FILTERS, case-insensitive exact matches.
+
+    Returns a generator of listing dicts (with string '_id'). Invalid
+    input raises ValueError before the generator is returned.
+    """
+    unknown = set(filters) - set(EXPORT_FILTERS)
+    if unknown:
+        raise ValueError(f'Unknown export filter(s): {sorted(unknown)}')
+    filt = {
+        fld: dbc.icase_equals(value)
+        for fld, value in filters.items()
+        if isinstance(value, str) and value.strip()
+    }
+    return dbc.iter_docs(
+        LISTING_COLLECTION,
+        filt,
+        after=after,
+        limit=params.optional_positive_int(limit, 'limit'),
+        no_id=False,
+    )
+
+
+def backfill_locations() -> int:
+    """
+    Resolve and store `location` for listings written before locations
+    were denormalized. Returns the number of listings updated.
+    """
+    updated = 0
+    # Matches docs with no location field as well as an explicit null.
+    missing = {LOCATION: None}
+    for listing in dbc.iter_docs(LISTING_COLLECTION, missing, no_id=False):
+        location = _location_point(
+            listing.get(CITY), listing.get(STATE), listing.get(COUNTRY),
+        )
+        if not location:
+            continue
+        dbc.update(
+            LISTING_COLLECTION,
+            {dbc.MONGO_ID: ObjectId(listing[dbc.MONGO_ID])},
+            {LOCATION: location},
+        )
+        updated += 1
+    if updated:
+        load_cache()
+    return updated
+
+
 def main():
     print(read())
 
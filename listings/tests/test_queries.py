@@ -1,9 +1,12 @@
 # To run test: PYTHONPATH=$(pwd) pytest -v listings/tests/test_queries.py
 
+import time
+from concurrent.futures import ThreadPoolExecutor
 from copy import deepcopy
 from unittest.mock import patch
 
 import pytest
+from bson import ObjectId
 
 import listings.queries as qry
 
@@ -477,3 +480,401 @@ def test_update_partial(temp_listing_unique):
 def test_update_invalid_listing_id():
     with pytest.raises(ValueError, match='Invalid listing ID format'):
         qry.update('not-valid-id', {qry.TITLE: 'X'})
+
+
+# ---- distance queries -------------------------------------------------
+
+def _point(lat, lon):
+    return {'type': 'Point', 'coordinates': [lon, lat]}
+
+
+_GEO_DB = [
+    {'_id': 'nyc', qry.TITLE: 'Lamp', qry.STATUS: 'available',
+     qry.CREATED_AT: '2026-01-01', qry.LOCATION: _point(40.7128, -74.0060)},
+    {'_id': 'newark', qry.TITLE: 'Desk', qry.STATUS: 'available',
+     qry.CREATED_AT: '2026-02-01', qry.LOCATION: _point(40.7357, -74.1724)},
+    {'_id': 'sold', qry.TITLE: 'Chair', qry.STATUS: 'sold',
+     qry.CREATED_AT: '2026-03-01', qry.LOCATION: _point(40.73, -74.0)},
+    {'_id': 'la', qry.TITLE: 'Bike', qry.STATUS: 'available',
+     qry.CREATED_AT: '2026-04-01', qry.LOCATION: _point(34.05, -118.24)},
+    {'_id': 'legacy', qry.TITLE: 'Book', qry.STATUS: 'available',
+     qry.CREATED_AT: '2026-05-01'},
+]
+
+
+@pytest.fixture
+def geo_listings():
+    qry.clear_cache()
+    with patch('listings.queries.dbc.read', return_value=deepcopy(_GEO_DB)):
+        yield
+    qry.clear_cache()
+
+
+def test_read_paginated_near_sort_distance(geo_listings):
+    res = qry.read_paginated(
+        near_lat=40.7128, near_lon=-74.0060, radius_km=50, sort='distance',
+    )
+    ids = [it['_id'] for it in res['items']]
+    assert ids == ['nyc', 'sold', 'newark']
+    assert res['total'] == 3
+    dists = [it[qry.DISTANCE_KM] for it in res['items']]
+    assert dists == sorted(dists)
+    # Distances are added to copies, never to the cached listings.
+    assert qry.DISTANCE_KM not in qry.cache['nyc']
+
+
+def test_read_paginated_near_with_filter_and_default_sort(geo_listings):
+    res = qry.read_paginated(
+        near_lat='40.7128', near_lon='-74.0060', status='available',
+    )
+    ids = [it['_id'] for it in res['items']]
+    # Default radius keeps NYC + Newark; default sort is newest first.
+    assert ids == ['newark', 'nyc']
+
+
+def test_read_paginated_near_invalid_inputs(geo_listings):
+    with pytest.raises(ValueError, match='requires'):
+        qry.read_paginated(sort='distance')
+    with pytest.raises(ValueError, match="'near_lon'"):
+        qry.read_paginated(near_lat=40)
+    with pytest.raises(ValueError, match="'radius_km'"):
+        qry.read_paginated(
+            near_lat=40, near_lon=-74, radius_km=qry.RADIUS_KM_MAX + 1,
+        )
+
+
+def _no_reload():
+    raise AssertionError('unexpected full cache reload')
+
+
+def test_near_queries_do_not_reload(geo_listings, monkeypatch):
+    qry.read_paginated(near_lat=40.7128, near_lon=-74.0060)
+    index = qry.geo_index.peek(qry.cache)
+    assert index is not None
+    monkeypatch.setattr(qry, 'load_cache', _no_reload)
+    res = qry.read_paginated(near_lat=40.7128, near_lon=-74.0060)
+    assert res['total'] == 3
+    assert qry.geo_index.peek(qry.cache) is index
+
+
+def test_writes_patch_spatial_index(geo_listings, monkeypatch):
+    new_id = str(ObjectId())
+    near = {'near_lat': 40.7128, 'near_lon': -74.0060, 'radius_km': 50}
+    qry.read_paginated(**near)
+    before = qry.cache
+    monkeypatch.setattr(qry, 'load_cache', _no_reload)
+    monkeypatch.setattr(qry.dbc, 'create', lambda coll, doc: new_id)
+    monkeypatch.setattr(
+        qry.cityqry, 'get_coords', lambda *place: (40.7306, -73.9866),
+    )
+    qry.create(get_temp_rec())
+    ids = {it['_id'] for it in qry.read_paginated(**near)['items']}
+    assert ids == {'nyc', 'newark', 'sold', new_id}
+    # Requests already holding the old cache are unaffected.
+    assert new_id not in before
+    assert qry.geo_index.peek(before) is None
+
+    monkeypatch.setattr(qry.dbc, 'delete', lambda coll, filt: 1)
+    qry.delete(new_id)
+    ids = {it['_id'] for it in qry.read_paginated(**near)['items']}
+    assert ids == {'nyc', 'newark', 'sold'}
+
+
+def _count_builds(monkeypatch):
+    builds = []
+    for name in ('_build_geo_index', '_build_cluster_grid',
+                 '_build_bbox_index'):
+        def counted(listings, build=getattr(qry, name), name=name):
+            builds.append(name)
+            return build(listings)
+        monkeypatch.setattr(qry, name, counted)
+    return builds
+
+
+def _spatial_queries():
+    near = qry.read_paginated(near_lat=40.7128, near_lon=-74.0060)
+    clusters = qry.get_clusters((-180, -85, 180, 85), 0)
+    in_bbox, _ = qry.search_in_bbox((-74.5, 40.5, -73.5, 41))
+    return (
+        {it['_id'] for it in near['items']},
+        clusters[0]['count'],
+        set(in_bbox),
+    )
+
+
+def test_feed_reloads_keep_spatial_indexes(geo_listings, monkeypatch):
+    builds = _count_builds(monkeypatch)
+    for _ in range(5):
+        qry.read()  # plain feed reads reload the cache
+        assert _spatial_queries() == (
+            {'nyc', 'newark', 'sold'}, 4, {'nyc', 'newark', 'sold'},
+        )
+    assert sorted(builds) == [
+        '_build_bbox_index', '_build_cluster_grid', '_build_geo_index',
+    ]
+    # A reload that moved a listing patches the indexes it carries over.
+    moved = deepcopy(_GEO_DB)
+    moved[1][qry.LOCATION] = _point(34.06, -118.25)
+    with patch('listings.queries.dbc.read', return_value=moved):
+        qry.read()
+        assert _spatial_queries() == ({'nyc', 'sold'}, 4, {'nyc', 'sold'})
+    assert len(builds) == 3
+
+
+def test_writes_keep_spatial_indexes(geo_listings, monkeypatch):
+    new_id = str(ObjectId())
+    _spatial_queries()
+    builds = _count_builds(monkeypatch)
+    monkeypatch.setattr(qry, 'load_cache', _no_reload)
+    monkeypatch.setattr(qry.dbc, 'create', lambda coll, doc: new_id)
+    monkeypatch.setattr(
+        qry.cityqry, 'get_coords', lambda *place: (40.7306, -73.9866),
+    )
+    qry.create(get_temp_rec())
+    assert _spatial_queries() == (
+        {'nyc', 'newark', 'sold', new_id}, 5,
+        {'nyc', 'newark', 'sold', new_id},
+    )
+    monkeypatch.setattr(qry.dbc, 'delete', lambda coll, filt: 1)
+    qry.delete(new_id)
+    assert _spatial_queries() == (
+        {'nyc', 'newark', 'sold'}, 4, {'nyc', 'newark', 'sold'},
+    )
+    assert builds == []
+
+
+def test_create_resolves_location_from_city(monkeypatch):
+    inserted = {}
+
+    def fake_create(collection, doc):
+        inserted.update(doc)
+        return 'new-id'
+
+    monkeypatch.setattr(qry.dbc, 'create', fake_create)
+    monkeypatch.setattr(qry.dbc, 'read', lambda *a, **k: [])
+    monkeypatch.setattr(
+        qry.cityqry, 'get_coords', lambda city, state, country: (40.5, -74.5),
+    )
+    qry.clear_cache()
+    qry.create(get_temp_rec())
+    assert inserted[qry.LOCATION] == _point(40.5, -74.5)
+
+
+def test_create_unknown_city_has_no_location(monkeypatch):
+    inserted = {}
+
+    def fake_create(collection, doc):
+        inserted.update(doc)
+        return 'new-id'
+
+    monkeypatch.setattr(qry.dbc, 'create', fake_create)
+    monkeypatch.setattr(qry.dbc, 'read', lambda *a, **k: [])
+    monkeypatch.setattr(qry.cityqry, 'get_coords', lambda *args: None)
+    qry.clear_cache()
+    qry.create(get_temp_rec())
+    assert qry.LOCATION not in inserted
+
+
+def test_update_place_recomputes_location(monkeypatch):
+    listing_id = '507f1f77bcf86cd799439011'
+    sent = {}
+
+    class _Result:
+        matched_count = 1
+
+    def fake_update(collection, filters, update_dict):
+        sent.update(update_dict)
+        return _Result()
+
+    monkeypatch.setattr(qry, 'cache', {listing_id: dict(qry.SAMPLE_LISTING)})
+    monkeypatch.setattr(qry, 'load_cache', lambda: None)
+    monkeypatch.setattr(qry.dbc, 'update', fake_update)
+    seen = []
+
+    def fake_coords(city, state, country):
+        seen.append((city, state, country))
+        return (42.44, -76.5)
+
+    monkeypatch.setattr(qry.cityqry, 'get_coords', fake_coords)
+    qry.update(listing_id, {qry.CITY: 'Ithaca'})
+    # Unchanged place fields come from the cached listing.
+    assert seen == [('Ithaca', 'NY', 'USA')]
+    assert sent[qry.LOCATION] == _point(42.44, -76.5)
+
+
+def test_backfill_locations_skips_located_and_unknown(monkeypatch):
+    docs = [
+        {'_id': '507f1f77bcf86cd799439011', qry.CITY: 'Ithaca',
+         qry.STATE: 'NY', qry.COUNTRY: 'USA'},
+        {'_id': '507f1f77bcf86cd799439012', qry.CITY: 'Atlantis',
+         qry.STATE: 'ZZ', qry.COUNTRY: 'USA'},
+        {'_id': '507f1f77bcf86cd799439013', qry.CITY: 'Ithaca',
+         qry.STATE: 'NY', qry.COUNTRY: 'USA',
+         qry.LOCATION: _point(42.44, -76.5)},
+    ]
+    updates = []
+    filters = []
+
+    def fake_iter_docs(coll, filt, **kwargs):
+        filters.append(filt)
+        return iter([d for d in deepcopy(docs) if not d.get(qry.LOCATION)])
+
+    monkeypatch.setattr(qry.dbc, 'read', lambda *a, **k: deepcopy(docs))
+    monkeypatch.setattr(qry.dbc, 'iter_docs', fake_iter_docs)
+    monkeypatch.setattr(
+        qry.dbc, 'update', lambda coll, filt, upd: updates.append(filt),
+    )
+    monkeypatch.setattr(
+        qry.cityqry, 'get_coords',
+        lambda city, state, country: (42.44, -76.5)
+        if city == 'Ithaca' else None,
+    )
+    assert qry.backfill_locations() == 1
+    assert len(updates) == 1
+    assert filters == [{qry.LOCATION: None}]
+    qry.clear_cache()
+
+
+def test_export_builds_filters(monkeypatch):
+    calls = []
+    monkeypatch.setattr(
+        qry.dbc, 'iter_docs',
+        lambda coll, filt, **kwargs: calls.append((filt, kwargs)) or iter([]),
+    )
+    assert list(qry.export(
+        status=' Available ', owner='', limit='5', after='abc',
+    )) == []
+    filt, kwargs = calls[0]
+    assert set(filt) == {qry.STATUS}
+    assert filt[qry.STATUS]['$options'] == 'i'
+    assert kwargs['limit'] == 5
+    assert kwargs['after'] == 'abc'
+    assert kwargs['no_id'] is False
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'limit': 0}, {'limit': 'x'}, {'price': '5'},
+])
+def test_export_rejects_bad_input(kwargs, monkeypatch):
+    monkeypatch.setattr(qry.dbc, 'iter_docs', lambda *a, **k: iter([]))
+    with pytest.raises(ValueError):
+        qry.export(**kwargs)
+
+
+def test_get_clusters_uses_locations(geo_listings):
+    clusters = qry.get_clusters((-180, -85, 180, 85), 0)
+    # 'legacy' has no location and is not counted.
+    assert clusters == [
+        {'key': '', 'count': 4, 'lat': clusters[0]['lat'],
+         'lon': clusters[0]['lon']},
+    ]
+
+
+def test_search_in_bbox(geo_listings):
+    listings, truncated = qry.search_in_bbox((-74.5, 40.5, -73.5, 41))
+    assert set(listings) == {'nyc', 'newark', 'sold'}
+    assert truncated is False
+    with pytest.raises(ValueError):
+        qry.search_in_bbox((-74.5, 40.5, -73.5, 41), limit='x')
+
+
+@pytest.fixture
+def buffered_likes(monkeypatch):
+    listing_id = str(ObjectId())
+    listing = dict(qry.SAMPLE_LISTING, _id=listing_id, num_likes=4)
+    monkeypatch.setenv(qry.LIKES_WRITE_MODE_ENV, qry.BUFFERED)
+    monkeypatch.setenv(qry.LIKES_FLUSH_MS_ENV, '0')
+    monkeypatch.setattr(qry, 'likes_buffer', None)
+    monkeypatch.setattr(qry, 'cache', {listing_id: listing})
+    # Unflushed test deltas must not be written to Mongo at exit.
+    monkeypatch.setattr(qry.counter_buffer.atexit, 'register',
+                        lambda fn: fn)
+    return listing_id
+
+
+def test_add_likes_buffered_skips_db(buffered_likes, monkeypatch):
+    def no_db(*args, **kwargs):
+        raise AssertionError('should not write directly')
+    monkeypatch.setattr(qry.dbc, 'find_one_and_update', no_db)
+    assert qry.add_likes(buffered_likes, 1)[qry.NUM_LIKES] == 5
+    assert qry.add_likes(buffered_likes, 1)[qry.NUM_LIKES] == 6
+    assert qry.likes_buffer.pending() == {buffered_likes: 2}
+
+
+def test_add_likes_buffered_never_below_zero(buffered_likes):
+    qry.cache[buffered_likes][qry.NUM_LIKES] = 0
+    assert qry.add_likes(buffered_likes, -1) is None
+    assert qry.likes_buffer.pending() == {}
+
+
+def test_concurrent_buffered_likes_keep_cached_count(buffered_likes):
+    qry.add_likes(buffered_likes, 1)
+    buf = qry.likes_buffer
+    add = buf.add
+
+    def slow_add(key, delta):
+        time.sleep(0.001)  # widen the window between read and write
+        add(key, delta)
+
+    buf.add = slow_add
+    with ThreadPoolExecutor(max_workers=20) as pool:
+        list(pool.map(lambda _: qry.add_likes(buffered_likes, 1), range(60)))
+    assert qry.cache[buffered_likes][qry.NUM_LIKES] == 4 + 61
+    assert buf.pending() == {buffered_likes: 61}
+
+
+def test_buffered_likes_survive_reload(buffered_likes, monkeypatch):
+    qry.add_likes(buffered_likes, 1)
+    stored = dict(qry.cache[buffered_likes], num_likes=4)
+    monkeypatch.setattr(qry.dbc, 'read', lambda *a, **k: [dict(stored)])
+    qry.load_cache()
+    assert qry.cache[buffered_likes][qry.NUM_LIKES] == 5
+    with patch('listings.queries.dbc.bulk_write') as fake_bulk:
+        assert qry.flush_likes() == 1
+    fake_bulk.assert_called_once()
+
+
+def test_make_summary_keeps_first_image_only():
+    listing = dict(qry.SAMPLE_LISTING, _id='id1', images=['a.jpg', 'b.jpg'])
+    summary = qry.make_summary(listing)
+    assert summary == {
+        '_id': 'id1',
+        qry.TITLE: listing[qry.TITLE],
+        qry.PRICE: listing[qry.PRICE],
+        qry.STATUS: listing[qry.STATUS],
+        qry.IMAGE: 'a.jpg',
+    }
+    assert qry.make_summary({qry.IMAGES: []})[qry.IMAGE] is None
+
+
+def test_read_summary_view(monkeypatch):
+    doc = dict(qry.SAMPLE_LISTING, _id='id1', images=['a.jpg'])
+    monkeypatch.setattr(qry.dbc, 'read', lambda *a, **k: [dict(doc)])
+    qry.load_cache()
+    try:
+        assert qry.read(view=qry.SUMMARY) == {'id1': qry.make_summary(doc)}
+        assert qry.read(view='FULL')['id1'][qry.DESCRIPTION]
+    finally:
+        qry.clear_cache()
+
+
+def test_read_paginated_summary_view(paginated_cache, monkeypatch):
+    summarized = []
+    make_summary = qry.make_summary
+    monkeypatch.setattr(
+        qry, 'make_summary',
+        lambda listing: summarized.append(listing) or make_summary(listing),
+    )
+    res = qry.read_paginated(page_size=2, view='summary')
+    # Only the page is summarized, not every cached listing.
+    assert len(summarized) == 2
+    assert [it[qry.TITLE] for it in res['items']] == ['D', 'C']
+    assert set(res['items'][0]) == {
+        '_id', qry.TITLE, qry.PRICE, qry.STATUS, qry.IMAGE,
+    }
+    assert res['total'] == 4
+
+
+def test_read_paginated_bad_view(paginated_cache):
+    with pytest.raises(ValueError):
+        qry.read_paginated(view='tiny')
@@ -54,6 +54,7 @@ READ = 'read'
 UPDATE = 'update'
 DELETE = 'delete'
 UPLOAD_IMAGE = 'upload-image'
+LIKE = 'like'
 USER_LIST = 'user_list'
 CHECKS = 'checks'
 LOGIN = 'login'
@@ -86,6 +87,8 @@ temp_recs = {
         UPDATE: {CHECKS: {LOGIN: True}},
         DELETE: {CHECKS: {LOGIN: True}},
         UPLOAD_IMAGE: {CHECKS: {LOGIN: True}},
+        # Like/unlike always acts as the authenticated caller.
+        LIKE: {CHECKS: {LOGIN: True}},
     },
 }
 
@@ -39,3 +39,10 @@ def test_people_create_requires_auth():
     )
     assert st == 'unauthorized'
     assert msg
+
+
+def test_listings_like_requires_login():
+    st, _ = sec.is_operation_allowed(
+        sec.LISTINGS, sec.LIKE, authed_user_email=None, auth_valid=False,
+    )
+    assert st == 'unauthorized'
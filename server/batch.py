@@ -0,0 +1,124 @@
+"""
+In-process execution of batched GET sub-requests for `/batch`.
+
+Each sub-request goes through the full Flask stack (auth, error handling,
+conditional responses) via a test client, so it behaves exactly like the
+standalone call. JSON bodies are spliced into the combined response as
+raw bytes instead of being parsed and re-encoded.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from server import json_codec
+
+MAX_REQUESTS = 10
+MAX_WORKERS = 4
+
+# Request headers copied from the outer /batch request onto every
+# sub-request (per-item If-None-Match is sent via the item itself).
+FORWARDED_HEADERS = ('Authorization',)
+
+ID = 'id'
+PATH = 'path'
+IF_NONE_MATCH = 'if_none_match'
+STATUS = 'status'
+HEADERS = 'headers'
+BODY = 'body'
+
+# Sub-response headers worth returning to the caller.
+RETURNED_HEADERS = ('ETag', 'Cache-Control')
+
+
+def parse_requests(items, allowed_paths) -> list:
+    """
+    Validate the `requests` list of a /batch body. Each item is a dict
+    with `path` (path plus optional query string, GET only) and optional
+    `id` / `if_none_match`. Returns normalized dicts; raises ValueError.
+    """
+    if not isinstance(items, list) or not items:
+        raise ValueError("'requests' must be a non-empty list")
+    if len(items) > MAX_REQUESTS:
+        raise ValueError(
+            f"'requests' may contain at most {MAX_REQUESTS} items"
+        )
+    parsed = []
+    for i, item in enumerate(items):
+        if not isinstance(item, dict):
+            raise ValueError(f'requests[{i}] must be an object')
+        raw = item.get(PATH)
+        if not isinstance(raw, str) or not raw.startswith('/'):
+            raise ValueError(f"requests[{i}].path must start with '/'")
+        url = urlsplit(raw)
+        if url.scheme or url.netloc or url.fragment:
+            raise ValueError(f'requests[{i}].path must be a local path')
+        if url.path not in allowed_paths:
+            raise ValueError(
+                f'requests[{i}].path {url.path!r} is not allowed in a batch'
+            )
+        etag = item.get(IF_NONE_MATCH)
+        if etag is not None and not isinstance(etag, str):
+            raise ValueError(f'requests[{i}].if_none_match must be a string')
+        parsed.append({
+            ID: str(item.get(ID, i)),
+            PATH: raw,
+            IF_NONE_MATCH: etag,
+        })
+    return parsed
+
+
+def _run_one(app, item, headers) -> dict:
+    headers = dict(headers)
+    if item[IF_NONE_MATCH]:
+        headers['If-None-Match'] = item[IF_NONE_MATCH]
+    resp = app.test_client().get(item[PATH], headers=headers)
+    try:
+        return {
+            ID: item[ID],
+            PATH: item[PATH],
+            STATUS: resp.status_code,
+            HEADERS: {
+                name: resp.headers[name]
+                for name in RETURNED_HEADERS
+                if name in resp.headers
+            },
+            'is_json': resp.is_json,
+            'data': resp.get_data(),
+        }
+    finally:
+        resp.close()
+
+
+def run(app, items, headers, parallel=False) -> list:
+    """Execute parsed sub-requests; results keep the request order."""
+    if not parallel or len(items) == 1:
+        return [_run_one(app, item, headers) for item in items]
+    workers = min(MAX_WORKERS, len(items))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(lambda it: _run_one(app, it, headers), items))
+
+
+def encode(results) -> bytes:
+    """
+    Combined JSON body: {"responses": [{id, path, status, headers,
+    body}, ...]}. JSON sub-bodies are copied verbatim; anything else is
+    returned as a string; a 304 has a null body.
+    """
+    parts = []
+    for res in results:
+        meta = json_codec.dumps({
+            ID: res[ID],
+            PATH: res[PATH],
+            STATUS: res[STATUS],
+            HEADERS: res[HEADERS],
+        }).rstrip()
+        data = res['data'].strip()
+        if not data:
+            body = b'null'
+        elif res['is_json']:
+            body = data
+        else:
+            body = json_codec.dumps(
+                data.decode('utf-8', 'replace'),
+            ).rstrip()
+        parts.append(meta[:-1] + b',"' + BODY.encode() + b'":' + body + b'}')
+    return b'{"responses":[' + b','.join(parts) + b']}\n'
@@ -0,0 +1,209 @@
+"""
+Response compression with Accept-Encoding negotiation.
+
+gzip is always available. Brotli (`brotli`) and Zstandard (`zstandard`)
+are used when those packages are installed; neither is a hard
+dependency. Knobs (env):
+    AXIS_COMPRESS_MIN_BYTES  smallest body worth compressing (default 1024)
+    AXIS_COMPRESS_LEVEL      level for every codec; default is each
+                             codec's usual speed/size trade-off
+"""
+import gzip
+import os
+import threading
+import time
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional
+    zstandard = None
+
+GZIP = 'gzip'
+BROTLI = 'br'
+ZSTD = 'zstd'
+IDENTITY = 'identity'
+
+MIN_BYTES_ENV = 'AXIS_COMPRESS_MIN_BYTES'
+LEVEL_ENV = 'AXIS_COMPRESS_LEVEL'
+MIN_BYTES_DEFAULT = 1024
+DEFAULT_LEVELS = {
+    GZIP: 6,
+    BROTLI: 5,
+    ZSTD: 3,
+}
+LEVEL_RANGES = {
+    GZIP: (1, 9),
+    BROTLI: (0, 11),
+    ZSTD: (1, 22),
+}
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'image/svg+xml',
+}
+
+
+def _available():
+    """Supported encodings in server preference order (best first)."""
+    encs = []
+    if zstandard is not None:
+        encs.append(ZSTD)
+    if brotli is not None:
+        encs.append(BROTLI)
+    encs.append(GZIP)
+    return encs
+
+
+ENCODINGS = _available()
+
+
+def min_bytes() -> int:
+    raw = os.environ.get(MIN_BYTES_ENV, '').strip()
+    try:
+        return max(0, int(raw)) if raw else MIN_BYTES_DEFAULT
+    except ValueError:
+        return MIN_BYTES_DEFAULT
+
+
+def level(encoding: str) -> int:
+    """Configured level for an encoding, clamped to the codec's range."""
+    lo, hi = LEVEL_RANGES[encoding]
+    raw = os.environ.get(LEVEL_ENV, '').strip()
+    try:
+        value = int(raw) if raw else DEFAULT_LEVELS[encoding]
+    except ValueError:
+        value = DEFAULT_LEVELS[encoding]
+    return min(hi, max(lo, value))
+
+
+def negotiate(accept_encodings) -> str:
+    """
+    Pick the best encoding the client accepts (werkzeug Accept header).
+    Client q-values win; ties go to server preference. Returns None when
+    the body should be sent uncompressed.
+    """
+    best = accept_encodings.best_match(ENCODINGS)
+    if best is None or best == IDENTITY:
+        return None
+    return best
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    lvl = level(encoding)
+    if encoding == GZIP:
+        return gzip.compress(data, compresslevel=lvl, mtime=0)
+    if encoding == BROTLI:
+        return brotli.compress(data, quality=lvl)
+    if encoding == ZSTD:
+        return zstandard.ZstdCompressor(level=lvl).compress(data)
+    raise ValueError(f'Unsupported encoding: {encoding}')
+
+
+def is_compressible(mimetype: str) -> bool:
+    mimetype = (mimetype or '').lower()
+    return (
+        mimetype.startswith('text/')
+        or mimetype in COMPRESSIBLE_MIMETYPES
+        or mimetype.endswith('+json')
+    )
+
+
+# encoding -> running totals; see snapshot().
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def record(encoding, bytes_in, bytes_out, cpu_s=0.0, cached=False):
+    with _stats_lock:
+        st = _stats.setdefault(encoding, {
+            'responses': 0,
+            'cached_responses': 0,
+            'bytes_in': 0,
+            'bytes_out': 0,
+            'cpu_seconds': 0.0,
+        })
+        st['responses'] += 1
+        st['cached_responses'] += int(cached)
+        st['bytes_in'] += bytes_in
+        st['bytes_out'] += bytes_out
+        st['cpu_seconds'] += cpu_s
+
+
+def snapshot() -> dict:
+    """Per-encoding totals plus overall compression ratio (in / out)."""
+    with _stats_lock:
+        out = {enc: dict(st) for enc, st in _stats.items()}
+    for st in out.values():
+        st['ratio'] = (
+            round(st['bytes_in'] / st['bytes_out'], 3)
+            if st['bytes_out'] else None
+        )
+        st['cpu_seconds'] = round(st['cpu_seconds'], 6)
+    return {
+        'encodings': out,
+        'available': list(ENCODINGS),
+        'min_bytes': min_bytes(),
+    }
+
+
+def reset_stats():
+    """Clear the running totals. Useful for testing."""
+    with _stats_lock:
+        _stats.clear()
+
+
+def timed_compress(data: bytes, encoding: str) -> tuple:
+    """compress() plus the CPU seconds it took on this thread."""
+    start = time.thread_time()
+    out = compress(data, encoding)
+    return out, time.thread_time() - start
+
+
+def variant_etag(etag: str, encoding: str) -> str:
+    """Per-representation ETag, as Apache does (`"<tag>-gzip"`)."""
+    return f'{etag}-{encoding}'
+
+
+def etag_variants(etag: str) -> list:
+    """Every ETag a representation of `etag` may have been sent with."""
+    return [etag] + [variant_etag(etag, enc) for enc in ENCODINGS]
+
+
+def _compress_response(response):
+    if (
+        response.direct_passthrough
+        or response.is_streamed
+        or response.status_code != 200
+        or 'Content-Encoding' in response.headers
+        or not is_compressible(response.mimetype)
+    ):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate(request.accept_encodings)
+    if encoding is None:
+        return response
+    data = response.get_data()
+    if len(data) < min_bytes():
+        return response
+    body, cpu_s = timed_compress(data, encoding)
+    record(encoding, len(data), len(body), cpu_s)
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(variant_etag(etag, encoding), weak)
+    return response
+
+
+def init_app(app):
+    """Compress eligible responses after each request."""
+    app.after_request(_compress_response)
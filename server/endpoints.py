@@ -15,9 +15,21 @@ import security.security as sec
 import states.queries as stateqry
 import users.queries as userqry
 from functools import wraps
+import data.cache_utils as cache_utils
 import data.db_connect as dbc
+import data.db_monitor as db_monitor
+import data.geo as geo
+import data.tracing as tracing
+from server import batch
+from server import compression
 from server import dropdown_form
-from flask import Flask, request
+from server import http_cache
+from server import json_codec
+from server import metrics
+from server import profiling
+from server import warmup
+from bson import ObjectId
+from flask import Flask, Response, g, request, stream_with_context
 from flask_restx import Resource, Api, fields  # Namespace
 from flask_cors import CORS
 from flask_limiter import Limiter
@@ -27,6 +39,10 @@ from werkzeug.datastructures import FileStorage
 
 # Dev-only: tail or list files under the PA log root (default /var/log).
 DEV_LOGS_EP = '/dev/logs'
+DEV_COMPRESSION_STATS_EP = '/dev/compression-stats'
+DEV_CACHE_STATS_EP = '/dev/cache-stats'
+# Prometheus scrape target; same token as /dev/logs.
+METRICS_EP = '/metrics'
 DEV_LOG_TOKEN_ENV = 'AXIS_DEV_LOG_TOKEN'
 DEV_LOG_ROOT_ENV = 'AXIS_DEV_LOG_ROOT'
 DEV_LOG_TOKEN_HEADER = 'X-AXIS-Dev-Log-Token'
@@ -37,6 +53,84 @@ _DEV_LOG_MAX_GZIP_DECOMPRESS_SCAN_BYTES = 50 * 1024 * 1024
 
 app = Flask(__name__)
 
+
+@app.before_request
+def _start_trace():
+    """Root span per request, continuing an incoming traceparent."""
+    rule = request.url_rule
+    route = rule.rule if rule is not None else request.path
+    span, token = tracing.start_span(
+        f'{request.method} {route}',
+        traceparent=request.headers.get(tracing.TRACEPARENT),
+        **{'http.method': request.method, 'http.route': route},
+    )
+    if span is not None:
+        g._trace = (span, token)
+
+
+@app.after_request
+def _end_trace(response):
+    # Registered before the other hooks, so it runs after all of them.
+    trace = g.pop('_trace', None)
+    if trace is not None:
+        span, token = trace
+        span.set('http.status_code', response.status_code)
+        response.headers[tracing.TRACEPARENT] = span.traceparent()
+        tracing.end_span(span, token)
+    return response
+
+
+@app.teardown_request
+def _abandon_trace(exc):
+    trace = g.pop('_trace', None)
+    if trace is not None:
+        tracing.end_span(*trace, error=exc or RuntimeError('no response'))
+
+
+# metrics first so its after_request hook sees the compressed body.
+metrics.init_app(app)
+compression.init_app(app)
+metrics.register_collector(db_monitor.metric_families)
+metrics.register_collector(cache_utils.metric_families)
+metrics.register_collector(warmup.metric_families)
+
+
+@app.before_request
+def _tag_db_route():
+    """Attribute this request's Mongo commands to its URL rule."""
+    rule = request.url_rule
+    g._db_route_token = db_monitor.set_route(
+        rule.rule if rule is not None else None,
+    )
+
+
+@app.teardown_request
+def _untag_db_route(exc):
+    token = g.pop('_db_route_token', None)
+    if token is not None:
+        db_monitor.reset_route(token)
+
+
+profiling.init_app(
+    app,
+    authorized=lambda: _dev_logs_auth_or_reject() is None,
+    log_root=lambda: _dev_logs_root(),
+)
+
+# Loads the reference caches in the background when AXIS_WARMUP=1;
+# /ready reports 503 until it is done.
+warmup.start(
+    {
+        countryqry.COUNTRY_COLLECTION: countryqry.load_cache,
+        stateqry.STATE_COLLECTION: stateqry.load_cache,
+        cityqry.CITY_COLLECTION: cityqry.load_cache,
+        listingqry.LISTING_COLLECTION: listingqry.load_cache,
+        userqry.USER_COLLECTION: userqry.load_cache,
+    },
+    connect=dbc.connect_db,
+)
+
+
 CORS(
     app,
     resources={r"/*": {"origins": "*"}},
@@ -44,7 +138,9 @@ CORS(
         "Content-Type",
         "Authorization",
         "X-AXIS-Dev-Log-Token",
+        "X-AXIS-Profile",
     ],
+    expose_headers=["X-AXIS-Profile"],
     methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
 )
 
@@ -71,6 +167,7 @@ _DEV_LOG_SWAGGER_AUTH = {
 }
 
 api = Api(app, authorizations=_DEV_LOG_SWAGGER_AUTH)
+api.representation('application/json')(json_codec.output_json)
 
 
 def _basic_auth_user():
@@ -97,30 +194,39 @@ def require_auth(feature, op, owner_resolver=None):
     def decorator(fn):
         @wraps(fn)
         def wrapper(*args, **kwargs):
-            auth_user = _basic_auth_user()
-            auth_valid = auth_user is not None
-            authed_email = (
-                (auth_user.get('email') or '').strip() or None
-                if auth_user
-                else None
-            )
-            result, err_msg = sec.is_operation_allowed(
-                feature, op,
-                authed_user_email=authed_email,
-                auth_valid=auth_valid,
-            )
-            if result == 'unauthorized':
-                return {ERROR: err_msg}, 401
-            if result == 'forbidden':
-                return {ERROR: err_msg}, 403
-            request.current_user = auth_user
-            if owner_resolver is not None and not owner_resolver(auth_user):
-                return {ERROR: 'You do not own this resource.'}, 403
+            with tracing.span('auth.require', feature=feature, op=op):
+                denied = _check_auth(feature, op, owner_resolver)
+            if denied is not None:
+                return denied
             return fn(*args, **kwargs)
         return wrapper
     return decorator
 
 
+def _check_auth(feature, op, owner_resolver):
+    """require_auth's checks; returns an error response or None."""
+    auth_user = _basic_auth_user()
+    auth_valid = auth_user is not None
+    authed_email = (
+        (auth_user.get('email') or '').strip() or None
+        if auth_user
+        else None
+    )
+    result, err_msg = sec.is_operation_allowed(
+        feature, op,
+        authed_user_email=authed_email,
+        auth_valid=auth_valid,
+    )
+    if result == 'unauthorized':
+        return {ERROR: err_msg}, 401
+    if result == 'forbidden':
+        return {ERROR: err_msg}, 403
+    request.current_user = auth_user
+    if owner_resolver is not None and not owner_resolver(auth_user):
+        return {ERROR: 'You do not own this resource.'}, 403
+    return None
+
+
 def _authed_email():
     """Lowercased email of the current authenticated caller, or ''."""
     user = getattr(request, 'current_user', None) or {}
@@ -206,6 +312,47 @@ def handle_endpoint_errors(value_error_status=400):
     return decorator
 
 
+NDJSON_MIMETYPE = 'application/x-ndjson'
+# Encoded lines are flushed to the client in chunks of about this size.
+NDJSON_CHUNK_BYTES = 64 * 1024
+
+
+def _ndjson_response(docs, filename):
+    """
+    Stream an iterable of docs as newline-delimited JSON. The iterable is
+    consumed lazily, so memory stays flat for any number of docs. A
+    failure mid-stream is logged and aborts the response; the client sees
+    a truncated transfer rather than a bogus final line.
+    """
+    def generate():
+        buf = []
+        size = 0
+        try:
+            for doc in docs:
+                line = json_codec.dumps(doc)
+                buf.append(line)
+                size += len(line)
+                if size >= NDJSON_CHUNK_BYTES:
+                    yield b''.join(buf)
+                    buf = []
+                    size = 0
+        except Exception:
+            app.logger.exception('NDJSON export %s failed mid-stream',
+                                 filename)
+            raise
+        if buf:
+            yield b''.join(buf)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype=NDJSON_MIMETYPE,
+        headers={
+            'Content-Disposition': f'attachment; filename="{filename}"',
+            'Cache-Control': 'no-store',
+        },
+    )
+
+
 ERROR = 'Error'
 MESSAGE = 'Message'
 NUM_RECS = 'Number of Records'
@@ -219,6 +366,12 @@ SEARCH = 'search'
 COUNT = 'count'
 BY_USER = 'by-user'
 UPLOAD_IMAGE = 'upload-image'
+NEARBY = 'nearby'
+IN_BBOX = 'in-bbox'
+EXPORT = 'export'
+SAVED_LISTINGS = 'saved-listings'
+LIKE = 'like'
+UNLIKE = 'unlike'
 
 ENDPOINT_EP = '/endpoints'
 ENDPOINT_RESP = 'Available endpoints'
@@ -230,6 +383,9 @@ HEALTH_EP = '/health'
 HEALTH_STATUS = 'status'
 HEALTH_CHECKS = 'checks'
 
+READY_EP = '/ready'
+READY_STATUS = 'status'
+
 CITIES_EPS = '/cities'
 CITY_RESP = 'Cities'
 
@@ -245,12 +401,37 @@ USER_RESP = 'User'
 LISTINGS_EPS = '/listings'
 LISTING_RESP = 'Listings'
 
+GEO_EPS = '/geo'
+GEO_CLUSTERS = 'clusters'
+GEO_LAYERS = {
+    'cities': cityqry,
+    'listings': listingqry,
+}
+
 SYSTEM_EPS = '/system'
 SYSTEM_DROPDOWN_FORM = 'dropdown-form'
 SYSTEM_DROPDOWN_OPTIONS = 'dropdown-options'
 
 AUTH_LOGIN_EP = '/auth/login'
 
+BATCH_EP = '/batch'
+# GET routes a /batch may fan out to: cheap, read-only, no streaming.
+BATCH_ALLOWED_PATHS = frozenset({
+    *(f'{eps}/{op}'
+      for eps in (CITIES_EPS, STATES_EPS, COUNTRIES_EPS)
+      for op in (READ, COUNT, SEARCH)),
+    f'{CITIES_EPS}/{NEARBY}',
+    f'{CITIES_EPS}/{IN_BBOX}',
+    *(f'{LISTINGS_EPS}/{op}'
+      for op in (READ, COUNT, SEARCH, BY_USER, IN_BBOX)),
+    # The one users route: saved listings, fetched with the feed on the
+    # home page. Other users routes stay out of batches.
+    f'{USERS_EPS}/{SAVED_LISTINGS}',
+    f'{GEO_EPS}/{GEO_CLUSTERS}',
+    f'{SYSTEM_EPS}/{SYSTEM_DROPDOWN_FORM}',
+    f'{SYSTEM_EPS}/{SYSTEM_DROPDOWN_OPTIONS}',
+})
+
 # ==================== SWAGGER MODELS ====================
 
 city_model = api.model('City', {
@@ -382,6 +563,31 @@ login_model = api.model('Login', {
     ),
 })
 
+batch_item_model = api.model('BatchItem', {
+    'id': fields.String(
+        required=False, description='Caller label echoed in the response'
+    ),
+    'path': fields.String(
+        required=True,
+        description='GET path with query string, e.g. /listings/read?page=1',
+    ),
+    'if_none_match': fields.String(
+        required=False, description='ETag from an earlier response'
+    ),
+})
+
+batch_model = api.model('Batch', {
+    'requests': fields.List(
+        fields.Nested(batch_item_model),
+        required=True,
+        description=f'Up to {batch.MAX_REQUESTS} sub-requests',
+    ),
+    'parallel': fields.Boolean(
+        required=False,
+        description='Run sub-requests on worker threads (default false)',
+    ),
+})
+
 upload_image_parser = api.parser()
 upload_image_parser.add_argument(
     'image',
@@ -403,13 +609,16 @@ class CitiesRead(Resource):
     def get(self):
         """
         Returns all cities in the database.
+        Sends an ETag; a matching If-None-Match gets an empty 304.
+        The encoded body is reused until the cache content changes.
         """
+        version = cityqry.cache_version()
         cities = cityqry.read()
-        num_recs = len(cities)
-        return {
-            CITY_RESP: cities,
-            NUM_RECS: num_recs,
-        }
+        return http_cache.conditional(
+            version,
+            lambda: ({CITY_RESP: cities, NUM_RECS: len(cities)}, 200),
+            memo_key=CITIES_EPS,
+        )
 
 
 @api.route(f'{CITIES_EPS}/{COUNT}')
@@ -450,6 +659,131 @@ class CitiesSearch(Resource):
         }
 
 
+_EXPORT_PAGING_PARAMS = (
+    ('after', 'Resume after this _id (the last one already received).'),
+    ('limit', 'Max records to stream (default: all).'),
+)
+
+
+def _export_paging_params(fn):
+    for name, desc in reversed(_EXPORT_PAGING_PARAMS):
+        fn = api.param(name, desc, required=False)(fn)
+    return fn
+
+
+@api.route(f'{CITIES_EPS}/{EXPORT}')
+class CitiesExport(Resource):
+    """
+    Stream cities as NDJSON
+    """
+    @api.param('state_code', 'Filter by state code.', required=False)
+    @api.param(
+        'country_code',
+        'Filter by country code (USA also matches cities with none).',
+        required=False,
+    )
+    @_export_paging_params
+    @api.produces([NDJSON_MIMETYPE])
+    @handle_endpoint_errors()
+    def get(self):
+        """
+        Stream every matching city, one JSON object per line, in _id
+        order straight from the database (constant memory per request).
+        """
+        docs = cityqry.export(
+            state_code=request.args.get('state_code'),
+            country_code=request.args.get('country_code'),
+            after=request.args.get('after'),
+            limit=request.args.get('limit'),
+        )
+        return _ndjson_response(docs, 'cities.ndjson')
+
+
+@api.route(f'{CITIES_EPS}/{NEARBY}')
+class CitiesNearby(Resource):
+    """
+    Find cities near a point
+    """
+    @api.param('lat', 'Latitude (decimal degrees)', required=True)
+    @api.param('lon', 'Longitude (decimal degrees)', required=True)
+    @api.param(
+        'radius_km',
+        f'Search radius in km (default {cityqry.NEARBY_RADIUS_KM_DEFAULT:g}, '
+        f'max {cityqry.NEARBY_RADIUS_KM_MAX:g}).',
+        required=False,
+    )
+    @api.param(
+        'limit',
+        f'Max cities returned, nearest first (default '
+        f'{cityqry.NEARBY_LIMIT_DEFAULT}, max {cityqry.NEARBY_LIMIT_MAX}).',
+        required=False,
+    )
+    @handle_endpoint_errors()
+    def get(self):
+        """
+        Return cities within radius_km of (lat, lon), nearest first.
+        Each city carries a 'distance_km' field.
+        """
+        lat = request.args.get('lat')
+        lon = request.args.get('lon')
+        if not lat or not lon:
+            return {
+                ERROR: 'Query parameters "lat" and "lon" are required'
+            }, 400
+        radius_km = request.args.get(
+            'radius_km', cityqry.NEARBY_RADIUS_KM_DEFAULT,
+        )
+        cities = cityqry.search_nearby(
+            lat,
+            lon,
+            radius_km=radius_km,
+            limit=request.args.get('limit', cityqry.NEARBY_LIMIT_DEFAULT),
+        )
+        return {
+            CITY_RESP: cities,
+            NUM_RECS: len(cities),
+            'lat': float(lat),
+            'lon': float(lon),
+            'radius_km': float(radius_km),
+        }
+
+
+@api.route(f'{CITIES_EPS}/{IN_BBOX}')
+class CitiesInBbox(Resource):
+    """
+    Find cities inside a map viewport
+    """
+    @api.param(
+        'bbox',
+        'west,south,east,north in degrees (west > east crosses the '
+        'antimeridian)',
+        required=True,
+    )
+    @api.param(
+        'limit',
+        f'Max cities (default {cityqry.BBOX_LIMIT_DEFAULT}, max '
+        f'{cityqry.BBOX_LIMIT_MAX}).',
+        required=False,
+    )
+    @handle_endpoint_errors()
+    def get(self):
+        """
+        Return cities inside the bounding box, resolved through a geohash
+        prefix index. 'truncated' is true when more cities matched.
+        """
+        bbox = geo.parse_bbox(request.args.get('bbox'))
+        cities, truncated = cityqry.search_in_bbox(
+            bbox,
+            limit=request.args.get('limit', cityqry.BBOX_LIMIT_DEFAULT),
+        )
+        return {
+            CITY_RESP: cities,
+            NUM_RECS: len(cities),
+            'bbox': list(bbox),
+            'truncated': truncated,
+        }
+
+
 @api.route(f'{CITIES_EPS}/{CREATE}')
 class CitiesCreate(Resource):
     """
@@ -518,13 +852,16 @@ class CountriesRead(Resource):
     def get(self):
         """
         Returns all countries in the database.
+        Sends an ETag; a matching If-None-Match gets an empty 304.
+        The encoded body is reused until the cache content changes.
         """
+        version = countryqry.cache_version()
         countries = countryqry.read()
-        num_recs = len(countries)
-        return {
-            COUNTRY_RESP: countries,
-            NUM_RECS: num_recs,
-        }
+        return http_cache.conditional(
+            version,
+            lambda: ({COUNTRY_RESP: countries, NUM_RECS: len(countries)}, 200),
+            memo_key=COUNTRIES_EPS,
+        )
 
 
 @api.route(f'{COUNTRIES_EPS}/{COUNT}')
@@ -626,13 +963,16 @@ class StatesRead(Resource):
     def get(self):
         """
         Returns all states in the database.
+        Sends an ETag; a matching If-None-Match gets an empty 304.
+        The encoded body is reused until the cache content changes.
         """
+        version = stateqry.cache_version()
         states = stateqry.read()
-        num_recs = len(states)
-        return {
-            STATE_RESP: states,
-            NUM_RECS: num_recs,
-        }
+        return http_cache.conditional(
+            version,
+            lambda: ({STATE_RESP: states, NUM_RECS: len(states)}, 200),
+            memo_key=STATES_EPS,
+        )
 
 
 @api.route(f'{STATES_EPS}/{COUNT}')
@@ -784,6 +1124,42 @@ class UsersSearch(Resource):
         }
 
 
+@api.route(f'{USERS_EPS}/{SAVED_LISTINGS}')
+class UsersSavedListings(Resource):
+    """
+    A user's saved listings, hydrated
+    """
+    @api.param('username', 'Username', required=True)
+    @api.param('page', 'Page number (1-based, default 1).', required=False)
+    @api.param(
+        'page_size',
+        f'Items per page (1..{listingqry.PAGE_SIZE_MAX}, default '
+        f'{listingqry.PAGE_SIZE_DEFAULT}).',
+        required=False,
+    )
+    @handle_endpoint_errors()
+    def get(self):
+        """
+        Return full listing documents for the user's saved_listings ids,
+        in saved order, resolved in one batched query. Deleted listings
+        are skipped. Response: {username, items, page, page_size, total,
+        has_next}.
+        """
+        username = (request.args.get('username') or '').strip()
+        if not username:
+            return {ERROR: 'Query parameter "username" is required'}, 400
+        result = userqry.saved_listings(
+            username,
+            page=request.args.get('page', 1),
+            page_size=request.args.get(
+                'page_size', listingqry.PAGE_SIZE_DEFAULT,
+            ),
+        )
+        if result is None:
+            return {ERROR: f'User not found: {username}'}, 404
+        return result
+
+
 @api.route(f'{USERS_EPS}/{CREATE}')
 class UsersCreate(Resource):
     """
@@ -880,7 +1256,10 @@ class UsersDelete(Resource):
 
 # ==================== LISTINGS ENDPOINTS ====================
 
-_LISTINGS_PAGE_PARAMS = {'page', 'page_size', 'status', 'owner', 'sort'}
+_LISTINGS_PAGE_PARAMS = {
+    'page', 'page_size', 'status', 'owner', 'sort',
+    'near_lat', 'near_lon', 'radius_km',
+}
 
 
 @api.route(f'{LISTINGS_EPS}/{READ}')
@@ -913,7 +1292,28 @@ class ListingsRead(Resource):
     @api.param(
         'sort',
         "Sort field with optional '-' prefix for descending. Allowed: "
-        "created_at, title, price, num_likes. Default '-created_at'.",
+        "created_at, title, price, num_likes, distance (needs near_lat "
+        "and near_lon). Default '-created_at'.",
+        required=False,
+    )
+    @api.param(
+        'near_lat',
+        'Latitude to search around; use with near_lon. Items then carry '
+        'distance_km.',
+        required=False,
+    )
+    @api.param('near_lon', 'Longitude to search around.', required=False)
+    @api.param(
+        'radius_km',
+        f'Radius around near_lat/near_lon in km (default '
+        f'{listingqry.RADIUS_KM_DEFAULT:g}, max '
+        f'{listingqry.RADIUS_KM_MAX:g}).',
+        required=False,
+    )
+    @api.param(
+        'view',
+        "'full' (default) or 'summary': id, title, price, status and "
+        "first image only. Works with either response shape.",
         required=False,
     )
     @handle_endpoint_errors()
@@ -923,8 +1323,9 @@ class ListingsRead(Resource):
 
         - With NO query params: legacy shape {Listings: {id: listing,...},
           'Number of Records': N} for back-compat.
-        - With ANY of {page, page_size, status, owner, sort}: paginated
-          envelope {items: [...], page, page_size, total, has_next}.
+        - With ANY of {page, page_size, status, owner, sort, near_lat,
+          near_lon, radius_km}: paginated envelope
+          {items: [...], page, page_size, total, has_next}.
         """
         if _LISTINGS_PAGE_PARAMS.intersection(request.args.keys()):
             return listingqry.read_paginated(
@@ -935,8 +1336,12 @@ class ListingsRead(Resource):
                 status=request.args.get('status'),
                 owner=request.args.get('owner'),
                 sort=request.args.get('sort'),
+                near_lat=request.args.get('near_lat'),
+                near_lon=request.args.get('near_lon'),
+                radius_km=request.args.get('radius_km'),
+                view=request.args.get('view'),
             )
-        listings = listingqry.read()
+        listings = listingqry.read(view=request.args.get('view'))
         num_recs = len(listings)
         return {
             LISTING_RESP: listings,
@@ -1006,6 +1411,77 @@ class ListingsByUser(Resource):
         }
 
 
+@api.route(f'{LISTINGS_EPS}/{EXPORT}')
+class ListingsExport(Resource):
+    """
+    Stream listings as NDJSON
+    """
+    @api.param('status', 'Filter by status.', required=False)
+    @api.param('owner', 'Filter by owner email.', required=False)
+    @api.param(
+        'transaction_type', 'Filter by "free" or "sell".', required=False,
+    )
+    @api.param('city', 'Filter by city.', required=False)
+    @api.param('state', 'Filter by state.', required=False)
+    @api.param('country', 'Filter by country.', required=False)
+    @_export_paging_params
+    @api.produces([NDJSON_MIMETYPE])
+    @handle_endpoint_errors()
+    def get(self):
+        """
+        Stream every matching listing, one JSON object per line, in _id
+        order straight from the database (constant memory per request).
+        Filters are case-insensitive exact matches.
+        """
+        filters = {
+            fld: request.args.get(fld)
+            for fld in listingqry.EXPORT_FILTERS
+            if request.args.get(fld)
+        }
+        docs = listingqry.export(
+            after=request.args.get('after'),
+            limit=request.args.get('limit'),
+            **filters,
+        )
+        return _ndjson_response(docs, 'listings.ndjson')
+
+
+@api.route(f'{LISTINGS_EPS}/{IN_BBOX}')
+class ListingsInBbox(Resource):
+    """
+    Find listings inside a map viewport
+    """
+    @api.param(
+        'bbox',
+        'west,south,east,north in degrees (west > east crosses the '
+        'antimeridian)',
+        required=True,
+    )
+    @api.param(
+        'limit',
+        f'Max listings (default {listingqry.BBOX_LIMIT_DEFAULT}, max '
+        f'{listingqry.BBOX_LIMIT_MAX}).',
+        required=False,
+    )
+    @handle_endpoint_errors()
+    def get(self):
+        """
+        Return located listings inside the bounding box, resolved through
+        a geohash prefix index. 'truncated' is true when more matched.
+        """
+        bbox = geo.parse_bbox(request.args.get('bbox'))
+        listings, truncated = listingqry.search_in_bbox(
+            bbox,
+            limit=request.args.get('limit', listingqry.BBOX_LIMIT_DEFAULT),
+        )
+        return {
+            LISTING_RESP: listings,
+            NUM_RECS: len(listings),
+            'bbox': list(bbox),
+            'truncated': truncated,
+        }
+
+
 @api.route(f'{LISTINGS_EPS}/{UPLOAD_IMAGE}')
 class ListingsUploadImage(Resource):
     """
@@ -1091,6 +1567,52 @@ class ListingsUpdate(Resource):
         }
 
 
+@api.route(f'{LISTINGS_EPS}/{LIKE}')
+class ListingsLike(Resource):
+    """
+    Like (save) a listing as the authenticated user
+    """
+    @api.param('id', 'Listing MongoDB _id', required=True)
+    @handle_endpoint_errors(404)
+    @require_auth(sec.LISTINGS, sec.LIKE)
+    def post(self):
+        """
+        Add the listing to the caller's saved_listings and increment its
+        num_likes, atomically. Repeating a like is a no-op
+        ("changed": false). Returns {id, num_likes, liked, changed}.
+        A malformed id is a 400; a listing that does not exist, a 404.
+        """
+        listing_id = (request.args.get('id') or '').strip()
+        if not listing_id:
+            return {ERROR: 'Query parameter "id" is required'}, 400
+        if not ObjectId.is_valid(listing_id):
+            return {ERROR: f'Invalid listing ID format: {listing_id}'}, 400
+        return userqry.like_listing(_authed_username(), listing_id)
+
+
+@api.route(f'{LISTINGS_EPS}/{UNLIKE}')
+class ListingsUnlike(Resource):
+    """
+    Unlike (unsave) a listing as the authenticated user
+    """
+    @api.param('id', 'Listing MongoDB _id', required=True)
+    @handle_endpoint_errors(404)
+    @require_auth(sec.LISTINGS, sec.LIKE)
+    def post(self):
+        """
+        Remove the listing from the caller's saved_listings and decrement
+        its num_likes, atomically. Unliking something not liked is a
+        no-op ("changed": false). Returns {id, num_likes, liked, changed}.
+        A malformed id is a 400.
+        """
+        listing_id = (request.args.get('id') or '').strip()
+        if not listing_id:
+            return {ERROR: 'Query parameter "id" is required'}, 400
+        if not ObjectId.is_valid(listing_id):
+            return {ERROR: f'Invalid listing ID format: {listing_id}'}, 400
+        return userqry.unlike_listing(_authed_username(), listing_id)
+
+
 @api.route(f'{LISTINGS_EPS}/{DELETE}')
 class ListingsDelete(Resource):
     """
@@ -1148,12 +1670,57 @@ class AuthLogin(Resource):
         return {USER_RESP: user, MESSAGE: 'Login successful'}, 200
 
 
-# ==================== SYSTEM / HATEOAS DROPDOWN ENDPOINTS ====================
+# ==================== GEO / MAP ENDPOINTS ====================
 
-def _option(value, label):
-    return {'value': value, 'label': label}
+@api.route(f'{GEO_EPS}/{GEO_CLUSTERS}')
+class GeoClusters(Resource):
+    """
+    Server-side map clustering for cities and listings.
+    """
+    @api.param(
+        'bbox',
+        'Viewport as west,south,east,north in degrees (west > east '
+        'crosses the antimeridian).',
+        required=True,
+    )
+    @api.param('zoom', f'Map zoom level (0..{geo.ZOOM_MAX})', required=True)
+    @api.param(
+        'layers',
+        f'Comma-separated subset of {sorted(GEO_LAYERS)} (default: all).',
+        required=False,
+    )
+    @handle_endpoint_errors()
+    def get(self):
+        """
+        Return point counts per grid cell (quadkey) inside the viewport.
+        Cells are a 4x4 grid per map tile, coarsened for wide viewports,
+        so the payload is bounded regardless of how many points exist.
+        """
+        bbox = geo.parse_bbox(request.args.get('bbox'))
+        zoom = geo.parse_zoom(request.args.get('zoom'))
+        layers_arg = request.args.get('layers') or ','.join(GEO_LAYERS)
+        layers = [lyr.strip() for lyr in layers_arg.split(',') if lyr.strip()]
+        unknown = [lyr for lyr in layers if lyr not in GEO_LAYERS]
+        if not layers or unknown:
+            return {
+                ERROR: f'layers must be a subset of {sorted(GEO_LAYERS)}'
+            }, 400
+        level = geo.cluster_level(bbox, zoom)
+        clusters = {
+            lyr: GEO_LAYERS[lyr].get_clusters(bbox, level)
+            for lyr in layers
+        }
+        return {
+            'bbox': list(bbox),
+            'zoom': zoom,
+            'level': level,
+            'clusters': clusters,
+            NUM_RECS: sum(len(c) for c in clusters.values()),
+        }
 
 
+# ==================== SYSTEM / HATEOAS DROPDOWN ENDPOINTS ====================
+
 def _dropdown_links(country_code=None, state_code=None):
     base = f'{SYSTEM_EPS}/{SYSTEM_DROPDOWN_OPTIONS}'
     links = {
@@ -1212,7 +1779,9 @@ class SystemDropdownForm(Resource):
 @api.route(f'{SYSTEM_EPS}/{SYSTEM_DROPDOWN_OPTIONS}')
 class SystemDropdownOptions(Resource):
     """
-    HATEOAS: returns dropdown option lists from live DB reads.
+    HATEOAS: returns dropdown option lists, pre-sorted per country/state
+    by the location caches. Responses carry an ETag derived from the
+    backing cache version; a matching If-None-Match gets an empty 304.
     - No query: all countries (value=code, label=name).
     - ?country_code=USA: states for that country.
     - ?state_code=NY&country_code=USA: cities in that state and country
@@ -1227,98 +1796,99 @@ class SystemDropdownOptions(Resource):
         state_code = request.args.get('state_code')
 
         if state_code:
-            cities_raw = cityqry.read()
-            cities = (
-                cities_raw.values()
-                if isinstance(cities_raw, dict)
-                else cities_raw
-            )
             req_cc = (
                 str(country_code).strip().upper()
                 if country_code and str(country_code).strip()
                 else None
             )
-            options = []
-            for c in cities:
-                sc = c.get('state_code', '')
-                if str(sc).upper() != str(state_code).upper():
-                    continue
-                city_cc = str(
-                    c.get('country_code', '') or 'USA'
-                ).strip().upper() or 'USA'
-                if req_cc:
-                    if city_cc != req_cc:
-                        continue
-                else:
-                    if city_cc != 'USA':
-                        continue
-                name = c.get('name', '')
-                options.append(
-                    _option(
-                        name,
-                        f'{name}, {sc}',
-                    )
-                )
-            options.sort(key=lambda o: o['label'].lower())
+            version = cityqry.cache_version()
+            options = cityqry.city_options(state_code, req_cc)
             cc_echo = req_cc if req_cc else 'USA'
-            return {
-                'kind': 'cities',
-                'state_code': state_code,
-                'country_code': cc_echo,
-                'options': options,
-                NUM_RECS: len(options),
-                '_links': _dropdown_links(
-                    country_code=cc_echo,
-                    state_code=state_code,
-                ),
-            }, 200
+            return http_cache.conditional(
+                version,
+                lambda: ({
+                    'kind': 'cities',
+                    'state_code': state_code,
+                    'country_code': cc_echo,
+                    'options': options,
+                    NUM_RECS: len(options),
+                    '_links': _dropdown_links(
+                        country_code=cc_echo,
+                        state_code=state_code,
+                    ),
+                }, 200),
+                'cities', state_code, cc_echo,
+            )
 
         if country_code:
-            states_raw = stateqry.read()
-            states = (
-                states_raw.values()
-                if isinstance(states_raw, dict)
-                else states_raw
+            version = stateqry.cache_version()
+            options = stateqry.state_options(country_code)
+            return http_cache.conditional(
+                version,
+                lambda: ({
+                    'kind': 'states',
+                    'country_code': country_code,
+                    'options': options,
+                    NUM_RECS: len(options),
+                    '_links': _dropdown_links(
+                        country_code=country_code,
+                        state_code=state_code,
+                    ),
+                }, 200),
+                'states', country_code,
             )
-            options = []
-            for s in states:
-                cc = s.get('country_code', '')
-                if str(cc).upper() != str(country_code).upper():
-                    continue
-                code = s.get('code', '')
-                name = s.get('name', code)
-                options.append(_option(code, f'{name} ({code})'))
-            options.sort(key=lambda o: o['label'].lower())
-            return {
-                'kind': 'states',
-                'country_code': country_code,
+
+        # countries by default
+        version = countryqry.cache_version()
+        options = countryqry.country_options()
+        return http_cache.conditional(
+            version,
+            lambda: ({
+                'kind': 'countries',
                 'options': options,
                 NUM_RECS: len(options),
-                '_links': _dropdown_links(
-                    country_code=country_code,
-                    state_code=state_code,
-                ),
-            }, 200
+                '_links': _dropdown_links(),
+            }, 200),
+            'countries',
+        )
 
-        # countries by default
-        countries_raw = countryqry.read()
-        countries = (
-            countries_raw.values()
-            if isinstance(countries_raw, dict)
-            else countries_raw
+
+# ==================== BATCH ENDPOINT ====================
+
+@api.route(BATCH_EP)
+class Batch(Resource):
+    """
+    Run several read-only GET requests in one round trip
+    """
+    @api.expect(batch_model)
+    @handle_endpoint_errors()
+    def post(self):
+        """
+        Execute whitelisted GET sub-requests in-process and return
+        {"responses": [{id, path, status, headers, body}, ...]} in request
+        order. Each sub-request runs exactly as it would standalone (same
+        status codes and errors) with the caller's Authorization header.
+        Set "parallel": true to run them on worker threads.
+        """
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return {ERROR: 'Request body must contain JSON'}, 400
+        items = batch.parse_requests(
+            data.get('requests'), BATCH_ALLOWED_PATHS,
+        )
+        headers = {
+            name: request.headers[name]
+            for name in batch.FORWARDED_HEADERS
+            if name in request.headers
+        }
+        results = batch.run(
+            app, items, headers, parallel=bool(data.get('parallel')),
+        )
+        return app.response_class(
+            batch.encode(results),
+            status=200,
+            mimetype='application/json',
         )
-        options = []
-        for c in countries:
-            code = c.get('code', '')
-            name = c.get('name', code)
-            options.append(_option(code, f'{name} ({code})'))
-        options.sort(key=lambda o: o['label'].lower())
-        return {
-            'kind': 'countries',
-            'options': options,
-            NUM_RECS: len(options),
-            '_links': _dropdown_links(),
-        }, 200
 
 
 # ==================== DEVELOPER / OPS (NOT FOR END USERS) ====================
@@ -1524,6 +2094,69 @@ class DevLogs(Resource):
         return {ERROR: 'not a readable file or directory'}, 400
 
 
+@api.route(DEV_COMPRESSION_STATS_EP)
+class DevCompressionStats(Resource):
+    """
+    Developer / ops only: response-compression totals since process start
+    (bytes in/out and ratio, compression CPU seconds, cached-body hits),
+    per negotiated content-coding. Same token as `/dev/logs`.
+    """
+
+    @api.doc(
+        security=[
+            {'X_AXIS_Dev_Log_Token': []}
+        ],
+    )
+    @handle_endpoint_errors()
+    def get(self):
+        denied = _dev_logs_auth_or_reject()
+        if denied is not None:
+            return denied
+        return compression.snapshot(), 200
+
+
+@api.route(DEV_CACHE_STATS_EP)
+class DevCacheStats(Resource):
+    """
+    Developer / ops only: per-collection query-cache hits, misses, full
+    reloads (count and duration) and current size (entries and
+    approximate bytes) since process start. Same token as `/dev/logs`.
+    """
+
+    @api.doc(
+        security=[
+            {'X_AXIS_Dev_Log_Token': []}
+        ],
+    )
+    @handle_endpoint_errors()
+    def get(self):
+        denied = _dev_logs_auth_or_reject()
+        if denied is not None:
+            return denied
+        return cache_utils.snapshot(), 200
+
+
+@api.route(METRICS_EP)
+class Metrics(Resource):
+    """
+    Developer / ops only: per-route latency (p50/p95/p99), status counts,
+    payload bytes and in-flight requests in Prometheus text format. Same
+    token as `/dev/logs` (scrape with a bearer token).
+    """
+
+    @api.doc(
+        security=[
+            {'X_AXIS_Dev_Log_Token': []}
+        ],
+    )
+    @handle_endpoint_errors()
+    def get(self):
+        denied = _dev_logs_auth_or_reject()
+        if denied is not None:
+            return denied
+        return Response(metrics.render(), mimetype=metrics.CONTENT_TYPE)
+
+
 # ==================== UTILITY ENDPOINTS ====================
 
 @api.route(HELLO_EP)
@@ -1577,6 +2210,20 @@ class Health(Resource):
         return body, 200 if all_ok else 503
 
 
+@api.route(READY_EP)
+class Ready(Resource):
+    """
+    Readiness for load balancers: 503 while the startup cache warm-up
+    (AXIS_WARMUP=1) is still loading, 200 once every cache is warm.
+    Always 200 when warm-up is disabled.
+    """
+    def get(self):
+        body = warmup.status()
+        ready = body['ready']
+        body[READY_STATUS] = 'ready' if ready else 'warming'
+        return body, 200 if ready else 503
+
+
 @api.route(ENDPOINT_EP)
 class Endpoints(Resource):
     """
@@ -0,0 +1,131 @@
+"""
+HTTP conditional-request helpers (ETag / If-None-Match) for read
+endpoints backed by the reference-data caches, plus a per-version cache
+of their encoded (and compressed) JSON bodies.
+"""
+import hashlib
+import threading
+
+from flask import current_app, request
+
+from server import compression
+from server import json_codec
+
+# Clients may keep the body but must revalidate before reusing it; a
+# matching ETag gets an empty 304 instead of the full payload.
+REFERENCE_CACHE_CONTROL = 'public, max-age=0, must-revalidate'
+
+
+class _EncodedBody:
+    """
+    One endpoint's JSON body for one ETag. Each content-coding is
+    compressed the first time a client negotiates it, then reused.
+    """
+
+    def __init__(self, etag: str, status: int, raw: bytes):
+        self.etag = etag
+        self.status = status
+        self.raw = raw
+        self._compressed = {}
+        self._lock = threading.Lock()
+
+    def encoded(self, encoding: str) -> bytes:
+        with self._lock:
+            body = self._compressed.get(encoding)
+            if body is not None:
+                compression.record(
+                    encoding, len(self.raw), len(body), cached=True,
+                )
+                return body
+            body, cpu_s = compression.timed_compress(self.raw, encoding)
+            self._compressed[encoding] = body
+        compression.record(encoding, len(self.raw), len(body), cpu_s)
+        return body
+
+
+# memo_key -> _EncodedBody for the latest ETag only, so an old cache
+# version's bytes are dropped as soon as a new one is served.
+_encoded = {}
+
+
+def clear_encoded():
+    """Drop all pre-encoded bodies. Useful for testing."""
+    _encoded.clear()
+
+
+def encode_json(body) -> bytes:
+    """Same bytes the API's JSON representation would send."""
+    return json_codec.dumps_app(body)
+
+
+def make_etag(version: str, *parts) -> str:
+    """
+    Unquoted strong ETag for a cache version plus whatever request
+    parameters shape the response (e.g. dropdown kind and codes).
+    """
+    if not parts:
+        return version
+    h = hashlib.blake2b(digest_size=16)
+    h.update(version.encode('utf-8'))
+    for part in parts:
+        h.update(b'\0')
+        h.update(str(part if part is not None else '').encode('utf-8'))
+    return h.hexdigest()
+
+
+def _encoded_response(memo_key, etag, build, headers):
+    entry = _encoded.get(memo_key)
+    if entry is None or entry.etag != etag:
+        body, status = build()
+        entry = _EncodedBody(etag, status, encode_json(body))
+        _encoded[memo_key] = entry
+    headers['Vary'] = 'Accept-Encoding'
+    data = entry.raw
+    encoding = compression.negotiate(request.accept_encodings)
+    if encoding and len(data) >= compression.min_bytes():
+        data = entry.encoded(encoding)
+        headers['Content-Encoding'] = encoding
+        headers['ETag'] = f'"{compression.variant_etag(etag, encoding)}"'
+    return current_app.response_class(
+        data,
+        status=entry.status,
+        headers=headers,
+        mimetype='application/json',
+    )
+
+
+def conditional(version, build, *parts, memo_key=None):
+    """
+    Run a read endpoint under If-None-Match.
+
+    `version` is the backing cache's content version; None (cache not
+    loaded, e.g. mocked in tests) skips validators entirely. Read it
+    before the data: if a reload lands in between, the ETag is older than
+    the body and the next request just gets a fresh 200, whereas the
+    other order would pin the old body behind the new version. `build()`
+    returns the usual (body, status) and is only called when the client's
+    copy is stale, so a 304 never serializes the payload.
+
+    A client may revalidate with the plain tag or any per-encoding variant
+    (see server.compression).
+
+    With `memo_key`, the encoded body and its compressed forms are kept
+    per ETag and reused until the version changes; use it for large,
+    parameter-free bodies only, since each key holds a full copy of its
+    payload.
+    """
+    if version is None:
+        return build()
+    etag = make_etag(version, *parts)
+    headers = {
+        'ETag': f'"{etag}"',
+        'Cache-Control': REFERENCE_CACHE_CONTROL,
+    }
+    for tag in compression.etag_variants(etag):
+        if request.if_none_match.contains_weak(tag):
+            headers['ETag'] = f'"{tag}"'
+            return current_app.response_class(status=304, headers=headers)
+    if memo_key is not None:
+        return _encoded_response(memo_key, etag, build, headers)
+    body, status = build()
+    return body, status, headers
@@ -0,0 +1,84 @@
+"""
+JSON encoding for API responses.
+
+Uses `orjson` when it is installed and falls back to the stdlib `json`
+module otherwise. Both paths serialize BSON ObjectIds as their hex string
+and dates/datetimes as ISO 8601, so documents read straight from Mongo
+can be returned as-is.
+
+Env `AXIS_JSON_ENCODER` = `auto` (default), `orjson` or `stdlib`.
+"""
+import datetime
+import json
+import os
+
+from bson import ObjectId
+from flask import current_app
+
+try:
+    import orjson
+except ImportError:  # optional
+    orjson = None
+
+ENCODER_ENV = 'AXIS_JSON_ENCODER'
+AUTO = 'auto'
+ORJSON = 'orjson'
+STDLIB = 'stdlib'
+
+
+def _default(obj):
+    """Types neither encoder handles on its own."""
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, (datetime.datetime, datetime.date)):
+        return obj.isoformat()
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    raise TypeError(f'{type(obj).__name__} is not JSON serializable')
+
+
+def encoder_name() -> str:
+    """Encoder in effect for this process, per AXIS_JSON_ENCODER."""
+    wanted = os.environ.get(ENCODER_ENV, AUTO).strip().lower()
+    if wanted == STDLIB or orjson is None:
+        return STDLIB
+    return ORJSON
+
+
+def _stdlib_dumps(data, indent=None) -> bytes:
+    return (
+        json.dumps(data, default=_default, indent=indent) + '\n'
+    ).encode('utf-8')
+
+
+def dumps(data, indent: bool = False) -> bytes:
+    """
+    Encode `data` as UTF-8 JSON bytes with a trailing newline (as
+    flask-restx does). orjson refuses a few things the stdlib accepts
+    (ints past 64 bits); those bodies fall back to the stdlib encoder.
+    """
+    if encoder_name() == ORJSON:
+        opts = orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE
+        if indent:
+            opts |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(data, default=_default, option=opts)
+        except TypeError:
+            pass
+    return _stdlib_dumps(data, indent=2 if indent else None)
+
+
+def dumps_app(data) -> bytes:
+    """dumps() with pretty-printing when the Flask app is in debug mode."""
+    return dumps(data, indent=current_app.debug)
+
+
+def output_json(data, code, headers=None):
+    """flask-restx representation for application/json."""
+    resp = current_app.response_class(
+        dumps_app(data),
+        status=code,
+        mimetype='application/json',
+    )
+    resp.headers.extend(headers or {})
+    return resp
@@ -0,0 +1,227 @@
+"""
+Per-route request metrics in Prometheus text format.
+
+Recorded for every request: latency (summary with p50/p95/p99 over the
+last WINDOW requests per route, plus running sum/count), responses by
+status code, response/request payload bytes, and requests in flight.
+Routes are labelled by their URL rule (`/listings/read`), never the raw
+path, so label cardinality stays bounded.
+
+Other modules can add their own series with register_collector().
+"""
+import math
+import threading
+import time
+from collections import deque
+
+from flask import g, request
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+PREFIX = 'axis_'
+
+# Latency samples kept per (method, route) for the quantiles.
+WINDOW = 1024
+QUANTILES = (0.5, 0.95, 0.99)
+
+UNMATCHED = '<unmatched>'
+
+_lock = threading.Lock()
+_routes = {}
+_in_flight = 0
+_collectors = []
+
+
+class _RouteStats:
+    __slots__ = ('samples', 'count', 'seconds', 'statuses',
+                 'bytes_out', 'bytes_in')
+
+    def __init__(self):
+        self.samples = deque(maxlen=WINDOW)
+        self.count = 0
+        self.seconds = 0.0
+        self.statuses = {}
+        self.bytes_out = 0
+        self.bytes_in = 0
+
+
+def quantile(sorted_values, q):
+    """Nearest-rank quantile of an already sorted list (None if empty)."""
+    if not sorted_values:
+        return None
+    rank = math.ceil(q * len(sorted_values))
+    return sorted_values[max(0, min(len(sorted_values), rank) - 1)]
+
+
+def observe(method, route, status, seconds, bytes_out=0, bytes_in=0):
+    """Record one finished request."""
+    with _lock:
+        st = _routes.get((method, route))
+        if st is None:
+            st = _routes[(method, route)] = _RouteStats()
+        st.samples.append(seconds)
+        st.count += 1
+        st.seconds += seconds
+        st.statuses[status] = st.statuses.get(status, 0) + 1
+        st.bytes_out += bytes_out
+        st.bytes_in += bytes_in
+
+
+def register_collector(fn):
+    """
+    Add fn() -> iterable of (name, type, help, [(labels, value), ...])
+    to every /metrics scrape. Names get the axis_ prefix.
+    """
+    if fn not in _collectors:
+        _collectors.append(fn)
+    return fn
+
+
+def reset():
+    """Clear all recorded requests. Useful for testing."""
+    global _in_flight
+    with _lock:
+        _routes.clear()
+        _in_flight = 0
+
+
+def snapshot() -> dict:
+    """Per-route totals and latency quantiles, keyed 'METHOD route'."""
+    with _lock:
+        items = [
+            (method, route, sorted(st.samples), st.count, st.seconds,
+             dict(st.statuses), st.bytes_out, st.bytes_in)
+            for (method, route), st in _routes.items()
+        ]
+        in_flight = _in_flight
+    routes = {}
+    for method, route, samples, count, secs, statuses, b_out, b_in in items:
+        routes[f'{method} {route}'] = {
+            'method': method,
+            'route': route,
+            'count': count,
+            'seconds': secs,
+            'quantiles': {q: quantile(samples, q) for q in QUANTILES},
+            'statuses': statuses,
+            'bytes_out': b_out,
+            'bytes_in': b_in,
+        }
+    return {'routes': routes, 'in_flight': in_flight}
+
+
+def _escape(value) -> str:
+    return (str(value).replace('\\', '\\\\').replace('\n', '\\n')
+            .replace('"', '\\"'))
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ''
+    inner = ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+    return '{' + inner + '}'
+
+
+def _num(value) -> str:
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+def _family(name, kind, help_text, samples):
+    lines = [f'# HELP {PREFIX}{name} {help_text}',
+             f'# TYPE {PREFIX}{name} {kind}']
+    for suffix_labels, value in samples:
+        suffix, labels = suffix_labels
+        lines.append(f'{PREFIX}{name}{suffix}{_labels(labels)} {_num(value)}')
+    return lines
+
+
+def render() -> str:
+    """Everything recorded so far, in Prometheus text exposition format."""
+    snap = snapshot()
+    routes = sorted(snap['routes'].values(),
+                    key=lambda r: (r['route'], r['method']))
+    latency, statuses, b_out, b_in = [], [], [], []
+    for r in routes:
+        base = {'method': r['method'], 'route': r['route']}
+        for q, value in r['quantiles'].items():
+            if value is not None:
+                latency.append((('', dict(base, quantile=q)), value))
+        latency.append((('_sum', base), r['seconds']))
+        latency.append((('_count', base), r['count']))
+        for status, n in sorted(r['statuses'].items()):
+            statuses.append((('', dict(base, status=status)), n))
+        b_out.append((('', base), r['bytes_out']))
+        b_in.append((('', base), r['bytes_in']))
+    lines = []
+    lines += _family(
+        'http_request_duration_seconds', 'summary',
+        f'Request latency; quantiles over the last {WINDOW} requests.',
+        latency,
+    )
+    lines += _family('http_requests_total', 'counter',
+                     'Finished requests by status code.', statuses)
+    lines += _family('http_response_bytes_total', 'counter',
+                     'Response body bytes sent (after compression).', b_out)
+    lines += _family('http_request_bytes_total', 'counter',
+                     'Request body bytes received.', b_in)
+    lines += _family('http_requests_in_flight', 'gauge',
+                     'Requests currently being handled.',
+                     [(('', {}), snap['in_flight'])])
+    for collector in list(_collectors):
+        for name, kind, help_text, samples in collector():
+            lines += _family(
+                name, kind, help_text,
+                [(('', labels), value) for labels, value in samples],
+            )
+    return '\n'.join(lines) + '\n'
+
+
+def _route():
+    rule = request.url_rule
+    return rule.rule if rule is not None else UNMATCHED
+
+
+def _before():
+    global _in_flight
+    with _lock:
+        _in_flight += 1
+    g._metrics_in_flight = True
+    g._metrics_start = time.perf_counter()
+
+
+def _after(response):
+    start = g.pop('_metrics_start', None)
+    if start is None:
+        return response
+    size = 0 if response.is_streamed else response.calculate_content_length()
+    observe(
+        request.method,
+        _route(),
+        response.status_code,
+        time.perf_counter() - start,
+        bytes_out=size or 0,
+        bytes_in=request.content_length or 0,
+    )
+    return response
+
+
+def _teardown(exc):
+    global _in_flight
+    start = g.pop('_metrics_start', None)
+    if start is not None:
+        # after_request never ran: the request died with an exception.
+        observe(request.method, _route(), 500, time.perf_counter() - start,
+                bytes_in=request.content_length or 0)
+    if g.pop('_metrics_in_flight', False):
+        with _lock:
+            _in_flight -= 1
+
+
+def init_app(app):
+    """
+    Time every request. Call before other after_request hooks are added
+    (e.g. compression) so sizes are measured on the final body.
+    """
+    app.before_request(_before)
+    app.after_request(_after)
+    app.teardown_request(_teardown)
@@ -0,0 +1,229 @@
+"""
+Request profiling: on demand for one request, or 1 in N at random.
+
+On demand (needs the dev log token): add `?__profile=1` or send header
+`X-AXIS-Profile: 1` to run that request under the stack sampler
+(collapsed-stack output, ready for flamegraph.pl / speedscope), or use
+the value `cprofile` for deterministic cProfile stats instead. The
+report is written under `<dev log root>/profiles/` and its path (as
+`/dev/logs?path=` expects it) is returned in the `X-AXIS-Profile`
+response header.
+
+Sampled: env `AXIS_PROFILE_SAMPLE_N=N` profiles roughly one request in
+N with the stack sampler into the same directory. Only the newest
+`AXIS_PROFILE_KEEP` (default 50) reports are kept.
+"""
+import cProfile
+import io
+import itertools
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+from flask import g, request
+
+PARAM = '__profile'
+HEADER = 'X-AXIS-Profile'
+SUBDIR = 'profiles'
+
+SAMPLE = 'sample'
+CPROFILE = 'cprofile'
+_MODES = {'1': SAMPLE, 'true': SAMPLE, SAMPLE: SAMPLE, CPROFILE: CPROFILE}
+
+SAMPLE_N_ENV = 'AXIS_PROFILE_SAMPLE_N'
+KEEP_ENV = 'AXIS_PROFILE_KEEP'
+INTERVAL_MS_ENV = 'AXIS_PROFILE_INTERVAL_MS'
+KEEP_DEFAULT = 50
+INTERVAL_MS_DEFAULT = 1.0
+
+# Deepest stack recorded per sample.
+MAX_DEPTH = 128
+
+# Keeps report names unique within a process.
+_seq = itertools.count()
+
+
+def _env_number(name, default, cast=int):
+    raw = os.environ.get(name, '').strip()
+    try:
+        return cast(raw) if raw else default
+    except ValueError:
+        return default
+
+
+def _frame_name(frame) -> str:
+    module = frame.f_globals.get('__name__', '?')
+    return f'{module}:{frame.f_code.co_name}'
+
+
+class StackSampler:
+    """
+    Samples one thread's Python stack every `interval_s` from a
+    background thread and counts identical stacks.
+    """
+
+    def __init__(self, thread_id=None, interval_s=None):
+        self.thread_id = thread_id or threading.get_ident()
+        if interval_s is None:
+            interval_s = _env_number(
+                INTERVAL_MS_ENV, INTERVAL_MS_DEFAULT, float,
+            ) / 1000
+        self.interval_s = max(interval_s, 0.0001)
+        self.counts = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        frame = sys._current_frames().get(self.thread_id)
+        stack = []
+        while frame is not None and len(stack) < MAX_DEPTH:
+            stack.append(_frame_name(frame))
+            frame = frame.f_back
+        if stack:
+            self.counts[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval_s):
+            self._sample()
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._run, name='axis-profiler', daemon=True,
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self
+
+    def collapsed(self) -> str:
+        """`frame;frame;frame count` lines, hottest first."""
+        return ''.join(
+            f'{stack} {n}\n' for stack, n in self.counts.most_common()
+        )
+
+
+def _cprofile_report(profiler) -> str:
+    out = io.StringIO()
+    stats = pstats.Stats(profiler, stream=out)
+    stats.sort_stats('cumulative').print_stats(60)
+    return out.getvalue()
+
+
+def _slug(route) -> str:
+    return re.sub(r'[^A-Za-z0-9]+', '_', route or 'unmatched').strip('_')
+
+
+def _prune(directory, keep):
+    try:
+        names = sorted(
+            (n for n in os.listdir(directory) if not n.startswith('.')),
+            key=lambda n: os.path.getmtime(os.path.join(directory, n)),
+        )
+    except OSError:
+        return
+    for name in names[:max(0, len(names) - keep)]:
+        try:
+            os.remove(os.path.join(directory, name))
+        except OSError:
+            pass
+
+
+def write_report(root, kind, route, text) -> str:
+    """
+    Save a report under root/profiles and prune old ones. Returns the
+    path relative to root.
+    """
+    directory = os.path.join(root, SUBDIR)
+    os.makedirs(directory, exist_ok=True)
+    ext = 'folded' if kind != CPROFILE else 'txt'
+    stamp = time.strftime('%Y%m%dT%H%M%S')
+    name = (f'{stamp}-{os.getpid()}-{next(_seq)}-{kind}-'
+            f'{_slug(route)}.{ext}')
+    with open(os.path.join(directory, name), 'w', encoding='utf-8') as f:
+        f.write(text)
+    _prune(directory, _env_number(KEEP_ENV, KEEP_DEFAULT))
+    return f'{SUBDIR}/{name}'
+
+
+def _requested_mode():
+    raw = request.args.get(PARAM) or request.headers.get(HEADER) or ''
+    return _MODES.get(raw.strip().lower())
+
+
+def _sampled():
+    n = _env_number(SAMPLE_N_ENV, 0)
+    return n > 0 and random.randrange(n) == 0
+
+
+def init_app(app, authorized, log_root):
+    """
+    authorized() -> bool checks the dev token for on-demand profiles;
+    log_root() -> str is the directory /dev/logs serves.
+    """
+    def start():
+        mode = _requested_mode()
+        if mode is not None and not authorized():
+            mode = None
+        on_demand = mode is not None
+        if mode is None and _sampled():
+            mode = SAMPLE
+        if mode is None:
+            return
+        profiler = None
+        if mode == CPROFILE:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Another profiler is active (concurrent request).
+                mode = SAMPLE
+        if mode == SAMPLE:
+            profiler = StackSampler().start()
+        g._profile = (mode, profiler, on_demand)
+
+    def finish(response):
+        state = g.pop('_profile', None)
+        if state is None:
+            return response
+        mode, profiler, on_demand = state
+        if mode == CPROFILE:
+            profiler.disable()
+            text = _cprofile_report(profiler)
+        else:
+            text = profiler.stop().collapsed()
+        rule = request.url_rule
+        try:
+            path = write_report(
+                log_root(), mode, rule.rule if rule else None, text,
+            )
+        except OSError:
+            app.logger.exception('could not write profile')
+            return response
+        if on_demand:
+            response.headers[HEADER] = path
+        return response
+
+    def abandon(exc):
+        # finish() never ran; do not leave a profiler running.
+        state = g.pop('_profile', None)
+        if state is not None:
+            mode, profiler, _ = state
+            if mode == CPROFILE:
+                profiler.disable()
+            else:
+                profiler.stop()
+
+    app.before_request(start)
+    app.after_request(finish)
+    app.teardown_request(abandon)
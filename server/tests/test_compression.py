@@ -0,0 +1,38 @@
+import gzip
+
+from werkzeug.datastructures import Accept
+
+import server.compression as comp
+
+
+def test_negotiate_prefers_client_q_then_server_order():
+    assert comp.negotiate(Accept([('gzip', 1)])) == comp.GZIP
+    assert comp.negotiate(Accept([('deflate', 1)])) is None
+    assert comp.negotiate(Accept([('gzip', 0)])) is None
+    assert comp.negotiate(Accept([])) is None
+    # Ties go to the server's preferred (first) encoding.
+    ties = Accept([(enc, 1) for enc in reversed(comp.ENCODINGS)])
+    assert comp.negotiate(ties) == comp.ENCODINGS[0]
+
+
+def test_level_env_is_clamped(monkeypatch):
+    assert comp.level(comp.GZIP) == comp.DEFAULT_LEVELS[comp.GZIP]
+    monkeypatch.setenv(comp.LEVEL_ENV, '42')
+    assert comp.level(comp.GZIP) == 9
+    monkeypatch.setenv(comp.LEVEL_ENV, 'fast')
+    assert comp.level(comp.GZIP) == comp.DEFAULT_LEVELS[comp.GZIP]
+
+
+def test_compress_round_trip_and_stats():
+    comp.reset_stats()
+    data = b'{"name": "City"}' * 500
+    body, cpu_s = comp.timed_compress(data, comp.GZIP)
+    assert gzip.decompress(body) == data
+    assert cpu_s >= 0
+    comp.record(comp.GZIP, len(data), len(body), cpu_s)
+    comp.record(comp.GZIP, len(data), len(body), cached=True)
+    st = comp.snapshot()['encodings'][comp.GZIP]
+    assert st['responses'] == 2
+    assert st['cached_responses'] == 1
+    assert st['ratio'] > 10
+    comp.reset_stats()
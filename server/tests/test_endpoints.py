@@ -1,18 +1,30 @@
 from http.client import (
     BAD_REQUEST,
     NOT_FOUND,
+    NOT_MODIFIED,
     OK,
     SERVICE_UNAVAILABLE,
     UNAUTHORIZED,
 )
+from datetime import datetime, timezone
+import gzip
 from io import BytesIO
+import json
+import os
+import threading
+import time
 from urllib.parse import quote
 
 from unittest.mock import patch
 
 import pytest
+from bson import ObjectId
 
+import cities.queries as cityqry
+import data.tracing as tracing
 import server.endpoints as ep
+import server.profiling as profiling
+import server.warmup as warmup
 
 TEST_CLIENT = ep.app.test_client()
 
@@ -80,6 +92,85 @@ def test_health_cloudinary_down(_mock_mongo, _mock_cloud):
     )
 
 
+def test_ready_when_warmup_disabled():
+    resp = TEST_CLIENT.get(ep.READY_EP)
+    assert resp.status_code == OK
+    body = resp.get_json()
+    assert body[ep.READY_STATUS] == 'ready'
+    assert body['warmup'] == 'disabled'
+
+
+def test_ready_503_until_warm():
+    started, gate = threading.Event(), threading.Event()
+
+    def load():
+        started.set()
+        gate.wait(5)
+
+    wu = warmup.Warmup({'cities': load})
+    with patch.object(warmup, 'WARMUP', wu.start()):
+        assert started.wait(5)
+        resp = TEST_CLIENT.get(ep.READY_EP)
+        assert resp.status_code == SERVICE_UNAVAILABLE
+        body = resp.get_json()
+        assert body[ep.READY_STATUS] == 'warming'
+        assert body['caches']['cities']['state'] == warmup.LOADING
+        gate.set()
+        assert wu.wait(5)
+        resp = TEST_CLIENT.get(ep.READY_EP)
+        assert resp.status_code == OK
+        assert resp.get_json()['caches']['cities']['state'] == warmup.READY
+
+
+def test_request_during_warmup_sees_a_whole_cache():
+    """
+    A request served while the warm-up is reloading cities gets the old
+    cache, with its own ETag, never the half-read new one.
+    """
+    def city(name):
+        return {'name': name, 'state_code': 'NY', 'country_code': 'USA',
+                'latitude': 40.0, 'longitude': -74.0}
+
+    old_rows = [city('Albany'), city('Buffalo')]
+    new_rows = [city('Albany'), city('Buffalo'), city('Ithaca')]
+    halfway, gate = threading.Event(), threading.Event()
+
+    def slow_read(collection, *args, **kwargs):
+        yield new_rows[0]
+        halfway.set()
+        gate.wait(5)
+        yield from new_rows[1:]
+
+    url = f'{ep.CITIES_EPS}/{ep.READ}'
+    count_url = f'{ep.CITIES_EPS}/{ep.COUNT}'
+    saved = cityqry.cache
+    try:
+        with patch('cities.queries.dbc.read', return_value=old_rows):
+            cityqry.load_cache()
+        before = TEST_CLIENT.get(url)
+        wu = warmup.Warmup({'cities': cityqry.load_cache})
+        with patch('cities.queries.dbc.read', side_effect=slow_read), \
+                patch.object(warmup, 'WARMUP', wu.start()):
+            assert halfway.wait(5)
+            assert TEST_CLIENT.get(ep.READY_EP).status_code \
+                == SERVICE_UNAVAILABLE
+            during = TEST_CLIENT.get(url)
+            assert during.status_code == OK
+            assert during.get_json()[ep.NUM_RECS] == 2
+            assert during.headers['ETag'] == before.headers['ETag']
+            assert TEST_CLIENT.get(count_url).get_json()['count'] == 2
+            gate.set()
+            assert wu.wait(5)
+            assert TEST_CLIENT.get(ep.READY_EP).status_code == OK
+            after = TEST_CLIENT.get(url)
+        assert after.get_json()[ep.NUM_RECS] == 3
+        assert TEST_CLIENT.get(count_url).get_json()['count'] == 3
+        assert after.headers['ETag'] != before.headers['ETag']
+    finally:
+        gate.set()
+        cityqry.cache = saved
+
+
 # ==================== ERROR-HANDLING SAFETY TESTS ==================
 
 @patch('server.endpoints.userqry.num_users')
@@ -251,6 +342,63 @@ def test_cities_delete_missing_params():
     assert ep.ERROR in resp_json
 
 
+@patch('server.endpoints.cityqry.search_nearby')
+def test_cities_nearby(mock_nearby):
+    """GET /cities/nearby passes coords, radius and limit through."""
+    mock_results = [
+        {"name": "New York", "state_code": "NY", "distance_km": 0.0},
+        {"name": "Newark", "state_code": "NJ", "distance_km": 14.3},
+    ]
+    mock_nearby.return_value = mock_results
+
+    resp = TEST_CLIENT.get(
+        f"{ep.CITIES_EPS}/{ep.NEARBY}?lat=40.71&lon=-74.0&radius_km=25"
+        "&limit=5"
+    )
+    resp_json = resp.get_json()
+
+    assert resp.status_code == OK
+    assert resp_json[ep.CITY_RESP] == mock_results
+    assert resp_json[ep.NUM_RECS] == 2
+    assert resp_json['radius_km'] == 25
+    mock_nearby.assert_called_once_with(
+        '40.71', '-74.0', radius_km='25', limit='5',
+    )
+
+
+def test_cities_nearby_missing_coords():
+    resp = TEST_CLIENT.get(f"{ep.CITIES_EPS}/{ep.NEARBY}?lat=40.71")
+    assert resp.status_code == BAD_REQUEST
+    assert ep.ERROR in resp.get_json()
+
+
+@patch('server.endpoints.cityqry.search_nearby')
+def test_cities_nearby_invalid_coords(mock_nearby):
+    mock_nearby.side_effect = ValueError("'lat' must be a number")
+    resp = TEST_CLIENT.get(f"{ep.CITIES_EPS}/{ep.NEARBY}?lat=x&lon=1")
+    assert resp.status_code == BAD_REQUEST
+    assert ep.ERROR in resp.get_json()
+
+
+@patch('server.endpoints.cityqry.search_in_bbox')
+def test_cities_in_bbox(mock_bbox):
+    mock_bbox.return_value = ({'a': {'name': 'Suva'}}, True)
+    resp = TEST_CLIENT.get(
+        f"{ep.CITIES_EPS}/{ep.IN_BBOX}?bbox=175,-20,-170,-10&limit=1"
+    )
+    assert resp.status_code == OK
+    data = resp.get_json()
+    assert data[ep.CITY_RESP] == {'a': {'name': 'Suva'}}
+    assert data['truncated'] is True
+    assert data['bbox'] == [175, -20, -170, -10]
+    mock_bbox.assert_called_once_with((175.0, -20.0, -170.0, -10.0), limit='1')
+
+
+def test_cities_in_bbox_bad_bbox():
+    resp = TEST_CLIENT.get(f"{ep.CITIES_EPS}/{ep.IN_BBOX}?bbox=1,2,3")
+    assert resp.status_code == BAD_REQUEST
+
+
 # ==================== COUNTRIES ENDPOINT TESTS ====================
 
 @patch('server.endpoints.countryqry.read')
@@ -802,6 +950,25 @@ def test_listings_read(mock_read):
     assert resp_json[ep.NUM_RECS] == len(mock_data)
 
 
+@patch('server.endpoints.listingqry.read')
+def test_listings_read_serializes_bson_types(mock_read):
+    """Raw ObjectId / datetime values are encoded without pre-conversion."""
+    oid = ObjectId('64b7f0c2a1b2c3d4e5f60718')
+    mock_read.return_value = {
+        str(oid): {
+            '_id': oid,
+            'title': 'Item A',
+            'created_at': datetime(2026, 1, 2, tzinfo=timezone.utc),
+        },
+    }
+    resp = TEST_CLIENT.get(f"{ep.LISTINGS_EPS}/{ep.READ}")
+    assert resp.status_code == OK
+    assert resp.mimetype == 'application/json'
+    item = resp.get_json()[ep.LISTING_RESP][str(oid)]
+    assert item['_id'] == str(oid)
+    assert item['created_at'] == '2026-01-02T00:00:00+00:00'
+
+
 @patch('server.endpoints.listingqry.read_paginated')
 def test_listings_read_paginated_envelope(mock_paginated):
     """Test that /listings/read with page params returns the new envelope."""
@@ -829,6 +996,54 @@ def test_listings_read_paginated_envelope(mock_paginated):
     assert kwargs['status'] == 'available'
 
 
+@patch('server.endpoints.listingqry.read_paginated')
+def test_listings_read_near_switches_to_paginated(mock_paginated):
+    """near_lat/near_lon/radius_km alone select the paginated envelope."""
+    mock_paginated.return_value = {
+        'items': [], 'page': 1, 'page_size': 20, 'total': 0,
+        'has_next': False,
+    }
+    resp = TEST_CLIENT.get(
+        f"{ep.LISTINGS_EPS}/{ep.READ}?near_lat=40.7&near_lon=-74"
+        "&radius_km=10&sort=distance"
+    )
+    assert resp.status_code == OK
+    kwargs = mock_paginated.call_args.kwargs
+    assert kwargs['near_lat'] == '40.7'
+    assert kwargs['near_lon'] == '-74'
+    assert kwargs['radius_km'] == '10'
+    assert kwargs['sort'] == 'distance'
+
+
+@patch('server.endpoints.listingqry.read')
+def test_listings_read_summary_view(mock_read):
+    """view alone keeps the legacy shape and is passed through."""
+    mock_read.return_value = {'id1': {'title': 'Item A', 'image': None}}
+    resp = TEST_CLIENT.get(f"{ep.LISTINGS_EPS}/{ep.READ}?view=summary")
+    assert resp.status_code == OK
+    assert resp.get_json()[ep.NUM_RECS] == 1
+    mock_read.assert_called_once_with(view='summary')
+
+
+@patch('server.endpoints.listingqry.read', side_effect=ValueError('bad view'))
+def test_listings_read_bad_view(mock_read):
+    resp = TEST_CLIENT.get(f"{ep.LISTINGS_EPS}/{ep.READ}?view=tiny")
+    assert resp.status_code == BAD_REQUEST
+
+
+@patch('server.endpoints.listingqry.search_in_bbox')
+def test_listings_in_bbox(mock_bbox):
+    mock_bbox.return_value = ({'id1': {'title': 'Lamp'}}, False)
+    resp = TEST_CLIENT.get(
+        f"{ep.LISTINGS_EPS}/{ep.IN_BBOX}?bbox=-75,40,-73,41"
+    )
+    assert resp.status_code == OK
+    data = resp.get_json()
+    assert data[ep.LISTING_RESP] == {'id1': {'title': 'Lamp'}}
+    assert data[ep.NUM_RECS] == 1
+    assert data['truncated'] is False
+
+
 @patch('server.endpoints.listingqry.num_listings')
 def test_listings_count(mock_count):
     """Test GET /listings/count endpoint."""
@@ -1229,6 +1444,53 @@ def test_auth_login_rate_limited(_mock_auth):
         ep.limiter.reset()
 
 
+# ==================== GEO ENDPOINT TESTS ====================
+
+@patch('server.endpoints.listingqry.get_clusters')
+@patch('server.endpoints.cityqry.get_clusters')
+def test_geo_clusters(mock_cities, mock_listings):
+    mock_cities.return_value = [
+        {'key': '0320', 'count': 12, 'lat': 40.7, 'lon': -74.0},
+    ]
+    mock_listings.return_value = []
+    resp = TEST_CLIENT.get(
+        f'{ep.GEO_EPS}/{ep.GEO_CLUSTERS}?bbox=-75,40,-73,41&zoom=8'
+    )
+    assert resp.status_code == OK
+    data = resp.get_json()
+    assert data['zoom'] == 8
+    assert data['level'] == 10
+    assert data['clusters']['cities'] == mock_cities.return_value
+    assert data['clusters']['listings'] == []
+    assert data[ep.NUM_RECS] == 1
+    mock_cities.assert_called_once_with((-75.0, 40.0, -73.0, 41.0), 10)
+
+
+@patch('server.endpoints.listingqry.get_clusters')
+@patch('server.endpoints.cityqry.get_clusters', return_value=[])
+def test_geo_clusters_single_layer(_mock_cities, mock_listings):
+    resp = TEST_CLIENT.get(
+        f'{ep.GEO_EPS}/{ep.GEO_CLUSTERS}?bbox=-75,40,-73,41&zoom=2'
+        '&layers=cities'
+    )
+    assert resp.status_code == OK
+    assert list(resp.get_json()['clusters']) == ['cities']
+    mock_listings.assert_not_called()
+
+
+@pytest.mark.parametrize('query', [
+    'zoom=3',
+    'bbox=-75,40,-73,41',
+    'bbox=-75,40,-73&zoom=3',
+    'bbox=-75,40,-73,41&zoom=99',
+    'bbox=-75,40,-73,41&zoom=3&layers=users',
+])
+def test_geo_clusters_bad_params(query):
+    resp = TEST_CLIENT.get(f'{ep.GEO_EPS}/{ep.GEO_CLUSTERS}?{query}')
+    assert resp.status_code == BAD_REQUEST
+    assert ep.ERROR in resp.get_json()
+
+
 # ==================== SYSTEM DROPDOWN ENDPOINT TESTS ====================
 
 
@@ -1252,13 +1514,13 @@ def test_system_dropdown_form_get():
     assert 'options' in data['_links']
 
 
-@patch('server.endpoints.countryqry.read')
-def test_system_dropdown_options_countries(mock_read):
+@patch('server.endpoints.countryqry.country_options')
+def test_system_dropdown_options_countries(mock_options):
     """GET /system/dropdown-options without query returns countries as options."""
-    mock_read.return_value = {
-        'USA': {'name': 'United States', 'code': 'USA'},
-        'CAN': {'name': 'Canada', 'code': 'CAN'},
-    }
+    mock_options.return_value = [
+        {'value': 'CAN', 'label': 'Canada (CAN)'},
+        {'value': 'USA', 'label': 'United States (USA)'},
+    ]
     resp = TEST_CLIENT.get(f'{ep.SYSTEM_EPS}/{ep.SYSTEM_DROPDOWN_OPTIONS}')
     assert resp.status_code == OK
     data = resp.get_json()
@@ -1271,14 +1533,13 @@ def test_system_dropdown_options_countries(mock_read):
     assert 'form' in data['_links']
 
 
-@patch('server.endpoints.stateqry.read')
-def test_system_dropdown_options_states(mock_read):
-    """GET /system/dropdown-options?country_code= filters states (case-insensitive)."""
-    mock_read.return_value = {
-        'NY,USA': {'name': 'New York', 'code': 'NY', 'country_code': 'USA'},
-        'TX,USA': {'name': 'Texas', 'code': 'TX', 'country_code': 'USA'},
-        'ON,CAN': {'name': 'Ontario', 'code': 'ON', 'country_code': 'CAN'},
-    }
+@patch('server.endpoints.stateqry.state_options')
+def test_system_dropdown_options_states(mock_options):
+    """GET /system/dropdown-options?country_code= looks up that country's states."""
+    mock_options.return_value = [
+        {'value': 'NY', 'label': 'New York (NY)'},
+        {'value': 'TX', 'label': 'Texas (TX)'},
+    ]
     resp = TEST_CLIENT.get(
         f'{ep.SYSTEM_EPS}/{ep.SYSTEM_DROPDOWN_OPTIONS}?country_code=usa'
     )
@@ -1289,17 +1550,16 @@ def test_system_dropdown_options_states(mock_read):
     assert data[ep.NUM_RECS] == 2
     codes = {o['value'] for o in data['options']}
     assert codes == {'NY', 'TX'}
+    mock_options.assert_called_once_with('usa')
 
 
-@patch('server.endpoints.cityqry.read')
-def test_system_dropdown_options_cities(mock_read):
+@patch('server.endpoints.cityqry.city_options')
+def test_system_dropdown_options_cities(mock_options):
     """GET /system/dropdown-options?state_code= returns USA cities by default."""
-    mock_read.return_value = {
-        'a': {'name': 'Buffalo', 'state_code': 'NY', 'country_code': 'USA'},
-        'b': {'name': 'Albany', 'state_code': 'NY', 'country_code': 'USA'},
-        'c': {'name': 'Houston', 'state_code': 'TX', 'country_code': 'USA'},
-        'd': {'name': 'Toronto', 'state_code': 'ON', 'country_code': 'CAN'},
-    }
+    mock_options.return_value = [
+        {'value': 'Albany', 'label': 'Albany, NY'},
+        {'value': 'Buffalo', 'label': 'Buffalo, NY'},
+    ]
     resp = TEST_CLIENT.get(
         f'{ep.SYSTEM_EPS}/{ep.SYSTEM_DROPDOWN_OPTIONS}?state_code=ny'
     )
@@ -1311,30 +1571,360 @@ def test_system_dropdown_options_cities(mock_read):
     assert data[ep.NUM_RECS] == 2
     city_names = {o['value'] for o in data['options']}
     assert city_names == {'Buffalo', 'Albany'}
+    mock_options.assert_called_once_with('ny', None)
 
 
-@patch('server.endpoints.cityqry.read')
-def test_system_dropdown_options_cities_with_country(mock_read):
-    """Cities list respects country_code (e.g. ON + CAN vs WA + USA)."""
-    mock_read.return_value = {
-        'a': {'name': 'Seattle', 'state_code': 'WA', 'country_code': 'USA'},
-        'b': {'name': 'Perth', 'state_code': 'WA', 'country_code': 'AUS'},
-    }
-    resp_usa = TEST_CLIENT.get(
+@patch('server.endpoints.cityqry.city_options', return_value=[])
+def test_system_dropdown_options_cities_with_country(mock_options):
+    """Cities lookup passes the normalized country_code through."""
+    resp = TEST_CLIENT.get(
         f'{ep.SYSTEM_EPS}/{ep.SYSTEM_DROPDOWN_OPTIONS}'
-        f'?state_code=wa&country_code=USA'
+        f'?state_code=wa&country_code=aus'
     )
-    assert resp_usa.status_code == OK
-    d_usa = resp_usa.get_json()
-    assert {o['value'] for o in d_usa['options']} == {'Seattle'}
+    assert resp.status_code == OK
+    assert resp.get_json()['country_code'] == 'AUS'
+    mock_options.assert_called_once_with('wa', 'AUS')
 
-    resp_aus = TEST_CLIENT.get(
-        f'{ep.SYSTEM_EPS}/{ep.SYSTEM_DROPDOWN_OPTIONS}'
-        f'?state_code=wa&country_code=AUS'
+
+# ==================== LIKE / UNLIKE ====================
+
+_LIKE_ID = '64b7f0c2a1b2c3d4e5f60701'
+
+
+@patch('server.endpoints._basic_auth_user', return_value=_TESTUSER_AUTH)
+@patch('server.endpoints.userqry.like_listing')
+def test_listings_like_as_caller(mock_like, _mock_auth):
+    mock_like.return_value = {
+        'id': _LIKE_ID, 'num_likes': 3, 'liked': True, 'changed': True,
+    }
+    resp = TEST_CLIENT.post(f'{ep.LISTINGS_EPS}/{ep.LIKE}?id={_LIKE_ID}')
+    assert resp.status_code == OK
+    assert resp.get_json()['num_likes'] == 3
+    mock_like.assert_called_once_with('testuser', _LIKE_ID)
+
+
+@patch('server.endpoints._basic_auth_user', return_value=_TESTUSER_AUTH)
+@patch('server.endpoints.userqry.unlike_listing')
+def test_listings_unlike_as_caller(mock_unlike, _mock_auth):
+    mock_unlike.return_value = {
+        'id': _LIKE_ID, 'num_likes': 2, 'liked': False, 'changed': True,
+    }
+    resp = TEST_CLIENT.post(f'{ep.LISTINGS_EPS}/{ep.UNLIKE}?id={_LIKE_ID}')
+    assert resp.status_code == OK
+    assert resp.get_json()['liked'] is False
+    mock_unlike.assert_called_once_with('testuser', _LIKE_ID)
+
+
+@patch('server.endpoints._basic_auth_user', return_value=None)
+def test_listings_like_requires_auth(_mock_auth):
+    resp = TEST_CLIENT.post(f'{ep.LISTINGS_EPS}/{ep.LIKE}?id={_LIKE_ID}')
+    assert resp.status_code == UNAUTHORIZED
+
+
+@patch('server.endpoints._basic_auth_user', return_value=_TESTUSER_AUTH)
+@patch('server.endpoints.userqry.like_listing',
+       side_effect=ValueError('Listing not found'))
+def test_listings_like_missing(_mock_like, _mock_auth):
+    assert TEST_CLIENT.post(
+        f'{ep.LISTINGS_EPS}/{ep.LIKE}?id={_LIKE_ID}'
+    ).status_code == NOT_FOUND
+    assert TEST_CLIENT.post(
+        f'{ep.LISTINGS_EPS}/{ep.LIKE}'
+    ).status_code == BAD_REQUEST
+
+
+@patch('server.endpoints._basic_auth_user', return_value=_TESTUSER_AUTH)
+@patch('server.endpoints.userqry.unlike_listing')
+@patch('server.endpoints.userqry.like_listing')
+def test_listings_like_malformed_id(mock_like, mock_unlike, _mock_auth):
+    for route in (ep.LIKE, ep.UNLIKE):
+        resp = TEST_CLIENT.post(f'{ep.LISTINGS_EPS}/{route}?id=not-an-id')
+        assert resp.status_code == BAD_REQUEST
+        assert 'Invalid listing ID' in resp.get_json()[ep.ERROR]
+    mock_like.assert_not_called()
+    mock_unlike.assert_not_called()
+
+
+# ==================== SAVED LISTINGS ====================
+
+
+@patch('server.endpoints.userqry.saved_listings')
+def test_users_saved_listings(mock_saved):
+    mock_saved.return_value = {
+        'username': 'u1', 'items': [{'_id': 'a'}], 'page': 1,
+        'page_size': 20, 'total': 1, 'has_next': False,
+    }
+    resp = TEST_CLIENT.get(
+        f'{ep.USERS_EPS}/{ep.SAVED_LISTINGS}?username=u1&page_size=5'
     )
-    assert resp_aus.status_code == OK
-    d_aus = resp_aus.get_json()
-    assert {o['value'] for o in d_aus['options']} == {'Perth'}
+    assert resp.status_code == OK
+    assert resp.get_json()['items'] == [{'_id': 'a'}]
+    mock_saved.assert_called_once_with('u1', page=1, page_size='5')
+
+
+@patch('server.endpoints.userqry.saved_listings', return_value=None)
+def test_users_saved_listings_errors(_mock_saved):
+    url = f'{ep.USERS_EPS}/{ep.SAVED_LISTINGS}'
+    assert TEST_CLIENT.get(url).status_code == BAD_REQUEST
+    assert TEST_CLIENT.get(f'{url}?username=ghost').status_code == NOT_FOUND
+
+
+# ==================== NDJSON EXPORTS ====================
+
+
+@patch('server.endpoints.listingqry.export')
+def test_listings_export_streams_ndjson(mock_export, monkeypatch):
+    """Every doc becomes one JSON line; filters are passed through."""
+    monkeypatch.setattr(ep, 'NDJSON_CHUNK_BYTES', 64)
+    docs = [{'_id': f'id{i}', 'title': f'Item {i}'} for i in range(25)]
+    mock_export.return_value = iter(docs)
+    resp = TEST_CLIENT.get(
+        f'{ep.LISTINGS_EPS}/{ep.EXPORT}?status=available&limit=25&foo=1'
+    )
+    assert resp.status_code == OK
+    assert resp.mimetype == ep.NDJSON_MIMETYPE
+    assert resp.is_streamed
+    assert 'Content-Encoding' not in resp.headers
+    lines = resp.data.decode('utf-8').splitlines()
+    assert [json.loads(line) for line in lines] == docs
+    mock_export.assert_called_once_with(
+        after=None, limit='25', status='available',
+    )
+
+
+@patch('server.endpoints.listingqry.export',
+       side_effect=ValueError("'limit' must be a positive integer"))
+def test_listings_export_bad_params(_mock_export):
+    resp = TEST_CLIENT.get(f'{ep.LISTINGS_EPS}/{ep.EXPORT}?limit=0')
+    assert resp.status_code == BAD_REQUEST
+    assert ep.ERROR in resp.get_json()
+
+
+@patch('server.endpoints.cityqry.export')
+def test_cities_export_streams_ndjson(mock_export):
+    mock_export.return_value = iter([{'name': 'Albany'}, {'name': 'Troy'}])
+    resp = TEST_CLIENT.get(
+        f'{ep.CITIES_EPS}/{ep.EXPORT}?state_code=NY&after=abc'
+    )
+    assert resp.status_code == OK
+    assert resp.data.endswith(b'\n')
+    assert [json.loads(line) for line in resp.data.splitlines()] == [
+        {'name': 'Albany'}, {'name': 'Troy'},
+    ]
+    mock_export.assert_called_once_with(
+        state_code='NY', country_code=None, after='abc', limit=None,
+    )
+
+
+# ==================== CONDITIONAL (ETAG) RESPONSES ====================
+
+
+@patch('server.endpoints.cityqry.cache_version', return_value='v1')
+@patch('server.endpoints.cityqry.read')
+def test_cities_read_etag_304(mock_read, _mock_version):
+    """A matching If-None-Match gets an empty 304 with the same ETag."""
+    ep.http_cache.clear_encoded()
+    mock_read.return_value = {'A,NY,USA': {'name': 'A'}}
+    url = f'{ep.CITIES_EPS}/{ep.READ}'
+    first = TEST_CLIENT.get(url)
+    assert first.status_code == OK
+    etag = first.headers['ETag']
+    assert etag == '"v1"'
+    assert 'must-revalidate' in first.headers['Cache-Control']
+
+    second = TEST_CLIENT.get(url, headers={'If-None-Match': etag})
+    assert second.status_code == NOT_MODIFIED
+    assert second.data == b''
+    assert second.headers['ETag'] == etag
+
+    stale = TEST_CLIENT.get(url, headers={'If-None-Match': '"v0"'})
+    assert stale.status_code == OK
+    assert stale.get_json()[ep.NUM_RECS] == 1
+
+
+@patch('server.endpoints.stateqry.read', return_value={})
+def test_states_read_no_etag_without_cache(_mock_read):
+    """No loaded cache means no version, so no validators are sent."""
+    with patch('server.endpoints.stateqry.cache_version', return_value=None):
+        resp = TEST_CLIENT.get(
+            f'{ep.STATES_EPS}/{ep.READ}',
+            headers={'If-None-Match': '*'},
+        )
+    assert resp.status_code == OK
+    assert 'ETag' not in resp.headers
+
+
+@patch('server.endpoints.cityqry.cache_version', return_value='v1')
+@patch('server.endpoints.cityqry.city_options', return_value=[])
+def test_dropdown_options_etag_varies_by_params(_mock_opts, _mock_ver):
+    """Same cache version, different state -> different ETag."""
+    base = f'{ep.SYSTEM_EPS}/{ep.SYSTEM_DROPDOWN_OPTIONS}'
+    ny = TEST_CLIENT.get(f'{base}?state_code=NY')
+    ca = TEST_CLIENT.get(f'{base}?state_code=CA')
+    assert ny.headers['ETag'] != ca.headers['ETag']
+    again = TEST_CLIENT.get(
+        f'{base}?state_code=NY',
+        headers={'If-None-Match': ny.headers['ETag']},
+    )
+    assert again.status_code == NOT_MODIFIED
+
+
+@patch('server.endpoints.countryqry.cache_version')
+@patch('server.endpoints.countryqry.read')
+def test_countries_read_reuses_encoded_body(
+    mock_read, mock_version, monkeypatch,
+):
+    """The body is encoded once per version, gzipped on request."""
+    monkeypatch.setenv(ep.compression.MIN_BYTES_ENV, '0')
+    ep.http_cache.clear_encoded()
+    mock_read.return_value = {'USA': {'name': 'United States'}}
+    mock_version.return_value = 'enc-v1'
+    url = f'{ep.COUNTRIES_EPS}/{ep.READ}'
+    with patch('server.http_cache.encode_json',
+               wraps=ep.http_cache.encode_json) as mock_encode:
+        plain = TEST_CLIENT.get(url)
+        zipped = TEST_CLIENT.get(url, headers={'Accept-Encoding': 'gzip'})
+        assert mock_encode.call_count == 1
+
+        mock_read.return_value = {}
+        mock_version.return_value = 'enc-v2'
+        fresh = TEST_CLIENT.get(url)
+        assert mock_encode.call_count == 2
+    assert plain.status_code == OK
+    assert plain.get_json()[ep.NUM_RECS] == 1
+    assert 'Content-Encoding' not in plain.headers
+    assert zipped.headers['Content-Encoding'] == 'gzip'
+    assert zipped.headers['Vary'] == 'Accept-Encoding'
+    assert zipped.headers['ETag'] == '"enc-v1-gzip"'
+    assert gzip.decompress(zipped.data) == plain.data
+    assert fresh.get_json()[ep.NUM_RECS] == 0
+    ep.http_cache.clear_encoded()
+
+
+@patch('server.endpoints.cityqry.cache_version', return_value='gz-v1')
+@patch('server.endpoints.cityqry.city_options')
+def test_dropdown_options_compressed_variant_etag(
+    mock_options, _mock_version, monkeypatch,
+):
+    """Compressed responses carry a per-encoding ETag that revalidates."""
+    monkeypatch.setenv(ep.compression.MIN_BYTES_ENV, '0')
+    mock_options.return_value = [
+        {'value': f'City {i}', 'label': f'City {i}, NY'} for i in range(50)
+    ]
+    url = f'{ep.SYSTEM_EPS}/{ep.SYSTEM_DROPDOWN_OPTIONS}?state_code=NY'
+    resp = TEST_CLIENT.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert resp.headers['Content-Encoding'] == 'gzip'
+    assert resp.headers['ETag'].endswith('-gzip"')
+    assert len(gzip.decompress(resp.data)) > len(resp.data)
+    again = TEST_CLIENT.get(url, headers={
+        'Accept-Encoding': 'gzip',
+        'If-None-Match': resp.headers['ETag'],
+    })
+    assert again.status_code == NOT_MODIFIED
+    assert again.headers['ETag'] == resp.headers['ETag']
+
+
+@patch('server.endpoints.userqry.read')
+def test_compression_threshold_and_identity(mock_read, monkeypatch):
+    """Small bodies and identity-only clients are sent uncompressed."""
+    mock_read.return_value = {'u1': {'username': 'a'}}
+    url = f'{ep.USERS_EPS}/{ep.READ}'
+    small = TEST_CLIENT.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in small.headers
+
+    monkeypatch.setenv(ep.compression.MIN_BYTES_ENV, '0')
+    identity = TEST_CLIENT.get(
+        url, headers={'Accept-Encoding': 'gzip;q=0, identity'},
+    )
+    assert 'Content-Encoding' not in identity.headers
+    assert identity.get_json()[ep.NUM_RECS] == 1
+
+
+# ==================== BATCH ENDPOINT ====================
+
+
+@pytest.mark.parametrize('parallel', [False, True])
+@patch('server.endpoints.stateqry.read')
+@patch('server.endpoints.countryqry.read')
+def test_batch_runs_subrequests_in_order(mock_countries, mock_states,
+                                         parallel):
+    mock_countries.return_value = {'USA': {'name': 'United States'}}
+    mock_states.return_value = {'NY,USA': {'name': 'New York'}}
+    resp = TEST_CLIENT.post(ep.BATCH_EP, json={
+        'parallel': parallel,
+        'requests': [
+            {'id': 'countries', 'path': f'{ep.COUNTRIES_EPS}/{ep.READ}'},
+            {'path': f'{ep.STATES_EPS}/{ep.READ}'},
+            {'id': 'bad', 'path': f'{ep.CITIES_EPS}/{ep.SEARCH}'},
+        ],
+    })
+    assert resp.status_code == OK
+    out = resp.get_json()['responses']
+    assert [r['id'] for r in out] == ['countries', '1', 'bad']
+    assert out[0]['status'] == OK
+    assert out[0]['body'][ep.COUNTRY_RESP] == mock_countries.return_value
+    assert out[1]['body'][ep.NUM_RECS] == 1
+    # Sub-request errors come back as-is, not as a failed batch.
+    assert out[2]['status'] == BAD_REQUEST
+    assert ep.ERROR in out[2]['body']
+
+
+def test_batch_parallel_listing_reads_each_see_a_whole_cache():
+    """Concurrent /listings/read reloads never expose a half-filled cache."""
+    docs = [{'_id': str(ObjectId()), 'title': f'item {i}'} for i in range(200)]
+    workers = ep.batch.MAX_WORKERS
+    midway = threading.Barrier(workers, timeout=5)
+    calls = []
+
+    def slow_read(*args, **kwargs):
+        nth = len(calls)
+        calls.append(nth)
+        for i, doc in enumerate(docs):
+            if i == len(docs) // 2 and nth < workers:
+                # Every worker is mid-load; the first to resume finishes
+                # while the others are still loading.
+                midway.wait()
+                time.sleep(0.02 * nth)
+            yield dict(doc)
+
+    with patch('listings.queries.dbc.read', return_value=docs):
+        ep.listingqry.load_cache()
+    with patch('listings.queries.dbc.read', side_effect=slow_read):
+        resp = TEST_CLIENT.post(ep.BATCH_EP, json={
+            'parallel': True,
+            'requests': [{'path': f'{ep.LISTINGS_EPS}/{ep.READ}'}] * 8,
+        })
+    ep.listingqry.clear_cache()
+    out = resp.get_json()['responses']
+    assert [r['status'] for r in out] == [OK] * 8
+    assert [r['body'][ep.NUM_RECS] for r in out] == [len(docs)] * 8
+
+
+@patch('server.endpoints.countryqry.cache_version', return_value='b-v1')
+@patch('server.endpoints.countryqry.read', return_value={})
+def test_batch_forwards_if_none_match(_mock_read, _mock_version):
+    ep.http_cache.clear_encoded()
+    resp = TEST_CLIENT.post(ep.BATCH_EP, json={'requests': [
+        {'path': f'{ep.COUNTRIES_EPS}/{ep.READ}', 'if_none_match': '"b-v1"'},
+    ]})
+    out = resp.get_json()['responses'][0]
+    assert out['status'] == NOT_MODIFIED
+    assert out['body'] is None
+    assert out['headers']['ETag'] == '"b-v1"'
+
+
+@pytest.mark.parametrize('body', [
+    None,
+    {'requests': []},
+    {'requests': [{'path': f'{ep.USERS_EPS}/{ep.READ}'}]},
+    {'requests': [{'path': f'{ep.LISTINGS_EPS}/{ep.EXPORT}'}]},
+    {'requests': [{'path': 'http://evil.example/countries/read'}]},
+    {'requests': [{'path': f'{ep.COUNTRIES_EPS}/{ep.READ}'}] * 11},
+])
+def test_batch_rejects_bad_requests(body):
+    resp = TEST_CLIENT.post(ep.BATCH_EP, json=body)
+    assert resp.status_code == BAD_REQUEST
+    assert ep.ERROR in resp.get_json()
 
 
 # ==================== DEVELOPER LOGS ENDPOINT ====================
@@ -1395,3 +1985,96 @@ def test_dev_logs_bearer_auth(tmp_path, monkeypatch):
     assert resp.status_code == OK
     assert resp.get_json()['content'] == 'ok'
 
+
+def test_dev_cache_stats(monkeypatch):
+    monkeypatch.setenv(ep.DEV_LOG_TOKEN_ENV, 'tok')
+    assert TEST_CLIENT.get(ep.DEV_CACHE_STATS_EP).status_code == (
+        UNAUTHORIZED
+    )
+    resp = TEST_CLIENT.get(
+        ep.DEV_CACHE_STATS_EP,
+        headers={ep.DEV_LOG_TOKEN_HEADER: 'tok'},
+    )
+    assert resp.status_code == OK
+    data = resp.get_json()
+    assert {'cities', 'states', 'countries', 'users', 'listings'} <= set(data)
+    assert 'reloads' in data['listings']
+
+
+def test_on_demand_profile(monkeypatch, tmp_path):
+    monkeypatch.setenv(ep.DEV_LOG_TOKEN_ENV, 'tok')
+    monkeypatch.setenv(ep.DEV_LOG_ROOT_ENV, str(tmp_path))
+    resp = TEST_CLIENT.get(f'{ep.HELLO_EP}?__profile=1')
+    assert resp.status_code == OK
+    assert profiling.HEADER not in resp.headers
+
+    resp = TEST_CLIENT.get(
+        f'{ep.HELLO_EP}?__profile=cprofile',
+        headers={ep.DEV_LOG_TOKEN_HEADER: 'tok'},
+    )
+    assert resp.status_code == OK
+    assert resp.get_json() == {ep.HELLO_RESP: 'world'}
+    path = resp.headers[profiling.HEADER]
+    assert path.startswith('profiles/') and path.endswith('.txt')
+    assert 'cumulative' in (tmp_path / path).read_text()
+
+    resp = TEST_CLIENT.get(
+        ep.HELLO_EP,
+        headers={ep.DEV_LOG_TOKEN_HEADER: 'tok', profiling.HEADER: '1'},
+    )
+    assert resp.headers[profiling.HEADER].endswith('.folded')
+
+
+def test_sampled_profiles_need_no_token(monkeypatch, tmp_path):
+    monkeypatch.setenv(ep.DEV_LOG_ROOT_ENV, str(tmp_path))
+    monkeypatch.setenv(profiling.SAMPLE_N_ENV, '1')
+    resp = TEST_CLIENT.get(ep.HELLO_EP)
+    assert profiling.HEADER not in resp.headers
+    assert len(os.listdir(tmp_path / profiling.SUBDIR)) == 1
+
+
+def test_request_trace_continues_traceparent(monkeypatch, tmp_path):
+    spans_file = tmp_path / 'spans.jsonl'
+    monkeypatch.setenv(tracing.TRACE_FILE_ENV, str(spans_file))
+    trace_id = '4bf92f3577b34da6a3ce929d0e0e4736'
+    resp = TEST_CLIENT.get(ep.HELLO_EP, headers={
+        'traceparent': f'00-{trace_id}-00f067aa0ba902b7-01',
+    })
+    assert resp.status_code == OK
+    assert resp.headers['traceparent'].startswith(f'00-{trace_id}-')
+    lines = spans_file.read_text().splitlines()
+    assert len(lines) == 1
+    span = json.loads(lines[0])
+    assert span['name'] == f'GET {ep.HELLO_EP}'
+    assert span['parentSpanId'] == '00f067aa0ba902b7'
+    assert span['attributes']['http.status_code'] == OK
+
+
+def test_metrics_endpoint(monkeypatch):
+    monkeypatch.setenv(ep.DEV_LOG_TOKEN_ENV, 'tok')
+    assert TEST_CLIENT.get(ep.METRICS_EP).status_code == UNAUTHORIZED
+    TEST_CLIENT.get(ep.HELLO_EP)
+    resp = TEST_CLIENT.get(
+        ep.METRICS_EP, headers={'Authorization': 'Bearer tok'},
+    )
+    assert resp.status_code == OK
+    assert resp.mimetype == 'text/plain'
+    text = resp.get_data(as_text=True)
+    assert '# TYPE axis_http_requests_total counter' in text
+    assert f'route="{ep.HELLO_EP}",status="200"' in text
+    assert '# TYPE axis_mongo_commands_total counter' in text
+
+
+def test_dev_compression_stats(monkeypatch):
+    monkeypatch.setenv(ep.DEV_LOG_TOKEN_ENV, 'tok')
+    assert TEST_CLIENT.get(ep.DEV_COMPRESSION_STATS_EP).status_code == (
+        UNAUTHORIZED
+    )
+    resp = TEST_CLIENT.get(
+        ep.DEV_COMPRESSION_STATS_EP,
+        headers={ep.DEV_LOG_TOKEN_HEADER: 'tok'},
+    )
+    assert resp.status_code == OK
+    data = resp.get_json()
+    assert 'gzip' in data['available']
+    assert 'encodings' in data
@@ -0,0 +1,46 @@
+import datetime
+import json
+
+import pytest
+from bson import ObjectId
+
+import server.json_codec as codec
+
+DOC = {
+    '_id': ObjectId('64b7f0c2a1b2c3d4e5f60718'),
+    'created_at': datetime.datetime(
+        2026, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc,
+    ),
+    'tags': {'free'},
+    'price': 25.0,
+    'location': {'type': 'Point', 'coordinates': (-74.0, 40.7)},
+    1: 'int key',
+}
+EXPECTED = {
+    '_id': '64b7f0c2a1b2c3d4e5f60718',
+    'created_at': '2026-01-02T03:04:05+00:00',
+    'tags': ['free'],
+    'price': 25.0,
+    'location': {'type': 'Point', 'coordinates': [-74.0, 40.7]},
+    '1': 'int key',
+}
+
+
+@pytest.mark.parametrize('encoder', [codec.STDLIB, codec.ORJSON])
+def test_dumps_handles_bson_types(encoder, monkeypatch):
+    if encoder == codec.ORJSON and codec.orjson is None:
+        pytest.skip('orjson not installed')
+    monkeypatch.setenv(codec.ENCODER_ENV, encoder)
+    assert codec.encoder_name() == encoder
+    out = codec.dumps(DOC)
+    assert out.endswith(b'\n')
+    assert json.loads(out) == EXPECTED
+
+
+def test_dumps_falls_back_for_huge_ints():
+    assert json.loads(codec.dumps({'n': 2 ** 70})) == {'n': 2 ** 70}
+
+
+def test_dumps_rejects_unknown_types():
+    with pytest.raises(TypeError):
+        codec.dumps({'x': object()})
@@ -0,0 +1,72 @@
+from flask import Flask
+
+import server.metrics as metrics
+
+
+def test_quantile_nearest_rank():
+    values = list(range(1, 101))
+    assert metrics.quantile(values, 0.5) == 50
+    assert metrics.quantile(values, 0.95) == 95
+    assert metrics.quantile(values, 0.99) == 99
+    assert metrics.quantile([7], 0.99) == 7
+    assert metrics.quantile([], 0.5) is None
+
+
+def test_observe_and_render():
+    metrics.reset()
+    for ms in range(1, 11):
+        metrics.observe('GET', '/cities/read', 200, ms / 1000, bytes_out=100)
+    metrics.observe('GET', '/cities/read', 404, 0.5)
+    snap = metrics.snapshot()['routes']['GET /cities/read']
+    assert snap['count'] == 11
+    assert snap['statuses'] == {200: 10, 404: 1}
+    assert snap['bytes_out'] == 1000
+    assert snap['quantiles'][0.5] == 0.006
+
+    text = metrics.render()
+    labels = 'method="GET",route="/cities/read"'
+    assert '# TYPE axis_http_request_duration_seconds summary' in text
+    assert (f'axis_http_request_duration_seconds{{{labels},quantile="0.99"}}'
+            ' 0.5') in text
+    assert f'axis_http_request_duration_seconds_count{{{labels}}} 11' in text
+    assert f'axis_http_requests_total{{{labels},status="404"}} 1' in text
+    assert f'axis_http_response_bytes_total{{{labels}}} 1000' in text
+    assert 'axis_http_requests_in_flight 0' in text
+    metrics.reset()
+
+
+def test_register_collector():
+    def collect():
+        yield ('widgets', 'gauge', 'Widgets.', [({'kind': 'a'}, 3)])
+    metrics.register_collector(collect)
+    try:
+        assert 'axis_widgets{kind="a"} 3' in metrics.render()
+    finally:
+        metrics._collectors.remove(collect)
+
+
+def test_middleware_labels_by_rule_and_counts_errors():
+    metrics.reset()
+    app = Flask(__name__)
+    metrics.init_app(app)
+
+    @app.route('/items/<name>')
+    def item(name):
+        return 'x' * 10
+
+    @app.route('/boom')
+    def boom():
+        raise RuntimeError('boom')
+
+    client = app.test_client()
+    client.get('/items/a')
+    client.get('/items/b')
+    client.get('/nope')
+    client.get('/boom')
+    routes = metrics.snapshot()['routes']
+    assert routes['GET /items/<name>']['count'] == 2
+    assert routes['GET /items/<name>']['bytes_out'] == 20
+    assert routes[f'GET {metrics.UNMATCHED}']['statuses'] == {404: 1}
+    assert routes['GET /boom']['statuses'] == {500: 1}
+    assert metrics.snapshot()['in_flight'] == 0
+    metrics.reset()
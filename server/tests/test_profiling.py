@@ -0,0 +1,36 @@
+import os
+import time
+
+import server.profiling as prof
+
+
+def _busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        sum(range(100))
+
+
+def test_stack_sampler_collapses_stacks():
+    sampler = prof.StackSampler(interval_s=0.001).start()
+    _busy(0.05)
+    sampler.stop()
+    assert sampler.samples > 0
+    text = sampler.collapsed()
+    assert f'{__name__}:_busy' in text
+    stack, count = text.splitlines()[0].rsplit(' ', 1)
+    assert int(count) >= 1
+    assert ';' in stack
+
+
+def test_write_report_prunes_old(tmp_path, monkeypatch):
+    monkeypatch.setenv(prof.KEEP_ENV, '2')
+    paths = []
+    for i in range(4):
+        paths.append(prof.write_report(
+            str(tmp_path), prof.SAMPLE, '/listings/read', f'a;b {i}\n',
+        ))
+        os.utime(tmp_path / paths[-1], (i, i))
+    left = sorted(os.listdir(tmp_path / prof.SUBDIR))
+    assert len(left) == 2
+    assert paths[0].startswith(f'{prof.SUBDIR}/')
+    assert paths[-1].endswith('-sample-listings_read.folded')
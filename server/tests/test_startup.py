@@ -0,0 +1,53 @@
+import os
+import subprocess
+import sys
+
+PROJECT_ROOT = os.path.dirname(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+)
+
+# Cumulative import time of server.endpoints, as -X importtime reports
+# it (which inflates it a little). Loose enough for slow CI machines;
+# tighten with AXIS_IMPORT_BUDGET_MS when profiling locally.
+BUDGET_MS = float(os.environ.get('AXIS_IMPORT_BUDGET_MS', '1500'))
+
+# Imported on first use only, never at boot.
+LAZY_MODULES = ('cloudinary', 'pymongo', 'pandas')
+
+
+def _import_times(code):
+    """module -> cumulative microseconds for a fresh run of `code`."""
+    env = dict(os.environ, PYTHONPATH=PROJECT_ROOT)
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=PROJECT_ROOT, env=env, capture_output=True, text=True,
+        timeout=120,
+    )
+    assert proc.returncode == 0, proc.stderr[-2000:]
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line.split('|')
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_endpoints_import_budget_and_lazy_modules():
+    # Fresh interpreter, so nothing is already imported.
+    times = _import_times(
+        'import server.endpoints\n'
+        'import data.db_connect as dbc\n'
+        'assert dbc.client is None, "connected to Mongo at import"\n'
+    )
+    eager = sorted(
+        name for name in times
+        if name.split('.')[0] in LAZY_MODULES
+    )
+    assert eager == []
+    took_ms = times['server.endpoints'] / 1000
+    assert took_ms <= BUDGET_MS, (
+        f'importing server.endpoints took {took_ms:.0f} ms '
+        f'(budget {BUDGET_MS:.0f} ms)'
+    )
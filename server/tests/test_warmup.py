@@ -0,0 +1,112 @@
+import threading
+from unittest.mock import patch
+
+import pytest
+
+import server.warmup as warmup
+
+
+@pytest.fixture(autouse=True)
+def no_process_warmup():
+    with patch.object(warmup, 'WARMUP', None):
+        yield
+
+
+def test_loads_concurrently_and_becomes_ready():
+    barrier = threading.Barrier(3, timeout=5)
+    calls = []
+
+    def loader(name):
+        def load():
+            barrier.wait()  # only passes if all three run at once
+            calls.append(name)
+        return load
+
+    wu = warmup.Warmup(
+        {name: loader(name) for name in ('countries', 'states', 'cities')},
+    )
+    assert not wu.ready()
+    wu.start()
+    assert wu.wait(5)
+    assert sorted(calls) == ['cities', 'countries', 'states']
+    status = wu.status()
+    assert status['ready'] is True
+    assert all(c['state'] == warmup.READY for c in status['caches'].values())
+    assert all(c['seconds'] is not None for c in status['caches'].values())
+
+
+def test_connects_once_before_loading():
+    order = []
+    wu = warmup.Warmup(
+        {'cities': lambda: order.append('load')},
+        connect=lambda: order.append('connect'),
+    )
+    wu.run()
+    assert order == ['connect', 'load']
+
+
+def test_failed_load_is_retried_until_it_succeeds():
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ConnectionError('mongo not up yet')
+
+    wu = warmup.Warmup({'cities': flaky, 'states': lambda: None},
+                       retry_s=0)
+    wu.run()
+    assert wu.ready()
+    caches = wu.status()['caches']
+    assert caches['cities']['attempts'] == 3
+    assert caches['cities']['error'] is None
+    assert caches['states']['attempts'] == 1
+
+
+def test_not_ready_while_failing():
+    gate = threading.Event()
+
+    def load():
+        if not gate.is_set():
+            raise ConnectionError('down')
+
+    wu = warmup.Warmup({'cities': load}, retry_s=0.01).start()
+    assert not wu.wait(0.1)
+    st = wu.status()
+    assert st['ready'] is False
+    assert st['caches']['cities']['error'] == 'ConnectionError'
+    gate.set()
+    assert wu.wait(5)
+
+
+def test_start_disabled_by_default(monkeypatch):
+    monkeypatch.delenv(warmup.ENABLED_ENV, raising=False)
+    assert warmup.start({'cities': lambda: None}) is None
+    assert warmup.status() == {
+        'ready': True, 'warmup': 'disabled', 'caches': {},
+    }
+
+
+def test_start_warms_configured_collections(monkeypatch):
+    monkeypatch.setenv(warmup.ENABLED_ENV, '1')
+    monkeypatch.setenv(warmup.COLLECTIONS_ENV, 'cities, nope')
+    loaded = []
+    wu = warmup.start({
+        'cities': lambda: loaded.append('cities'),
+        'users': lambda: loaded.append('users'),
+    })
+    assert wu is warmup.WARMUP
+    assert wu.wait(5)
+    assert loaded == ['cities']
+    assert warmup.status()['warmup'] == 'enabled'
+    assert list(warmup.status()['caches']) == ['cities']
+
+
+def test_metric_families():
+    wu = warmup.Warmup({'cities': lambda: None})
+    wu.run()
+    with patch.object(warmup, 'WARMUP', wu):
+        families = {f[0]: f[3] for f in warmup.metric_families()}
+    assert families['ready'] == [({}, 1)]
+    [(labels, _)] = families['warmup_seconds']
+    assert labels == {'collection': 'cities'}
@@ -0,0 +1,203 @@
+"""
+Cache warm-up at boot, and the readiness it gates.
+
+Caches load lazily (needs_cache), so without a warm-up the first request
+to each collection pays its full load_cache(). With `AXIS_WARMUP=1` the
+server connects to Mongo and loads the caches named in
+`AXIS_WARMUP_COLLECTIONS` (default: the reference data, countries,
+states and cities) on a thread pool as soon as it starts. /ready answers
+503 until every one of them has loaded, so a load balancer keeps
+traffic away from a cold worker. A load that fails is retried every
+`AXIS_WARMUP_RETRY_S` seconds (default 5) until it succeeds. Requests
+served meanwhile are safe: every load_cache() publishes its cache in
+one assignment, so they see the old cache or the new one, not a partial
+one.
+
+Knobs (env):
+    AXIS_WARMUP              '1' enables warm-up (default off; /ready
+                             then reports ready straight away)
+    AXIS_WARMUP_COLLECTIONS  comma-separated collection names
+    AXIS_WARMUP_WORKERS      pool size (default: one per collection)
+    AXIS_WARMUP_RETRY_S      delay before retrying failed loads
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+ENABLED_ENV = 'AXIS_WARMUP'
+COLLECTIONS_ENV = 'AXIS_WARMUP_COLLECTIONS'
+WORKERS_ENV = 'AXIS_WARMUP_WORKERS'
+RETRY_S_ENV = 'AXIS_WARMUP_RETRY_S'
+DEFAULT_COLLECTIONS = ('countries', 'states', 'cities')
+RETRY_S_DEFAULT = 5.0
+
+PENDING = 'pending'
+LOADING = 'loading'
+READY = 'ready'
+FAILED = 'failed'
+
+
+def enabled() -> bool:
+    return os.environ.get(ENABLED_ENV, '0').strip() == '1'
+
+
+def configured_collections() -> list:
+    raw = os.environ.get(COLLECTIONS_ENV, '').strip()
+    if not raw:
+        return list(DEFAULT_COLLECTIONS)
+    return [name.strip() for name in raw.split(',') if name.strip()]
+
+
+def _env_number(name, default, cast):
+    raw = os.environ.get(name, '').strip()
+    try:
+        return cast(raw) if raw else default
+    except ValueError:
+        return default
+
+
+class Warmup:
+    """
+    Loads every `loaders[name]()` concurrently in a background thread,
+    after `connect()` (so the pool threads share one client). Failed
+    loads are retried every `retry_s` until all have succeeded.
+    """
+
+    def __init__(self, loaders: dict, connect=None, workers=None,
+                 retry_s=RETRY_S_DEFAULT):
+        self.loaders = dict(loaders)
+        self.connect = connect
+        self.workers = max(1, workers or len(self.loaders) or 1)
+        self.retry_s = retry_s
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._status = {
+            name: {'state': PENDING, 'seconds': None, 'error': None,
+                   'attempts': 0}
+            for name in self.loaders
+        }
+        self._thread = None
+        if not self.loaders:
+            self._done.set()
+
+    def _set(self, name, **fields):
+        with self._lock:
+            self._status[name].update(fields)
+
+    def _load(self, name):
+        self._set(name, state=LOADING, error=None)
+        start = time.perf_counter()
+        try:
+            self.loaders[name]()
+        except Exception as exc:
+            with self._lock:
+                st = self._status[name]
+                st.update(state=FAILED, error=type(exc).__name__)
+                st['attempts'] += 1
+            logger.warning('warm-up of %s failed: %s', name, exc)
+            return False
+        with self._lock:
+            st = self._status[name]
+            st.update(state=READY, seconds=time.perf_counter() - start)
+            st['attempts'] += 1
+        return True
+
+    def _connect(self):
+        if self.connect is None:
+            return True
+        try:
+            self.connect()
+        except Exception as exc:
+            logger.warning('warm-up could not connect: %s', exc)
+            for name in self.loaders:
+                self._set(name, state=FAILED, error=type(exc).__name__)
+            return False
+        return True
+
+    def run(self):
+        """Warm everything, blocking until all loads have succeeded."""
+        pending = list(self.loaders)
+        while pending:
+            if self._connect():
+                with ThreadPoolExecutor(
+                    max_workers=min(self.workers, len(pending)),
+                    thread_name_prefix='axis-warmup',
+                ) as pool:
+                    ok = list(pool.map(self._load, pending))
+                pending = [n for n, good in zip(pending, ok) if not good]
+            if pending:
+                time.sleep(self.retry_s)
+        self._done.set()
+        logger.info('warm-up done: %s', ', '.join(
+            f'{name} {st["seconds"]:.2f}s'
+            for name, st in self.status()['caches'].items()
+        ))
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self.run, name='axis-warmup', daemon=True,
+        )
+        self._thread.start()
+        return self
+
+    def wait(self, timeout=None) -> bool:
+        return self._done.wait(timeout)
+
+    def ready(self) -> bool:
+        return self._done.is_set()
+
+    def status(self) -> dict:
+        with self._lock:
+            caches = {name: dict(st) for name, st in self._status.items()}
+        return {'ready': self.ready(), 'caches': caches}
+
+
+# The process-wide warm-up; None while disabled.
+WARMUP = None
+
+
+def start(loaders: dict, connect=None):
+    """
+    Start the process-wide warm-up when AXIS_WARMUP=1. `loaders` maps
+    collection name -> load_cache; only the configured ones are warmed.
+    Returns the Warmup, or None when disabled.
+    """
+    global WARMUP
+    if not enabled():
+        return None
+    chosen = {}
+    for name in configured_collections():
+        if name not in loaders:
+            logger.warning('warm-up: unknown collection %r ignored', name)
+            continue
+        chosen[name] = loaders[name]
+    WARMUP = Warmup(
+        chosen, connect=connect,
+        workers=_env_number(WORKERS_ENV, None, int),
+        retry_s=_env_number(RETRY_S_ENV, RETRY_S_DEFAULT, float),
+    ).start()
+    return WARMUP
+
+
+def status() -> dict:
+    """Readiness of the process-wide warm-up."""
+    if WARMUP is None:
+        return {'ready': True, 'warmup': 'disabled', 'caches': {}}
+    return dict(WARMUP.status(), warmup='enabled')
+
+
+def metric_families():
+    """Readiness for server.metrics.register_collector()."""
+    st = status()
+    return [
+        ('ready', 'gauge', 'Whether the cache warm-up has finished.',
+         [({}, int(st['ready']))]),
+        ('warmup_seconds', 'gauge', 'Time the last warm-up load took.',
+         [({'collection': name}, c['seconds'])
+          for name, c in sorted(st['caches'].items())
+          if c['seconds'] is not None]),
+    ]
@@ -3,6 +3,7 @@
 This file deals with our state-level data.
 """
 from functools import wraps
+import data.cache_utils as cache_utils
 import data.db_connect as dbc
 from data.db_connect import is_valid_id  # noqa F401
 
@@ -25,20 +26,35 @@ SAMPLE_STATE = {
 DEFAULT_COUNTRY = 'USA'
 
 cache = None
+cache_utils.track(STATE_COLLECTION, lambda: cache)
+# country_code -> sorted dropdown options; built on first use after a load.
+options_index = cache_utils.Derived()
+# Content version of the loaded cache; computed by load_cache() before the
+# cache is published.
+version = cache_utils.Derived()
 
 
 def needs_cache(fn, *args, **kwargs):
     @wraps(fn)
     def wrapper(*args, **kwargs):
         if not cache:
+            cache_utils.record_miss(STATE_COLLECTION)
             load_cache()
+        else:
+            cache_utils.record_hit(STATE_COLLECTION)
         return fn(*args, **kwargs)
     return wrapper
 
 
+@cache_utils.timed_reload(STATE_COLLECTION)
 def load_cache():
+    """
+    Read every state into a new dict and publish it in one assignment,
+    with its content version, so a concurrent request never sees a
+    half-filled cache.
+    """
     global cache
-    cache = {}
+    new_cache = {}
     states = dbc.read(STATE_COLLECTION)
     for state in states:
         code = str(state.get(CODE, '') or '').strip().upper()
@@ -54,13 +70,28 @@ def load_cache():
         doc = dict(state)
         doc[CODE] = code
         doc[COUNTRY_CODE] = cc
-        cache[key] = doc
+        new_cache[key] = doc
+    version.prime(new_cache, cache_utils.content_version(new_cache))
+    cache = new_cache
 
 
 def clear_cache():
     """Clear the cache. Useful for testing."""
     global cache
     cache = None
+    options_index.reset()
+    version.reset()
+
+
+def cache_version():
+    """
+    Content version of the loaded cache (see data.cache_utils), or None
+    if nothing is loaded yet. Computed once per load.
+    """
+    loaded = cache
+    if loaded is None:
+        return None
+    return version.get(loaded, cache_utils.content_version)
 
 
 @needs_cache
@@ -161,6 +192,34 @@ def search_states_by_name(search_term: str) -> dict:
     return matching_states
 
 
+def _build_options_index(states) -> dict:
+    """
+    Group states into {country_code: [option, ...]} with each list sorted
+    by label, ready for /system/dropdown-options.
+    """
+    index = {}
+    for state in states.values():
+        cc = str(state.get(COUNTRY_CODE, '') or '').strip().upper()
+        code = state.get(CODE, '')
+        name = state.get(NAME, code)
+        index.setdefault(cc, []).append(
+            {'value': code, 'label': f'{name} ({code})'}
+        )
+    for options in index.values():
+        options.sort(key=lambda o: o['label'].lower())
+    return index
+
+
+@needs_cache
+def state_options(country_code: str) -> list:
+    """
+    Sorted dropdown options ({value, label}) for a country's states.
+    The returned list is shared; callers must not modify it.
+    """
+    index = options_index.get(cache, _build_options_index)
+    return index.get(str(country_code or '').strip().upper(), [])
+
+
 def main():
     create(SAMPLE_STATE)
     print(read())
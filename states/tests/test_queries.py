@@ -191,3 +191,20 @@ def test_create_same_name_different_code():
     # Cleanup
     safe_delete(rec1)
     safe_delete(rec2)
+
+
+def test_state_options_sorted_per_country():
+    sample_db = [
+        {'name': 'Texas', 'code': 'TX', 'country_code': 'USA'},
+        {'name': 'New York', 'code': 'NY', 'country_code': 'usa'},
+        {'name': 'Ontario', 'code': 'ON', 'country_code': 'CAN'},
+    ]
+    qry.clear_cache()
+    with patch('states.queries.dbc.read', return_value=sample_db):
+        assert qry.state_options(' usa ') == [
+            {'value': 'NY', 'label': 'New York (NY)'},
+            {'value': 'TX', 'label': 'Texas (TX)'},
+        ]
+        assert [o['value'] for o in qry.state_options('CAN')] == ['ON']
+        assert qry.state_options('FRA') == []
+    qry.clear_cache()
@@ -5,7 +5,11 @@ This file deals with our user-level data.
 from datetime import datetime, timezone
 from functools import wraps
 from bson import ObjectId
+import data.cache_utils as cache_utils
 import data.db_connect as dbc
+import data.params as params
+import data.tracing as tracing
+import listings.queries as listingqry
 from data.email_address import EduEmailAddress
 from data.db_connect import is_valid_id  # noqa F401
 import bcrypt
@@ -45,20 +49,29 @@ SAMPLE_USER = {
 SAMPLE_KEY = SAMPLE_USER[USERNAME]
 
 cache = None
+cache_utils.track(USER_COLLECTION, lambda: cache)
 
 
 def needs_cache(fn, *args, **kwargs):
     @wraps(fn)
     def wrapper(*args, **kwargs):
         if not cache:
+            cache_utils.record_miss(USER_COLLECTION)
             load_cache()
+        else:
+            cache_utils.record_hit(USER_COLLECTION)
         return fn(*args, **kwargs)
     return wrapper
 
 
+@cache_utils.timed_reload(USER_COLLECTION)
 def load_cache():
+    """
+    Read every user into a new dict and publish it in one assignment, so
+    a concurrent request never sees a half-filled cache.
+    """
     global cache
-    cache = {}
+    new_cache = {}
     users = dbc.read(USER_COLLECTION)
     for user in users:
         username = str(user.get(USERNAME) or '').strip()
@@ -66,7 +79,8 @@ def load_cache():
             continue
         canonical = dict(user)
         canonical[USERNAME] = username
-        cache[username] = canonical
+        new_cache[username] = canonical
+    cache = new_cache
 
 
 def clear_cache():
@@ -270,7 +284,9 @@ def authenticate(email: str, password: str):
     # bcrypt.checkpw() needs bytes; stored hash may be str from DB
     if isinstance(hashed, str):
         hashed = hashed.encode('utf-8')
-    if not bcrypt.checkpw(password.encode('utf-8'), hashed):
+    with tracing.span('auth.bcrypt'):
+        ok = bcrypt.checkpw(password.encode('utf-8'), hashed)
+    if not ok:
         return None
     # Return a copy of user without the password field
     out = dict(user)
@@ -307,6 +323,149 @@ def search_users_by_name(search_term: str) -> dict:
     return matching_users
 
 
+def saved_listings(
+    username: str,
+    page=1,
+    page_size=listingqry.PAGE_SIZE_DEFAULT,
+) -> dict:
+    """
+    Hydrated page of a user's saved listings, in saved order.
+
+    The user is read fresh from Mongo and every saved id is resolved in
+    one batched `$in` query (no per-listing calls). Ids whose listing
+    was deleted, and duplicates, are dropped before paginating.
+
+    Returns dict: username, items, page, page_size, total, has_next, or
+    None if the user does not exist. Raises ValueError for bad params.
+    """
+    page = params.positive_int(page, 'page')
+    page_size = params.positive_int(
+        page_size, 'page_size', listingqry.PAGE_SIZE_MAX,
+    )
+    un = str(username or '').strip()
+    if not un:
+        raise ValueError("'username' is required")
+    user = dbc.read_one(USER_COLLECTION, {USERNAME: un})
+    if not user:
+        return None
+
+    saved = []
+    seen = set()
+    for listing_id in user.get(SAVED_LISTINGS) or []:
+        listing_id = str(listing_id).strip().lower()
+        if listing_id not in seen:
+            seen.add(listing_id)
+            saved.append(listing_id)
+    found = listingqry.get_by_ids(saved)
+    items = [found[lid] for lid in saved if lid in found]
+
+    total = len(items)
+    start = (page - 1) * page_size
+    end = start + page_size
+    return {
+        USERNAME: un,
+        'items': items[start:end],
+        'page': page,
+        'page_size': page_size,
+        'total': total,
+        'has_next': end < total,
+    }
+
+
+def _set_cached_saved(username: str, listing_id: str, saved: bool):
+    user = (cache or {}).get(username)
+    if user is None:
+        return
+    current = [
+        lid for lid in user.get(SAVED_LISTINGS) or [] if lid != listing_id
+    ]
+    if saved:
+        current.append(listing_id)
+    user[SAVED_LISTINGS] = current
+
+
+def like_listing(username: str, listing_id: str) -> dict:
+    """
+    Save a listing for a user and bump its num_likes, without any
+    read-modify-write: `$addToSet` on the user only matches when the id
+    is not already saved, and num_likes is `$inc`-ed only when that
+    actually added it, so concurrent or repeated likes never double
+    count or lose updates. Caches are patched in place, not reloaded.
+
+    The listing is looked up first, so an id that does not exist is
+    never saved, not even briefly.
+
+    Returns {id, num_likes, liked, changed}. Raises ValueError if the
+    listing (or user) does not exist.
+    """
+    listing_id = str(listing_id or '').strip().lower()
+    if not ObjectId.is_valid(listing_id):
+        raise ValueError(f'Invalid listing ID format: {listing_id}')
+    un = str(username or '').strip()
+    listing = listingqry.get_by_ids([listing_id]).get(listing_id)
+    if listing is None:
+        raise ValueError(f'Listing not found: {listing_id}')
+    added = dbc.update_with(
+        USER_COLLECTION,
+        {USERNAME: un, SAVED_LISTINGS: {'$ne': listing_id}},
+        {'$addToSet': {SAVED_LISTINGS: listing_id}},
+    ).modified_count > 0
+    if added:
+        liked = listingqry.add_likes(listing_id, 1)
+        if liked is None:
+            # Deleted between the lookup and the save: undo the save.
+            dbc.update_with(
+                USER_COLLECTION,
+                {USERNAME: un},
+                {'$pull': {SAVED_LISTINGS: listing_id}},
+            )
+            raise ValueError(f'Listing not found: {listing_id}')
+        listing = liked
+        _set_cached_saved(un, listing_id, True)
+    elif dbc.read_one(USER_COLLECTION, {USERNAME: un}) is None:
+        raise ValueError(f'User not found: {un}')
+    return {
+        'id': listing_id,
+        listingqry.NUM_LIKES: listing.get(listingqry.NUM_LIKES, 0),
+        'liked': True,
+        'changed': added,
+    }
+
+
+def unlike_listing(username: str, listing_id: str) -> dict:
+    """
+    Reverse of like_listing: `$pull` the id from the user's saved list
+    and `$inc` num_likes by -1 only when it was actually removed. Works
+    for listings that were deleted since (the dangling id is dropped).
+
+    Returns {id, num_likes, liked, changed}; num_likes is None when the
+    listing no longer exists.
+    """
+    listing_id = str(listing_id or '').strip().lower()
+    if not ObjectId.is_valid(listing_id):
+        raise ValueError(f'Invalid listing ID format: {listing_id}')
+    un = str(username or '').strip()
+    removed = dbc.update_with(
+        USER_COLLECTION,
+        {USERNAME: un, SAVED_LISTINGS: listing_id},
+        {'$pull': {SAVED_LISTINGS: listing_id}},
+    ).modified_count > 0
+    listing = None
+    if removed:
+        _set_cached_saved(un, listing_id, False)
+        listing = listingqry.add_likes(listing_id, -1)
+    if listing is None:
+        listing = listingqry.get_by_ids([listing_id]).get(listing_id)
+    return {
+        'id': listing_id,
+        listingqry.NUM_LIKES: (
+            listing.get(listingqry.NUM_LIKES, 0) if listing else None
+        ),
+        'liked': False,
+        'changed': removed,
+    }
+
+
 def main():
     create(SAMPLE_USER)
     print(read())
@@ -453,3 +453,185 @@ def test_update_saved_listings(temp_user_unique):
     assert updated.get(qry.SAVED_LISTINGS) == listing_ids
 
 
+_L1 = '64b7f0c2a1b2c3d4e5f60701'
+_L2 = '64b7f0c2a1b2c3d4e5f60702'
+_GONE = '64b7f0c2a1b2c3d4e5f60703'
+
+
+def _saved_fixture(monkeypatch, saved):
+    user = {qry.USERNAME: 'saver', qry.SAVED_LISTINGS: saved}
+    queries = []
+
+    def fake_read_many(coll, filt, **kwargs):
+        queries.append(filt)
+        wanted = {str(oid) for oid in filt['_id']['$in']}
+        return [
+            {'_id': lid, 'title': lid[-2:]}
+            for lid in (_L2, _L1) if lid in wanted
+        ]
+
+    monkeypatch.setattr(
+        qry.dbc, 'read_one',
+        lambda coll, filt: dict(user)
+        if filt == {qry.USERNAME: 'saver'} else None,
+    )
+    monkeypatch.setattr(qry.listingqry.dbc, 'read_many', fake_read_many)
+    return queries
+
+
+def test_saved_listings_order_and_dropped_ids(monkeypatch):
+    queries = _saved_fixture(
+        monkeypatch, [_L1, _GONE, 'not-an-id', _L2, _L1.upper()],
+    )
+    result = qry.saved_listings(' saver ')
+    assert [it['_id'] for it in result['items']] == [_L1, _L2]
+    assert result['total'] == 2
+    assert result['has_next'] is False
+    assert len(queries) == 1  # one batched $in lookup
+
+
+def test_saved_listings_paginates(monkeypatch):
+    _saved_fixture(monkeypatch, [_L1, _L2])
+    page = qry.saved_listings('saver', page=2, page_size=1)
+    assert [it['_id'] for it in page['items']] == [_L2]
+    assert page['has_next'] is False
+    with pytest.raises(ValueError):
+        qry.saved_listings('saver', page=0)
+
+
+def test_saved_listings_unknown_user(monkeypatch):
+    _saved_fixture(monkeypatch, [])
+    assert qry.saved_listings('nobody') is None
+
+
+def test_saved_listings_empty_skips_query(monkeypatch):
+    queries = _saved_fixture(monkeypatch, [])
+    assert qry.saved_listings('saver')['items'] == []
+    assert queries == []
+
+
+class _Result:
+    def __init__(self, modified):
+        self.modified_count = modified
+
+
+def _like_fixture(monkeypatch, saved, listing_likes=0):
+    """Minimal in-memory stand-in for the two Mongo update paths."""
+    state = {'saved': list(saved), 'likes': listing_likes, 'calls': []}
+
+    def update_with(coll, filt, ops):
+        state['calls'].append(ops)
+        lid = (ops.get('$addToSet') or ops.get('$pull'))[qry.SAVED_LISTINGS]
+        if '$addToSet' in ops and lid not in state['saved']:
+            state['saved'].append(lid)
+            return _Result(1)
+        if '$pull' in ops and lid in state['saved']:
+            state['saved'].remove(lid)
+            return _Result(1)
+        return _Result(0)
+
+    def add_likes(listing_id, delta):
+        if state['likes'] is None:
+            return None
+        state['likes'] += delta
+        return {'_id': listing_id, 'num_likes': state['likes']}
+
+    monkeypatch.setattr(qry.dbc, 'update_with', update_with)
+    monkeypatch.setattr(qry.dbc, 'read_one', lambda *a: {})
+    monkeypatch.setattr(qry.listingqry, 'add_likes', add_likes)
+    monkeypatch.setattr(
+        qry.listingqry, 'get_by_ids',
+        lambda ids: {} if state['likes'] is None else {
+            ids[0]: {'_id': ids[0], 'num_likes': state['likes']},
+        },
+    )
+    return state
+
+
+def test_like_is_idempotent(monkeypatch):
+    state = _like_fixture(monkeypatch, [])
+    first = qry.like_listing('saver', _L1)
+    again = qry.like_listing('saver', _L1)
+    assert first == {
+        'id': _L1, 'num_likes': 1, 'liked': True, 'changed': True,
+    }
+    assert again['changed'] is False
+    assert again['num_likes'] == 1
+    assert state['saved'] == [_L1]
+
+
+def test_like_missing_listing_never_saves(monkeypatch):
+    state = _like_fixture(monkeypatch, [], listing_likes=None)
+    with pytest.raises(ValueError, match='Listing not found'):
+        qry.like_listing('saver', _L1)
+    assert state['calls'] == []
+    assert state['saved'] == []
+
+
+def test_like_listing_deleted_meanwhile_rolls_back(monkeypatch):
+    state = _like_fixture(monkeypatch, [])
+    monkeypatch.setattr(qry.listingqry, 'add_likes', lambda *a: None)
+    with pytest.raises(ValueError, match='Listing not found'):
+        qry.like_listing('saver', _L1)
+    assert state['saved'] == []
+
+
+def test_unlike_only_decrements_when_saved(monkeypatch):
+    state = _like_fixture(monkeypatch, [_L1], listing_likes=5)
+    assert qry.unlike_listing('saver', _L2)['num_likes'] == 5
+    out = qry.unlike_listing('saver', _L1)
+    assert out['changed'] is True
+    assert out['num_likes'] == 4
+    assert state['saved'] == []
+
+
+def test_like_rejects_bad_id():
+    with pytest.raises(ValueError):
+        qry.like_listing('saver', 'nope')
+
+
+def test_concurrent_likes_are_counted_once_each():
+    """
+    100 users like the same listing in parallel against the real DB:
+    num_likes must end at exactly 100 and every user must have it saved.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    import listings.queries as listingqry
+
+    n_users = 100
+    prefix = 'likeconc'
+    listing = deepcopy(listingqry.SAMPLE_LISTING)
+    listing[listingqry.TITLE] = f'{prefix} listing'
+    listing_id = qry.dbc.create(listingqry.LISTING_COLLECTION, listing)
+    names = [f'{prefix}{i}' for i in range(n_users)]
+    for name in names:
+        qry.dbc.create(qry.USER_COLLECTION, {
+            qry.USERNAME: name, qry.SAVED_LISTINGS: [],
+        })
+    try:
+        with ThreadPoolExecutor(max_workers=32) as pool:
+            # Every user likes twice; the repeats must not count.
+            list(pool.map(
+                lambda name: qry.like_listing(name, listing_id),
+                names + names,
+            ))
+        doc = listingqry.get_by_ids([listing_id])[listing_id]
+        assert doc[listingqry.NUM_LIKES] == n_users
+        for name in names:
+            user = qry.dbc.read_one(qry.USER_COLLECTION, {qry.USERNAME: name})
+            assert user[qry.SAVED_LISTINGS] == [listing_id]
+        with ThreadPoolExecutor(max_workers=32) as pool:
+            list(pool.map(
+                lambda name: qry.unlike_listing(name, listing_id), names,
+            ))
+        doc = listingqry.get_by_ids([listing_id])[listing_id]
+        assert doc[listingqry.NUM_LIKES] == 0
+    finally:
+        qry.dbc.delete_many(
+            qry.USER_COLLECTION, {qry.USERNAME: {'$in': names}},
+        )
+        qry.dbc.delete(
+            listingqry.LISTING_COLLECTION,
+            {qry.dbc.MONGO_ID: qry.ObjectId(listing_id)},
+        )